@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import logging
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from mock_tceq import MockTceqServer
+
+# ========== PATH SETUP ==========
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+ENGINES = ("selenium", "cdp")
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+# ========== MEASUREMENT ==========
+
+def run_script(tree: str, script: str, args: list[str], env: dict, log_path: str) -> tuple[float, int]:
+    """Runs one of the scripts from a copy of the repository; returns its wall-clock time and exit code."""
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        returncode = subprocess.run([sys.executable, os.path.join(tree, 'scripts', script), *args],
+                                    cwd=tree, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT).returncode
+    seconds = time.perf_counter() - start
+    if returncode:
+        logging.error(f"{script} exited with code {returncode}; see {log_path}")
+    return seconds, returncode
+
+
+def bench_engine(engine: str, server: MockTceqServer, zip_codes: list[str], args: argparse.Namespace,
+                 work_dir: str) -> dict:
+    """
+    Scrapes zip_codes and downloads every listed MAERT with one engine, end to end through the
+    scripts' own command lines, in a fresh copy of the repository so the real data/ is untouched.
+    """
+    tree = os.path.join(work_dir, engine)
+    for name in ('scripts', 'utils'):
+        shutil.copytree(os.path.join(BASE_DIR, name), os.path.join(tree, name),
+                        ignore=shutil.ignore_patterns('__pycache__'))
+    env = {"TCEQ_RN_SEARCH_URL": server.rn_search_url, "TCEQ_SEARCH_URL": server.records_search_url}
+
+    scrape_seconds, scrape_code = run_script(
+        tree, 'scrape_rns_by_zipcode.py', [*zip_codes, '--workers', str(args.workers), '--engine', engine],
+        env, os.path.join(work_dir, f"{engine}_scrape.log"))
+    rns_csv = os.path.join(tree, 'data', 'rns_by_zipcode.csv')
+    rns = len(pd.read_csv(rns_csv)) if os.path.exists(rns_csv) else 0
+
+    if not rns:
+        return {"ok": False, "zipcodes": len(zip_codes), "scrape_seconds": scrape_seconds, "rns": 0}
+
+    download_seconds, download_code = run_script(
+        tree, 'download_maert_pdfs.py', ['--concurrency', str(args.workers), '--engine', engine,
+                                         '--backend', args.backend, '--max-requests-per-second', '0'],
+        env, os.path.join(work_dir, f"{engine}_download.log"))
+    ledger_path = os.path.join(tree, 'data', 'download_ledger.sqlite')
+    maerts = 0
+    if os.path.exists(ledger_path):
+        with sqlite3.connect(ledger_path) as conn:
+            maerts = conn.execute("SELECT COUNT(*) FROM documents WHERE status = 'downloaded'").fetchone()[0]
+
+    return {
+        "ok": not (scrape_code or download_code),
+        "zipcodes": len(zip_codes),
+        "scrape_seconds": scrape_seconds,
+        "zipcodes_per_sec": len(zip_codes) / scrape_seconds,
+        "rns": rns,
+        "download_seconds": download_seconds,
+        "maerts": maerts,
+        "maerts_per_sec": maerts / download_seconds,
+    }
+
+# ========== MAIN ==========
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the Selenium and CDP scraping engines end to end against a local mock of the TCEQ sites.")
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES),
+                        help="Engines to run (default: both)")
+    parser.add_argument('--zipcodes', type=int, default=4, help="ZIP codes to scrape (default: 4)")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Browsers (Selenium) or tabs (CDP) working in parallel (default: 4)")
+    parser.add_argument('--backend', choices=("browser", "http"), default="browser",
+                        help="How MAERT PDFs are fetched (default: browser)")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds the mock adds to every response (default: 0.05)")
+    parser.add_argument('--rns-per-zip', type=int, default=25, help="RNs the mock lists per ZIP code (default: 25)")
+    parser.add_argument('--maerts-per-rn', type=int, default=4, help="MAERTs the mock lists per RN (default: 4)")
+    parser.add_argument('--output', help="JSON file to write results to (default: benchmarks/results/engines_<timestamp>.json)")
+    parser.add_argument('--keep', action='store_true', help="Keep the working directory with each run's data and logs")
+    args = parser.parse_args()
+
+    zip_codes = [f"{77001 + i}" for i in range(args.zipcodes)]
+    work_dir = tempfile.mkdtemp(prefix="engine_bench_")
+    results = {}
+    try:
+        with MockTceqServer(latency=args.latency, rns_per_zip=args.rns_per_zip, maerts_per_rn=args.maerts_per_rn) as server:
+            expected = server.expected(zip_codes)
+            for engine in args.engines:
+                result = results[engine] = bench_engine(engine, server, zip_codes, args, work_dir)
+                if not result["ok"] and not result["rns"]:
+                    logging.error(f"{engine}: scraping found no RNs; skipped downloading")
+                    args.keep = True
+                    continue
+                logging.info(f"{engine}: {result['zipcodes']} zipcodes scraped in {result['scrape_seconds']:.1f}s "
+                             f"({result['rns']}/{expected['rns']} RNs), {result['maerts']}/{expected['maerts']} "
+                             f"MAERTs downloaded in {result['download_seconds']:.1f}s "
+                             f"({result['maerts_per_sec']:.2f}/sec)")
+                if result["rns"] != expected["rns"] or result["maerts"] != expected["maerts"]:
+                    logging.warning(f"{engine}: incomplete results; check the logs in {work_dir}")
+                    args.keep = True
+    finally:
+        if args.keep:
+            logging.info(f"Kept run data and logs in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if all(results.get(engine, {}).get("maerts") for engine in ENGINES):
+        selenium, cdp = results["selenium"], results["cdp"]
+        logging.info(f"cdp vs selenium: {selenium['scrape_seconds'] / cdp['scrape_seconds']:.2f}x scraping, "
+                     f"{selenium['download_seconds'] / cdp['download_seconds']:.2f}x downloading")
+
+    created_at = datetime.now(timezone.utc)
+    output = args.output or os.path.join(RESULTS_DIR, f"engines_{created_at:%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            "created_at": created_at.isoformat(timespec="seconds"),
+            "parameters": {name: getattr(args, name) for name in
+                           ("zipcodes", "workers", "backend", "latency", "rns_per_zip", "maerts_per_rn")},
+            "expected": expected,
+            "results": results,
+        }, f, indent=2)
+    logging.info(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
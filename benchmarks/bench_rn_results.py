@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from io import StringIO
+from datetime import datetime, timezone
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+# ========== PATH SETUP ==========
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from utils.rn_results import parse_results_table, parse_single_record
+
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+LAYOUTS = ("results", "single")
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+# ========== PARSERS BEFORE utils.rn_results ==========
+
+def read_html_table(html: str) -> pd.DataFrame:
+    """How scrape_rns_by_zipcode.py parsed the multi-record results page before."""
+    return pd.read_html(StringIO(html))[0]
+
+
+def beautifulsoup_record(html: str) -> dict:
+    """How scrape_rns_by_zipcode.py parsed the single-record page before."""
+    soup = BeautifulSoup(html, "html.parser")
+    data = {}
+
+    reinfo = soup.find("div", id="reinfo")
+    if reinfo:
+        rows = reinfo.find_all(["div", "p"])
+        for row in rows:
+            label = row.find(class_="lbl")
+            if label:
+                label_text = label.get_text(strip=True).replace(":", "")
+                value = row.get_text(strip=True).replace(label.get_text(strip=True), "").strip()
+                data[label_text] = value
+
+    street = soup.find("div", id="street_addr")
+    if street:
+        span = street.find("span", class_="lbl")
+        if span:
+            label = span.get_text(strip=True).replace(":", "")
+            value = street.get_text(strip=True).replace(span.get_text(strip=True), "").strip()
+            data[label] = value
+
+    geo = soup.find("div", id="geo_loc")
+    if geo:
+        ps = geo.find_all("p")
+        for p in ps:
+            label = p.find("label")
+            if label:
+                label_text = label.get_text(strip=True).replace(":", "")
+                value = p.get_text(strip=True).replace(label.get_text(strip=True), "").strip()
+                data[label_text] = value
+
+    return data
+
+
+PARSERS = {
+    "results": {"before": read_html_table, "after": parse_results_table},
+    "single": {"before": beautifulsoup_record, "after": parse_single_record},
+}
+
+# ========== SYNTHETIC PAGES ==========
+
+def results_page(n_rows: int) -> str:
+    """A multi-record RN search results page with n_rows regulated entities."""
+    rows = "".join(
+        f"<tr class='{'odd' if i % 2 else 'even'}'>"
+        f"<td><a href='index.cfm?fuseaction=regent.show&amp;reid={101000 + i}'>RN{100000000 + i}</a></td>"
+        f"<td>PLANT   {i} &amp; TERMINAL</td><td>{i} INDUSTRIAL\n            BLVD</td><td>HARRIS</td>"
+        f"<td>77001</td><td>{'' if i % 7 == 0 else 'AIR NEW SOURCE PERMITS'}</td></tr>\n"
+        for i in range(n_rows)
+    )
+    return ("<html><body><div id='main'><div><div><h2>Regulated Entity Search Results</h2></div>"
+            f"<div><span>{n_rows} records found</span></div></div>"
+            "<table class='results'><thead><tr><th>RN Number</th><th>Regulated Entity Name</th><th>Location</th>"
+            "<th>County</th><th>Zip Code</th><th>Program Area</th></tr></thead>"
+            f"<tbody>\n{rows}</tbody></table>"
+            "<table class='pager'><tr><td><a href='index.cfm?page=2'>&gt;</a></td></tr></table></div></body></html>")
+
+
+def single_record_page() -> str:
+    """A single-record RN page, as shown when a zip code has exactly one regulated entity."""
+    labels = [("RN Number", "RN100000009"), ("Name", "KESTREL PETROCHEMICAL COMPLEX"),
+              ("Primary Business", "PETROCHEMICAL MANUFACTURING"), ("Regulated Entity Type", "Facility"),
+              ("Status", "ACTIVE")]
+    reinfo = "".join(f"<div><span class='lbl'>{label}:</span> {value}</div>" for label, value in labels)
+    geo = "".join(f"<p><label>{label}:</label> {value}</p>" for label, value in
+                  [("County", "HARRIS"), ("Region", "REGION 12 - HOUSTON"), ("Latitude", "29.7244"),
+                   ("Longitude", "-95.1801")])
+    return ("<html><body><div id='main'><h2>Regulated Entity Information</h2>"
+            f"<div id='reinfo'>{reinfo}</div>"
+            "<div id='street_addr'><span class='lbl'>Street Address:</span> 9 REFINERY RD<br>PASADENA, TX 77503</div>"
+            f"<div id='geo_loc'>{geo}</div></div></body></html>")
+
+# ========== MEASUREMENT ==========
+
+def time_parser(parse, html: str, repeat: int) -> float:
+    """Best of repeat timed runs, in milliseconds per page."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(html)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def bench_layout(layout: str, pages: list[tuple[str, str]], repeat: int) -> dict:
+    """Times the old and new parser of one layout on each page."""
+    results = {}
+    for name, html in pages:
+        timings = {version: time_parser(parse, html, repeat) for version, parse in PARSERS[layout].items()}
+        results[name] = {
+            "before_ms": timings["before"],
+            "after_ms": timings["after"],
+            "speedup": timings["before"] / timings["after"],
+        }
+        logging.info(f"{layout} {name}: {timings['before']:.2f} ms before, {timings['after']:.2f} ms after "
+                     f"({results[name]['speedup']:.1f}x)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time parsing one RN search results page, multi-record and single-record, before and after utils.rn_results.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[25, 200],
+                        help="Rows per synthetic multi-record results page (default: 25 200)")
+    parser.add_argument('--pages', nargs='+', default=[], metavar='HTML',
+                        help="Saved RN search pages to time as well; pages with a div#reinfo are single-record")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed runs per page; the best is reported (default: 20)")
+    parser.add_argument('--output', help="JSON file to write results to (default: benchmarks/results/rn_results_<timestamp>.json)")
+    args = parser.parse_args()
+
+    pages = {"results": [(f"synthetic_{n}_rows", results_page(n)) for n in args.rows],
+             "single": [("synthetic", single_record_page())]}
+    for path in args.pages:
+        with open(path) as f:
+            html = f.read()
+        pages["single" if "id='reinfo'" in html or 'id="reinfo"' in html else "results"].append((os.path.basename(path), html))
+
+    results = {layout: bench_layout(layout, pages[layout], args.repeat) for layout in LAYOUTS}
+
+    created_at = datetime.now(timezone.utc)
+    output = args.output or os.path.join(RESULTS_DIR, f"rn_results_{created_at:%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            "created_at": created_at.isoformat(timespec="seconds"),
+            "parameters": {"rows": args.rows, "pages": args.pages, "repeat": args.repeat},
+            "results": results,
+        }, f, indent=2)
+    logging.info(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
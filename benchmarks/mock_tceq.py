@@ -0,0 +1,251 @@
+import os
+import time
+import zlib
+import logging
+import argparse
+import tempfile
+import threading
+from html import escape
+from urllib.parse import urlsplit, parse_qs, urlencode
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from synthetic_maert import synthetic_rows, write_easy_maert
+
+# A local stand-in for the two TCEQ sites the scrapers drive: the Central Registry RN search
+# (scrape_rns_by_zipcode.py) and the Records Online document search (download_maert_pdfs.py).
+# Pages have the same structure and element locations as the real ones, with deterministic
+# contents, so both browser engines can be run and timed against it without touching TCEQ.
+
+RN_SEARCH_PATH = "/crpub/index.cfm"
+RECORDS_PATH = "/cs/idcplg"
+RN_PAGE_SIZE = 20
+RECORDS_PAGE_SIZE = 5
+RESULTS_COLUMNS = 17
+# ZIP codes ending in these have no RNs / a single RN (shown as a single-record page)
+NO_RESULTS_SUFFIX = "99"
+SINGLE_RECORD_SUFFIX = "98"
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+
+def rns_for_zip(zip_code: str, rns_per_zip: int) -> list[str]:
+    if zip_code.endswith(NO_RESULTS_SUFFIX):
+        return []
+    count = 1 if zip_code.endswith(SINGLE_RECORD_SUFFIX) else rns_per_zip
+    return [f"RN1{zip_code[-5:]}{i:03d}" for i in range(count)]
+
+
+def documents_for_rn(rn: str, maerts_per_rn: int) -> list[tuple[str, str, str, str]]:
+    """(document id, permit number, document type, date) of an RN's records; every fifth RN has none."""
+    if int(rn[2:]) % 5 == 4:
+        return []
+    documents = []
+    for i in range(maerts_per_rn + 2):
+        doc_type = "MAERT" if i < maerts_per_rn else "Permit Letter"
+        documents.append((f"{rn}-{i}", f"{int(rn[-6:]) * 10 + i}", doc_type, f"0{1 + i % 9}/15/2020 10:00 AM"))
+    return documents
+
+
+def _page(items: list, page: int, size: int) -> list:
+    return items[(page - 1) * size:page * size]
+
+
+def _records_layout(content: str) -> str:
+    # Content sits at /html/body/table[1]/tbody/tr[5]/td/table/tbody/tr/td/div, as on the real site
+    spacer = "<tr><td></td></tr>"
+    return (f"<html><head><title>TCEQ Records Online</title></head><body><table><tbody>"
+            f"<tr><td>TCEQ Records Online</td></tr>{spacer * 3}"
+            f"<tr><td><table><tbody><tr><td><div>{content}</div></td></tr></tbody></table></td></tr>"
+            f"</tbody></table></body></html>")
+
+
+class MockTceqHandler(BaseHTTPRequestHandler):
+    server: "MockTceqServer"
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == RN_SEARCH_PATH:
+            if "zip_cd" in query:
+                return self.send_html(self.rn_results(query["zip_cd"].strip(), int(query.get("page", 1))))
+            return self.send_html(self.rn_search_form())
+        if url.path == RECORDS_PATH:
+            if query.get("IdcService") == "GET_FILE":
+                return self.send_pdf(query.get("dDocName", ""))
+            if query.get("searchValue"):
+                return self.send_html(self.records_results(query, int(query.get("page", 1))))
+            return self.send_html(_records_layout(self.records_search_form()))
+        self.send_error(404)
+
+    def send_html(self, html: str):
+        body = html.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_pdf(self, document_id: str):
+        pdfs = self.server.pdfs
+        body = pdfs[zlib.crc32(document_id.encode()) % len(pdfs)]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Disposition", f'attachment; filename="{document_id}.pdf"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # ---------- Central Registry RN search ----------
+
+    def rn_search_form(self) -> str:
+        return (f"<html><body><div><form method='get' action='{RN_SEARCH_PATH}'>"
+                "<select name='pgm_area'><option value=''>Any</option>"
+                "<option value='AIRNSR    '>AIR NEW SOURCE REVIEW PERMITS</option></select>"
+                "<input type='text' id='zip_cd' name='zip_cd'>"
+                "<input type='submit' name='_fuseaction=regent.validateRE' value='Search'>"
+                "</form></div></body></html>")
+
+    def rn_results(self, zip_code: str, page: int) -> str:
+        rns = rns_for_zip(zip_code, self.server.rns_per_zip)
+        if not rns:
+            return "<html><body><div><div class='error'>No results were found.</div></div></body></html>"
+        if len(rns) == 1:
+            return ("<html><body><div id='reinfo'>"
+                    f"<p><span class='lbl'>RN Number:</span> {rns[0]}</p>"
+                    f"<p><span class='lbl'>Name:</span> Plant {rns[0]}</p></div>"
+                    f"<div id='street_addr'><span class='lbl'>Street Address:</span> 1 Main St, {zip_code}</div>"
+                    "</body></html>")
+
+        rows = "".join(f"<tr><td>{rn}</td><td>Plant {rn}</td><td>HARRIS</td><td>{zip_code}</td></tr>"
+                       for rn in _page(rns, page, RN_PAGE_SIZE))
+        next_link = ""
+        if page * RN_PAGE_SIZE < len(rns):
+            href = f"{RN_SEARCH_PATH}?{urlencode({'fuseaction': 'regent.results', 'zip_cd': zip_code, 'page': page + 1})}"
+            next_link = f"<p><a href='{escape(href)}'>&gt;</a></p>"
+        # The record count is at /html/body/div/div[2]/div[2]/span
+        return ("<html><body><div><div>Central Registry</div>"
+                f"<div><div>Regulated Entity Search Results</div><div><span>{len(rns)} records found</span></div></div>"
+                "<table><thead><tr><th>RN Number</th><th>Regulated Entity Name</th><th>County</th><th>Zip Code</th></tr></thead>"
+                f"<tbody>{rows}</tbody></table>{next_link}</div></body></html>")
+
+    # ---------- Records Online document search ----------
+
+    def records_search_form(self) -> str:
+        spacer = "<tr><td></td></tr>"
+        return (f"<form method='get' action='{RECORDS_PATH}'><input type='hidden' name='IdcService' value='TCEQ_SEARCH'>"
+                "<table><tbody>"
+                "<tr><td><select id='xRecordSeries' name='xRecordSeries'><option value=''>All</option>"
+                "<option value='1081'>Air Permits</option></select></td></tr>"
+                "<tr><td><select id='xInsightDocumentType' name='xInsightDocumentType'><option value=''>All</option>"
+                "<option value='27'>Permit</option></select></td></tr>"
+                f"{spacer}<tr><td><table><tbody>"
+                "<tr><td><select name='searchField'><option value=''>Any</option><option value='xRefNumTxt'>RN</option>"
+                "</select></td><td><input type='text' name='searchValue'></td></tr>"
+                f"{spacer * 3}"
+                "<tr><td></td><td></td><td><div><button type='submit'>Search</button><button type='reset'>Clear</button></div></td></tr>"
+                "</tbody></table></td></tr></tbody></table></form>")
+
+    def records_results(self, query: dict, page: int) -> str:
+        documents = documents_for_rn(query["searchValue"].strip(), self.server.maerts_per_rn)
+        summary = f"<span>Found {len(documents)} potential items</span>"
+        if not documents:
+            return _records_layout(f"<table><tbody><tr><td>{summary}</td></tr></tbody></table>")
+
+        pages = (len(documents) + RECORDS_PAGE_SIZE - 1) // RECORDS_PAGE_SIZE
+        selector = ""
+        if pages > 1:
+            options = "".join(
+                f"<option value='{escape(RECORDS_PATH + '?' + urlencode({**query, 'page': n}))}'"
+                f"{' selected' if n == page else ''}>{n}</option>" for n in range(1, pages + 1))
+            selector = f" Page <select name='xpageSelectList' onchange='window.location.href = this.value'>{options}</select>"
+
+        header = "".join(f"<th>Column {i}</th>" for i in range(RESULTS_COLUMNS))
+        rows = []
+        for document_id, permit_number, doc_type, date in _page(documents, page, RECORDS_PAGE_SIZE):
+            cells = [""] * RESULTS_COLUMNS
+            href = f"{RECORDS_PATH}?{urlencode({'IdcService': 'GET_FILE', 'dDocName': document_id})}"
+            cells[2] = f"<a href='{escape(href)}'>{document_id}</a>"
+            cells[6], cells[12], cells[16] = permit_number, doc_type, date
+            rows.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+        # The results table is at .../div/table[3]/tbody/tr/td[2]/table
+        return _records_layout(
+            "<table><tbody><tr><td>Search Results</td></tr></tbody></table>"
+            f"<table><tbody><tr><td>{summary}{selector}</td></tr></tbody></table>"
+            "<table><tbody><tr><td></td><td><table>"
+            f"<thead><tr>{header}</tr></thead><tbody>{''.join(rows)}</tbody>"
+            "</table></td></tr></tbody></table>")
+
+
+class MockTceqServer(ThreadingHTTPServer):
+    """
+    Serves the mock sites on 127.0.0.1 from a background thread while used as a context manager.
+    Every response is delayed by latency seconds, standing in for the real sites' response times.
+    """
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.05, rns_per_zip: int = 25, maerts_per_rn: int = 4,
+                 n_pdfs: int = 4, sources: int = 20):
+        super().__init__(("127.0.0.1", port), MockTceqHandler)
+        self.latency = latency
+        self.rns_per_zip = rns_per_zip
+        self.maerts_per_rn = maerts_per_rn
+        self.pdfs = []
+        with tempfile.TemporaryDirectory(prefix="mock_tceq_") as tmp_dir:
+            for i in range(n_pdfs):
+                path = os.path.join(tmp_dir, f"{i}.pdf")
+                write_easy_maert(path, synthetic_rows(sources, seed=i))
+                with open(path, 'rb') as f:
+                    self.pdfs.append(f.read())
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @property
+    def rn_search_url(self) -> str:
+        return f"{self.base_url}{RN_SEARCH_PATH}?fuseaction=regent.RNSearch"
+
+    @property
+    def records_search_url(self) -> str:
+        return f"{self.base_url}{RECORDS_PATH}?IdcService=TCEQ_SEARCH"
+
+    def expected(self, zip_codes: list[str]) -> dict:
+        """What a complete scrape and download of zip_codes should produce."""
+        rns = [rn for zip_code in zip_codes for rn in rns_for_zip(zip_code, self.rns_per_zip)]
+        maerts = [doc for rn in rns for doc in documents_for_rn(rn, self.maerts_per_rn) if doc[2] == "MAERT"]
+        return {"rns": len(rns), "maerts": len(maerts)}
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, name="mock-tceq", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local mock of the TCEQ RN search and records sites.")
+    parser.add_argument('--port', type=int, default=8800, help="Port to listen on (default: 8800)")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds added to every response (default: 0.05)")
+    parser.add_argument('--rns-per-zip', type=int, default=25, help="RNs listed for each ZIP code (default: 25)")
+    parser.add_argument('--maerts-per-rn', type=int, default=4, help="MAERT documents listed for each RN (default: 4)")
+    args = parser.parse_args()
+
+    with MockTceqServer(args.port, args.latency, args.rns_per_zip, args.maerts_per_rn) as server:
+        logging.info(f"Serving the mock TCEQ sites at {server.base_url}. Point the scrapers at it with:")
+        logging.info(f"  export TCEQ_RN_SEARCH_URL='{server.rn_search_url}'")
+        logging.info(f"  export TCEQ_SEARCH_URL='{server.records_search_url}'")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
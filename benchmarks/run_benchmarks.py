@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import contextlib
+from io import StringIO
+from pathlib import Path
+from datetime import datetime, timezone
+from importlib.metadata import version
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# ========== PATH SETUP ==========
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from synthetic_maert import synthetic_rows, tricky_lines, write_easy_maert, write_tricky_maert
+from scripts.extract_tables import extract_pdf, COLUMNS
+from utils import tricky_tables
+
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+SCENARIOS = ("easy", "tricky", "lines", "cleanup")
+# Arguments that define the workload; results are only comparable when these match
+WORKLOAD_PARAMETERS = ("pdfs", "sources", "parse_lines", "cleanup_rows", "seed")
+WRITERS = {"easy": write_easy_maert, "tricky": write_tricky_maert}
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+# ========== MEASUREMENT ==========
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def rows_correct(df: pd.DataFrame, expected: list[tuple]) -> int:
+    """Number of expected rows that were extracted with all five values exactly right."""
+    extracted = set(map(tuple, df[COLUMNS].astype(str).values.tolist()))
+    return len(set(expected) & extracted)
+
+
+def bench_extraction(kind: str, n_pdfs: int, n_sources: int, repeat: int, seed: int) -> dict:
+    """
+    Times extract_pdf over n_pdfs synthetic PDFs of one layout. Generating the PDFs isn't timed;
+    each repeat re-extracts them from scratch.
+    """
+    with tempfile.TemporaryDirectory(prefix=f"maert_bench_{kind}_") as tmp_dir:
+        documents = []
+        for i in range(n_pdfs):
+            rows = synthetic_rows(n_sources, seed + i)
+            path = os.path.join(tmp_dir, f"{77000 + i}_{900000 + i}_01-01-2020_{i}.pdf")
+            documents.append((path, rows, WRITERS[kind](path, rows)))
+
+        timings = []
+        for _ in range(repeat):
+            extracted = correct = 0
+            start = time.perf_counter()
+            for path, rows, _ in documents:
+                # The tricky cleanup prints its row counts
+                with contextlib.redirect_stdout(StringIO()):
+                    df, _ = extract_pdf(Path(path))
+                extracted += len(df)
+                correct += rows_correct(df, rows)
+            timings.append(time.perf_counter() - start)
+
+    pages = sum(n_pages for _, _, n_pages in documents)
+    best = min(timings)
+    return {
+        "pdfs": n_pdfs,
+        "pages": pages,
+        "seconds": timings,
+        "best_seconds": best,
+        "pages_per_sec": pages / best,
+        "rows_expected": sum(len(rows) for _, rows, _ in documents),
+        "rows_extracted": extracted,
+        "rows_correct": correct,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_lines(n_lines: int, n_sources: int, repeat: int, seed: int) -> dict:
+    """
+    Times extract_table_custom alone, on at least n_lines text lines of synthetic tricky
+    tables, fed one page (one table) at a time as extract_pdf does.
+    """
+    pages = []
+    total = 0
+    while total < n_lines:
+        lines = tricky_lines(synthetic_rows(n_sources, seed + len(pages)))
+        pages.append(lines)
+        total += len(lines)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = sum(len(tricky_tables.extract_table_custom(lines, COLUMNS)) for lines in pages)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    return {
+        "lines": total,
+        "rows_out": rows,
+        "seconds": timings,
+        "best_seconds": best,
+        "lines_per_sec": total / best,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_cleanup(n_rows: int, n_sources: int, repeat: int, seed: int) -> dict:
+    """
+    Times clean_up_tricky_table alone, on at least n_rows parsed lines of synthetic tricky
+    tables concatenated the way extract_pdf concatenates a document's pages.
+    """
+    pages = []
+    total = 0
+    while total < n_rows:
+        rows = synthetic_rows(n_sources, seed + len(pages))
+        pages.append(tricky_tables.extract_table_custom(tricky_lines(rows), COLUMNS))
+        total += len(rows)
+    df_pages = pd.concat(pages).dropna(axis=0, how='all').reset_index(drop=True)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(StringIO()):
+            df = tricky_tables.clean_up_tricky_table(df_pages)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    return {
+        "rows_in": len(df_pages),
+        "rows_out": len(df),
+        "seconds": timings,
+        "best_seconds": best,
+        "rows_per_sec": len(df_pages) / best,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_scenario(scenario: str, args: argparse.Namespace) -> dict:
+    logging.getLogger().setLevel(logging.WARNING)
+    if scenario == "lines":
+        return bench_lines(args.parse_lines, args.sources, args.repeat, args.seed)
+    if scenario == "cleanup":
+        return bench_cleanup(args.cleanup_rows, args.sources, args.repeat, args.seed)
+    return bench_extraction(scenario, args.pdfs, args.sources, args.repeat, args.seed)
+
+# ========== REPORTING ==========
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": {name: version(name) for name in ("pdfplumber", "pdfminer.six", "pandas", "numpy")},
+    }
+
+
+def throughput(result: dict) -> float:
+    for key in ("pages_per_sec", "lines_per_sec", "rows_per_sec"):
+        if key in result:
+            return result[key]
+
+
+def compare(results: dict, parameters: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline_run = json.load(f)
+    baseline = baseline_run["results"]
+    # Parameters missing from an older results file belong to scenarios it didn't have
+    changed = [name for name in WORKLOAD_PARAMETERS
+               if name in baseline_run["parameters"] and baseline_run["parameters"][name] != parameters[name]]
+    if changed:
+        logging.warning(f"Workload differs from {baseline_path} ({', '.join(changed)}); numbers are not directly comparable.")
+    for scenario, result in results.items():
+        if scenario not in baseline:
+            continue
+        before, after = baseline[scenario], result
+        message = (f"{scenario}: {throughput(after) / throughput(before):.2f}x throughput, "
+                   f"peak RSS {before['peak_rss_mb']:.0f} -> {after['peak_rss_mb']:.0f} MB")
+        if "rows_correct" in after:
+            message += f", rows correct {before['rows_correct']} -> {after['rows_correct']}"
+            if after["rows_correct"] < before["rows_correct"] and after["rows_expected"] == before["rows_expected"]:
+                logging.warning(f"{scenario}: fewer rows extracted correctly than in {baseline_path}")
+        logging.info(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MAERT extraction on synthetic easy and tricky PDFs.")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS),
+                        help="Scenarios to run (default: all)")
+    parser.add_argument('--pdfs', type=int, default=5, help="Synthetic PDFs per scenario (default: 5)")
+    parser.add_argument('--sources', type=int, default=100,
+                        help="Emission sources per PDF, each with 2-5 contaminant rows (default: 100)")
+    parser.add_argument('--parse-lines', type=int, default=100_000,
+                        help="Minimum text lines fed to extract_table_custom in the lines scenario (default: 100000)")
+    parser.add_argument('--cleanup-rows', type=int, default=100_000,
+                        help="Minimum table rows fed to clean_up_tricky_table in the cleanup scenario (default: 100000)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per scenario; the best is reported (default: 3)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the synthetic tables (default: 0)")
+    parser.add_argument('--output', help="JSON file to write results to (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', metavar='BASELINE_JSON', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = {}
+    for scenario in args.scenarios:
+        # A fresh process per scenario, so each peak RSS is that scenario's own
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(run_scenario, scenario, args).result()
+        results[scenario] = result
+        if scenario == "lines":
+            logging.info(f"lines: {result['lines']} lines in {result['best_seconds']:.3f}s "
+                         f"({result['lines_per_sec']:.0f} lines/sec), peak RSS {result['peak_rss_mb']:.0f} MB")
+        elif scenario == "cleanup":
+            logging.info(f"cleanup: {result['rows_in']} rows in {result['best_seconds']:.3f}s "
+                         f"({result['rows_per_sec']:.0f} rows/sec), peak RSS {result['peak_rss_mb']:.0f} MB")
+        else:
+            logging.info(f"{scenario}: {result['pages']} pages in {result['best_seconds']:.2f}s "
+                         f"({result['pages_per_sec']:.1f} pages/sec), {result['rows_correct']}/{result['rows_expected']} "
+                         f"rows correct ({result['rows_extracted']} extracted), peak RSS {result['peak_rss_mb']:.0f} MB")
+
+    created_at = datetime.now(timezone.utc)
+    output = args.output or os.path.join(RESULTS_DIR, f"{created_at:%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            "created_at": created_at.isoformat(timespec="seconds"),
+            "environment": environment(),
+            "parameters": {name: getattr(args, name) for name in WORKLOAD_PARAMETERS + ("repeat",)},
+            "results": results,
+        }, f, indent=2)
+    logging.info(f"Saved results to {output}")
+
+    if args.compare:
+        compare(results, vars(args), args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import os
+import random
+import argparse
+import logging
+from pathlib import Path
+
+# Synthetic MAERT PDFs for benchmarking extraction, written with a minimal PDF writer
+# (standard Type 1 fonts, text and line operators only) so no PDF library is needed.
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+TOP, BOTTOM, LEFT = 740, 60, 40
+
+HEADER = ["Emission Source", "Source Name", "Air Contaminant Name", "Emission Rate lbs/hr", "Emission Rate tons/year"]
+FOOTNOTE = "(1) Emission point identification - either specific equipment designation or emission point number from plot plan."
+
+SOURCE_NAMES = ["Boiler", "Process Heater", "Flare", "Cooling Tower", "Storage Tank", "Loading Rack",
+                "Fugitives", "Thermal Oxidizer", "Emergency Generator", "Furnace"]
+CONTAMINANTS = ["NOx", "CO", "VOC", "SO2", "PM", "PM10", "PM2.5", "H2S", "NH3", "Benzene"]
+
+# Easy tables: ruled grid, Helvetica 8pt
+EASY_COLUMN_X = [LEFT, 110, 250, 380, 470, 572]
+EASY_ROW_HEIGHT = 14
+# Tricky tables: whitespace-aligned Courier 8pt text lines, no rules
+TRICKY_LINE_HEIGHT = 10
+TRICKY_FORMAT = "{:<10}   {:<26}   {:<12}   {:>10}   {:>10}"
+TRICKY_HEADER = [
+    "Emission Point No. (1)   Source Name (2)   Air Contaminant Name (3)   Emission Rates   lbs/hour   TPY",
+    "-" * 100,
+]
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class MinimalPdf:
+    """
+    Just enough of a PDF writer for the synthetic MAERTs: pages are lists of content-stream
+    operators, F1 is Helvetica and F2 is Courier.
+    """
+
+    def __init__(self):
+        self.pages = []
+
+    def new_page(self) -> list[str]:
+        self.pages.append([])
+        return self.pages[-1]
+
+    @staticmethod
+    def text(ops: list[str], x: float, y: float, text: str, font: str = "F1", size: float = 8):
+        ops.append(f"BT /{font} {size} Tf {x:.2f} {y:.2f} Td ({_escape(text)}) Tj ET")
+
+    @staticmethod
+    def line(ops: list[str], x1: float, y1: float, x2: float, y2: float):
+        ops.append(f"{x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S")
+
+    def save(self, path):
+        n_pages = len(self.pages)
+        # 1 catalog, 2 page tree, 3-4 fonts, then a page and a content stream object per page
+        page_ids = [5 + 2 * i for i in range(n_pages)]
+        objects = {
+            1: b"<< /Type /Catalog /Pages 2 0 R >>",
+            2: f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {n_pages} >>".encode(),
+            3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+            4: b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+        }
+        for page_id, ops in zip(page_ids, self.pages):
+            content = "\n".join(["0.5 w"] + ops).encode("latin-1")
+            objects[page_id] = (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {page_id + 1} 0 R >>"
+            ).encode()
+            objects[page_id + 1] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content)
+
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = {}
+        for obj_id in sorted(objects):
+            offsets[obj_id] = len(out)
+            out += b"%d 0 obj\n%s\nendobj\n" % (obj_id, objects[obj_id])
+        xref_offset = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        for obj_id in sorted(objects):
+            out += b"%010d 00000 n \n" % offsets[obj_id]
+        out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+
+        with open(path, 'wb') as f:
+            f.write(out)
+
+
+def synthetic_rows(n_sources: int, seed: int = 0) -> list[tuple[str, str, str, str, str]]:
+    """
+    MAERT rows for n_sources emission sources, each with two to five contaminants.
+    Values are strings, as they appear in the PDF.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_sources):
+        epn = f"EPN-{i + 1:04d}"
+        name = f"{rng.choice(SOURCE_NAMES)} {i + 1}"
+        for contaminant in rng.sample(CONTAMINANTS, rng.randint(2, 5)):
+            rows.append((epn, name, contaminant, f"{rng.uniform(0, 50):.2f}", f"{rng.uniform(0, 200):.2f}"))
+    return rows
+
+
+def write_easy_maert(path, rows) -> int:
+    """
+    Writes rows as a ruled table with the header repeated on every page. As in real MAERTs,
+    a source's Emission Source and Source Name cells span all of its contaminant rows (and are
+    repeated at the top of a page). Returns the page count.
+    """
+    pdf = MinimalPdf()
+    rows_per_page = (TOP - BOTTOM) // EASY_ROW_HEIGHT - 2
+    previous_source = None
+
+    for start in range(0, max(len(rows), 1), rows_per_page):
+        ops = pdf.new_page()
+        page_rows = [HEADER]
+        for epn, name, contaminant, lbs, tpy in rows[start:start + rows_per_page]:
+            first = epn != previous_source or len(page_rows) == 1
+            page_rows.append([epn if first else "", name if first else "", contaminant, lbs, tpy])
+            previous_source = epn
+
+        y = TOP
+        for row in page_rows:
+            # Rules between rows of the same source leave out the two spanning columns
+            MinimalPdf.line(ops, EASY_COLUMN_X[0 if row[0] else 2], y, EASY_COLUMN_X[-1], y)
+            for x, cell in zip(EASY_COLUMN_X, row):
+                MinimalPdf.text(ops, x + 2, y - EASY_ROW_HEIGHT + 4, cell[:30])
+            y -= EASY_ROW_HEIGHT
+        MinimalPdf.line(ops, EASY_COLUMN_X[0], y, EASY_COLUMN_X[-1], y)
+        for x in EASY_COLUMN_X:
+            MinimalPdf.line(ops, x, TOP, x, y)
+
+    MinimalPdf.text(ops, LEFT, y - 20, FOOTNOTE)
+    pdf.save(path)
+    return len(pdf.pages)
+
+
+def tricky_lines(rows) -> list[str]:
+    """Table body lines of a tricky MAERT, as its text comes out of pdfplumber."""
+    lines = []
+    previous_source = None
+    for epn, name, contaminant, lbs, tpy in rows:
+        if epn != previous_source:
+            lines.append(TRICKY_FORMAT.format(epn, name, contaminant, lbs, tpy))
+        else:
+            lines.append(TRICKY_FORMAT.format("", "", contaminant, lbs, tpy))
+        previous_source = epn
+    return lines
+
+
+def write_tricky_maert(path, rows) -> int:
+    """
+    Writes rows as whitespace-aligned monospaced text, continuation rows indented under their
+    source. Every page starts with a "... lbs/hour TPY" header and a rule of dashes and ends
+    with a page footer. Returns the page count.
+    """
+    pdf = MinimalPdf()
+    lines = tricky_lines(rows) + [FOOTNOTE]
+
+    lines_per_page = (TOP - BOTTOM) // TRICKY_LINE_HEIGHT - 2
+    for start in range(0, len(lines), lines_per_page):
+        ops = pdf.new_page()
+        y = TOP
+        for line in TRICKY_HEADER + lines[start:start + lines_per_page]:
+            MinimalPdf.text(ops, LEFT, y, line, font="F2")
+            y -= TRICKY_LINE_HEIGHT
+        MinimalPdf.text(ops, LEFT, BOTTOM - 20, f"Page {len(pdf.pages)}", font="F2")
+
+    pdf.save(path)
+    return len(pdf.pages)
+
+
+WRITERS = {"easy": write_easy_maert, "tricky": write_tricky_maert}
+
+
+def write_corpus(output_dir, n_pdfs: int, n_sources: int, kind: str = "mixed", seed: int = 0) -> list[Path]:
+    """
+    Writes n_pdfs synthetic MAERTs named like real downloads ({zipcode}_{permit}_{date}_{id}.pdf),
+    alternating easy and tricky layouts when kind is "mixed".
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i in range(n_pdfs):
+        layout = kind if kind != "mixed" else ("easy", "tricky")[i % 2]
+        path = Path(output_dir) / f"{77000 + i}_{900000 + i}_01-01-2020_{i}.pdf"
+        WRITERS[layout](path, synthetic_rows(n_sources, seed + i))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic easy (ruled) and tricky (whitespace-aligned) MAERT PDFs.")
+    parser.add_argument('output_dir', help="Directory to write the PDFs to")
+    parser.add_argument('--pdfs', type=int, default=10, help="Number of PDFs to write (default: 10)")
+    parser.add_argument('--sources', type=int, default=50, help="Emission sources per PDF (default: 50)")
+    parser.add_argument('--kind', choices=["easy", "tricky", "mixed"], default="mixed",
+                        help="Table layout (default: mixed, alternating)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    paths = write_corpus(args.output_dir, args.pdfs, args.sources, args.kind, args.seed)
+    logging.info(f"Wrote {len(paths)} synthetic MAERT PDFs to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,70 @@
 # Library imports
 import os
 import time
-import shutil
-import glob
+import sys
 import logging
+import argparse
 import tempfile
+import threading
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
+from urllib.parse import urljoin
 import pandas as pd
+import urllib3
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
+from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException, NoSuchElementException
 from dotenv import load_dotenv
-from PyPDF2 import PdfReader
+import trio
 
 # Load environment variables
 load_dotenv()
 
 # Constants
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BASE_DIR))
+
+from utils.waits import wait_metrics, wait_until, wait_for_download, clear_downloads, polled_estimate
+from utils.download_ledger import DownloadLedger
+from utils.pdf_store import PdfStore
+from utils.pdf_validation import validate_pdf
+from utils.instrumentation import metrics, profiled
+from utils.cdp import launch_browser, link_text_xpath
+
 DATA_PATH = os.path.join(BASE_DIR, '..', 'data', 'raw_pdfs')
 RNS_CSV_PATH = os.path.join(BASE_DIR, '..', 'data', "rns_by_zipcode.csv")
 DOWNLOAD_COUNTS_PATH = os.path.join(BASE_DIR, 'download_counts.csv')
 DOWNLOAD_LOGS_PATH = os.path.join(BASE_DIR, 'download_logs.csv')
+LEDGER_PATH = os.path.join(BASE_DIR, '..', 'data', 'download_ledger.sqlite')
+PDF_STORE_PATH = os.path.join(BASE_DIR, '..', 'data', 'pdf_store')
+# Overridable (e.g. in .env) to point the downloader at a local stand-in of the records site
+SEARCH_URL = os.getenv("TCEQ_SEARCH_URL", "https://records.tceq.texas.gov/cs/idcplg?IdcService=TCEQ_SEARCH")
+DEFAULT_REQUESTS_PER_SECOND = 1.0
+BACKENDS = ("browser", "http")
+ENGINES = ("selenium", "cdp")
+HTTP_FETCH_WORKERS = 4
+IMPLICIT_WAIT = 5
+RESULTS_TABLE_XPATH = '/html/body/table[1]/tbody/tr[5]/td/table/tbody/tr/td/div/table[3]/tbody/tr/td[2]/table'
+NO_RESULTS_XPATH = '//span[contains(text(), "Found 0 potential items")]'
+SEARCH_FIELD_XPATH = '/html/body/table[1]/tbody/tr[5]/td/table/tbody/tr/td/div/form/table/tbody/tr[4]/td/table/tbody/tr[1]/td[1]/select'
+SEARCH_INPUT_XPATH = '/html/body/table[1]/tbody/tr[5]/td/table/tbody/tr/td/div/form/table/tbody/tr[4]/td/table/tbody/tr[1]/td[2]/input'
+SEARCH_BUTTON_XPATH = '/html/body/table[1]/tbody/tr[5]/td/table/tbody/tr/td/div/form/table/tbody/tr[4]/td/table/tbody/tr[5]/td[3]/div/button[1]'
+PAGE_SELECT_XPATH = "//select[contains(@name, 'pageSelectList')]"
+# XPath equivalents of the Selenium locators, for the CDP engine
+RECORD_SERIES_XPATH = "//*[@id='xRecordSeries']"
+DOCUMENT_TYPE_XPATH = "//*[@id='xInsightDocumentType']"
+
+# One keep-alive connection pool shared by every worker's direct PDF fetches
+http = urllib3.PoolManager(
+    maxsize=HTTP_FETCH_WORKERS,
+    block=True,
+    retries=urllib3.Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504]),
+    timeout=urllib3.Timeout(connect=10, read=60),
+)
 
-os.makedirs(DATA_PATH, exist_ok=True)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Helper functions
@@ -33,25 +73,27 @@ def read_rn_numbers_and_zipcodes(csv_path):
     df = df.dropna(subset=['rn_number', 'zipcode'])
     return df[['rn_number', 'zipcode']].drop_duplicates()
 
-def wait_for_download(directory, timeout=30):
-    seconds = 0
-    while seconds < timeout:
-        files = glob.glob(f"{directory}/*")
-        if files:
-            return max(files, key=os.path.getctime)
-        time.sleep(1)
-        seconds += 1
-    return None
-
-def validate_pdf(file_path):
-    try:
-        with open(file_path, 'rb') as f:
-            PdfReader(f)
-        return True
-    except Exception as e:
-        logging.warning(f"Invalid PDF detected: {file_path}. Error: {e}")
-        return False
+class RateLimiter:
+    """
+    Politeness limit shared by every worker: page loads and clicks against the records
+    site are spaced at least 1 / requests_per_second seconds apart overall.
+    """
+
+    def __init__(self, requests_per_second=DEFAULT_REQUESTS_PER_SECOND):
+        self.min_interval = 1 / requests_per_second if requests_per_second > 0 else 0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+            metrics.record("wait.rate_limit", delay)
 
+@metrics.timed("download.init_driver")
 def init_driver(download_dir):
     options = webdriver.ChromeOptions()
     prefs = {"download.default_directory": download_dir, "plugins.always_open_pdf_externally": True}
@@ -60,9 +102,61 @@ def init_driver(download_dir):
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
     driver = webdriver.Chrome(options=options)
-    driver.implicitly_wait(5)
+    driver.implicitly_wait(IMPLICIT_WAIT)
     return driver
 
+class DriverSession:
+    """
+    Keeps one headless Chrome warm across RNs instead of launching a new browser per RN.
+
+    Between RNs the browser is reset (cookies cleared, blank page) and its downloads are
+    pointed at that RN's own directory through the DevTools Page.setDownloadBehavior command.
+    A session that has crashed or been disconnected is quit and relaunched on the next acquire,
+    and the browser is also relaunched every max_uses RNs to keep memory growth in check.
+    """
+
+    def __init__(self, max_uses=50):
+        self.max_uses = max_uses
+        self.driver = None
+        self.uses = 0
+
+    def is_alive(self):
+        try:
+            self.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def acquire(self, download_dir):
+        if self.driver is not None and (self.uses >= self.max_uses or not self.is_alive()):
+            self.recycle()
+
+        if self.driver is None:
+            self.driver = init_driver(download_dir)
+            self.uses = 0
+        else:
+            self.reset()
+
+        self.driver.execute_cdp_cmd("Page.setDownloadBehavior", {"behavior": "allow", "downloadPath": download_dir})
+        self.uses += 1
+        return self.driver
+
+    def reset(self):
+        self.driver.delete_all_cookies()
+        self.driver.get("about:blank")
+
+    def recycle(self):
+        logging.info("Recycling browser session.")
+        self.close()
+
+    def close(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except WebDriverException as e:
+                logging.warning(f"Error while quitting browser: {e}")
+            self.driver = None
+
 def safe_click(driver, by, value, retries=3, description=None):
     for attempt in range(retries):
         try:
@@ -77,132 +171,508 @@ def safe_click(driver, by, value, retries=3, description=None):
     return False
 
 def wait_for_results_or_empty(driver, rn, zipcode, timeout=10):
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        try:
-            if driver.find_element(By.XPATH, '//span[contains(text(), "Found 0 potential items")]'):
-                logging.info(f"(Zip: {zipcode}) No MAERT found for RN {rn}.")
-                return False
-        except NoSuchElementException:
-            pass
-        try:
-            driver.find_element(By.XPATH, '/html/body/table[1]/tbody/tr[5]/td/table/tbody/tr/td/div/table[3]/tbody/tr/td[2]/table')
-            logging.info("Results table found.")
-            return True
-        except NoSuchElementException:
-            pass
-        time.sleep(0.5)
-    logging.warning("Timeout while waiting for results or empty message.")
-    return False
+    try:
+        wait_until(driver, EC.any_of(EC.presence_of_element_located((By.XPATH, NO_RESULTS_XPATH)),
+                                     EC.presence_of_element_located((By.XPATH, RESULTS_TABLE_XPATH))),
+                   timeout, "search results", lambda waited: polled_estimate(waited, 0.5), IMPLICIT_WAIT)
+    except TimeoutException:
+        logging.warning("Timeout while waiting for results or empty message.")
+        return None
+
+    if driver.find_elements(By.XPATH, NO_RESULTS_XPATH):
+        logging.info(f"(Zip: {zipcode}) No MAERT found for RN {rn}.")
+        return False
+    logging.info("Results table found.")
+    return True
 
-def log_downloaded_file(rn_number, file_name, zipcode):
-    row = pd.DataFrame([{'rn_number': rn_number, 'file_name': file_name, 'zipcode': zipcode}])
-    if not os.path.exists(DOWNLOAD_LOGS_PATH):
-        row.to_csv(DOWNLOAD_LOGS_PATH, index=False)
+def save_maert(ledger, pdf_store, downloaded, check, rn, zipcode, permit_number, date, document_id, on_saved=None):
+    """
+    Adds a downloaded MAERT to the content-addressed pdf_store and links it into DATA_PATH.
+    Content already saved for the same zipcode, permit and date reuses that file instead of
+    adding another name for it. The validation verdict is recorded against the content so the
+    extractor doesn't have to check the file again.
+
+    on_saved, if given, is called with the path and SHA-256 of each newly linked file once it is
+    in the ledger (it may block, e.g. to make downloading wait for extraction to catch up).
+    """
+    sha256, _, is_new = pdf_store.add(downloaded)
+    ledger.record_check(sha256, check)
+    existing = ledger.find_file(sha256, zipcode, permit_number, date)
+    if existing and os.path.exists(os.path.join(DATA_PATH, existing)):
+        final_name = existing
+        logging.info(f"(Zip: {zipcode}) Permit {permit_number} is identical to {existing}; not saved again")
     else:
-        row.to_csv(DOWNLOAD_LOGS_PATH, mode='a', header=False, index=False)
+        unique_id = int(time.time() * 1e6)
+        formatted_date = date.split()[0].replace('/', '-')
+        final_name = f"{zipcode}_{permit_number}_{formatted_date}_{unique_id}.pdf"
+        final_path = os.path.join(DATA_PATH, final_name)
+        pdf_store.link(sha256, final_path)
+        logging.info(f"(Zip: {zipcode}) Saved to {final_path}" + ("" if is_new else " (content already stored)"))
+    ledger.record_document(document_id, rn, zipcode, permit_number, date, final_name, sha256=sha256)
+    metrics.count("documents_saved")
+    if on_saved and final_name != existing:
+        on_saved(os.path.join(DATA_PATH, final_name), sha256)
 
-def load_logged_rns():
-    if os.path.exists(DOWNLOAD_LOGS_PATH):
-        df = pd.read_csv(DOWNLOAD_LOGS_PATH)
-        return set(df['rn_number'].unique())
-    return set()
+def record_failure(ledger, document_id, rn, zipcode, permit_number, date, note):
+    logging.warning(f"(Zip: {zipcode}) {note} for {permit_number}")
+    metrics.count("documents_failed")
+    ledger.record_document(document_id, rn, zipcode, permit_number, date, status="failed", note=note)
 
-def scrape_maert_for_rns(rn_zip_df):
-    downloaded_rns = load_logged_rns()
+def discard_downloads(tmp_dir, zipcode):
+    """Deletes whatever a document left in the download directory: a rejected or late download."""
+    for name in clear_downloads(tmp_dir):
+        logging.warning(f"(Zip: {zipcode}) Deleted rejected download {name}")
 
-    for _, row in rn_zip_df.iterrows():
-        rn = row['rn_number']
-        zipcode = str(row['zipcode'])
+def new_links(ledger, links):
+    """The links of a results page whose documents the ledger doesn't have yet."""
+    return [link for link in links if not ledger.is_downloaded(link[0])]
 
-        if rn in downloaded_rns:
-            logging.info(f"Skipping already logged RN: {rn} (Zip: {zipcode})")
-            continue
+def parse_maert_links(table_html, base_url):
+    """
+    Returns (link text, absolute document URL, permit number, date) for each MAERT row of a results table.
+    """
+    df = pd.read_html(StringIO(table_html), extract_links="body")[0]
+    text = df.map(lambda cell: cell[0] if isinstance(cell, tuple) else cell)
+    maerts = df[text.iloc[:, 12] == 'MAERT']
+    links = []
+    for (hyperlink, href), (permit_number, _), (date, _) in zip(maerts.iloc[:, 2], maerts.iloc[:, 6], maerts.iloc[:, 16]):
+        links.append((hyperlink, urljoin(base_url, href) if href else None, permit_number, date))
+    return links
 
-        logging.info(f"Processing RN: {rn} (Zip: {zipcode})")
+def browser_headers(driver):
+    """Headers that let a plain HTTP client reuse the browser's session on the records site."""
+    cookies = "; ".join(f"{c['name']}={c['value']}" for c in driver.get_cookies())
+    return {
+        "Cookie": cookies,
+        "User-Agent": driver.execute_script("return navigator.userAgent"),
+        "Referer": driver.current_url,
+    }
 
+def fetch_pdf(url, dest_path, headers, rate_limiter):
+    """
+    Streams a document straight to disk over the shared keep-alive pool and validates it.
+    Returns dest_path and its validation result, or None (deleting whatever was fetched) if the
+    response was not a valid PDF.
+    """
+    rate_limiter.wait()
+    with metrics.span("download.fetch", url=url) as span:
+        response = http.request("GET", url, headers=headers, preload_content=False)
         try:
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                driver = init_driver(tmp_dir)
-                driver.get("https://records.tceq.texas.gov/cs/idcplg?IdcService=TCEQ_SEARCH")
+            span["status"] = response.status
+            if response.status != 200:
+                logging.warning(f"HTTP {response.status} fetching {url}")
+                return None
+            with open(dest_path, 'wb') as f:
+                for chunk in response.stream(1 << 16):
+                    f.write(chunk)
+            span["bytes"] = os.path.getsize(dest_path)
+        finally:
+            response.release_conn()
+    check = validate_pdf(dest_path)
+    if not check.valid:
+        os.remove(dest_path)
+        return None
+    return dest_path, check
+
+def download_maerts_for_rn(driver, ledger, pdf_store, rn, zipcode, tmp_dir, rate_limiter=None, backend="browser",
+                           on_saved=None):
+    """
+    Searches the TCEQ records site for an RN's MAERTs and downloads each one into DATA_PATH,
+    recording each document in the ledger and storing its content in pdf_store.
+    With the "browser" backend each MAERT link is clicked and the driver's downloads must already be
+    directed to tmp_dir; the "http" backend fetches the linked PDFs directly, several at a time,
+    reusing the browser's cookies. Documents the ledger already has are skipped, and on_saved is
+    passed on to save_maert.
+
+    Returns the RN's new ledger status: "done", "no_maert", "incomplete" (some documents or
+    results pages failed) or "failed" (the search itself failed).
+    """
+    rate_limiter = rate_limiter or RateLimiter(0)
+
+    with metrics.span("download.search", rn=rn) as span:
+        rate_limiter.wait()
+        driver.get(SEARCH_URL)
+
+        try:
+            Select(driver.find_element(By.ID, 'xRecordSeries')).select_by_value('1081')
+            Select(driver.find_element(By.ID, 'xInsightDocumentType')).select_by_value('27')
+            Select(driver.find_element(By.XPATH, SEARCH_FIELD_XPATH)).select_by_value('xRefNumTxt')
+        except Exception as e:
+            logging.error(f"Failed to select dropdowns: {e}")
+            return "failed"
+
+        try:
+            driver.find_element(By.XPATH, SEARCH_INPUT_XPATH).send_keys(rn)
+            rate_limiter.wait()
+            safe_click(driver, By.XPATH, SEARCH_BUTTON_XPATH, description='Search button')
+
+            found = wait_for_results_or_empty(driver, rn, zipcode)
+            span["found"] = found
+            if found is None:
+                return "failed"
+            if not found:
+                return "no_maert"
+        except Exception as e:
+            logging.error(f"Failed to enter RN or click Search: {e}")
+            return "failed"
 
+    try:
+        select_element = driver.find_element(By.XPATH, PAGE_SELECT_XPATH)
+        select = Select(select_element)
+        total_pages = len(select.options)
+    except Exception:
+        total_pages = 1
+
+    maerts_listed = 0
+    complete = True
+
+    for page_index in range(total_pages):
+        # The first results page is already showing after the search
+        if page_index > 0:
+            with metrics.span("download.results_page", rn=rn, page=page_index + 1):
                 try:
-                    Select(driver.find_element(By.ID, 'xRecordSeries')).select_by_value('1081')
-                    Select(driver.find_element(By.ID, 'xInsightDocumentType')).select_by_value('27')
-                    Select(driver.find_element(By.XPATH, '/html/body/table[1]/tbody/tr[5]/td/table/tbody/tr/td/div/form/table/tbody/tr[4]/td/table/tbody/tr[1]/td[1]/select')).select_by_value('xRefNumTxt')
+                    old_table = driver.find_element(By.XPATH, RESULTS_TABLE_XPATH)
+                    select_element = driver.find_element(By.XPATH, PAGE_SELECT_XPATH)
+                    select = Select(select_element)
+                    rate_limiter.wait()
+                    select.select_by_index(page_index)
                 except Exception as e:
-                    logging.error(f"Failed to select dropdowns: {e}")
-                    driver.quit()
-                    continue
+                    logging.warning(f"Failed to select page {page_index+1}: {e}")
+                    complete = False
+                    break
 
                 try:
-                    driver.find_element(By.XPATH, '/html/body/table[1]/tbody/tr[5]/td/table/tbody/tr/td/div/form/table/tbody/tr[4]/td/table/tbody/tr[1]/td[2]/input').send_keys(rn)
-                    safe_click(driver, By.XPATH, '/html/body/table[1]/tbody/tr[5]/td/table/tbody/tr/td/div/form/table/tbody/tr[4]/td/table/tbody/tr[5]/td[3]/div/button[1]', description='Search button')
+                    wait_until(driver, lambda d: EC.staleness_of(old_table)(d) and d.find_elements(By.XPATH, RESULTS_TABLE_XPATH),
+                               10, "results page", 2, IMPLICIT_WAIT)
+                except TimeoutException:
+                    logging.warning(f"Timed out waiting for results page {page_index+1} to load.")
 
-                    if not wait_for_results_or_empty(driver, rn, zipcode):
-                        driver.quit()
-                        continue
-                except Exception as e:
-                    logging.error(f"Failed to enter RN or click Search: {e}")
-                    driver.quit()
-                    continue
+        try:
+            table_el = driver.find_element(By.XPATH, RESULTS_TABLE_XPATH)
+            table_html = table_el.get_attribute('outerHTML')
+            with metrics.span("download.parse_results", rn=rn, page=page_index + 1):
+                links = parse_maert_links(table_html, driver.current_url)
+        except Exception as e:
+            logging.warning(f"[Page {page_index+1}] Table parsing failed: {e}")
+            complete = False
+            continue
+
+        maerts_listed += len(links)
+        links = new_links(ledger, links)
+
+        if backend == "http":
+            complete &= fetch_maerts_http(driver, ledger, pdf_store, links, rn, zipcode, tmp_dir, rate_limiter, on_saved)
+            continue
+
+        for hyperlink, _, permit_number, date in links:
+            try:
+                logging.info(f"(Zip: {zipcode}) Downloading permit {permit_number} for RN {rn}")
+                rate_limiter.wait()
+                with metrics.span("download.document", rn=rn, document=hyperlink):
+                    safe_click(driver, By.LINK_TEXT, hyperlink, description=f"MAERT link: {hyperlink}")
+                    downloaded = wait_for_download(tmp_dir)
+                check = validate_pdf(downloaded) if downloaded else None
+                if check and check.valid:
+                    save_maert(ledger, pdf_store, downloaded, check, rn, zipcode, permit_number, date, hyperlink, on_saved)
+                else:
+                    record_failure(ledger, hyperlink, rn, zipcode, permit_number, date, "Invalid or missing PDF")
+                    complete = False
+            except Exception as err:
+                record_failure(ledger, hyperlink, rn, zipcode, permit_number, date, f"Error downloading: {err}")
+                complete = False
+            finally:
+                discard_downloads(tmp_dir, zipcode)
 
+    if not complete:
+        return "incomplete"
+    if not maerts_listed:
+        logging.info(f"(Zip: {zipcode}) No MAERT found for RN {rn}.")
+        return "no_maert"
+    return "done"
+
+def fetch_maerts_http(driver, ledger, pdf_store, links, rn, zipcode, tmp_dir, rate_limiter, on_saved=None):
+    """
+    Direct-HTTP backend for one results page: fetches its MAERT PDFs in parallel, then saves them in table order.
+    Returns True if every document was saved.
+    """
+    return fetch_links_http(browser_headers(driver), ledger, pdf_store, links, rn, zipcode, tmp_dir, rate_limiter, on_saved)
+
+def fetch_links_http(headers, ledger, pdf_store, links, rn, zipcode, tmp_dir, rate_limiter, on_saved=None):
+    complete = True
+
+    with ThreadPoolExecutor(max_workers=HTTP_FETCH_WORKERS) as executor:
+        futures = []
+        for index, (hyperlink, url, permit_number, date) in enumerate(links):
+            if url is None:
+                record_failure(ledger, hyperlink, rn, zipcode, permit_number, date, "No document link")
+                complete = False
+                continue
+            logging.info(f"(Zip: {zipcode}) Fetching permit {permit_number} for RN {rn}: {url}")
+            dest_path = os.path.join(tmp_dir, f"maert_{index}.pdf")
+            futures.append((hyperlink, permit_number, date, executor.submit(fetch_pdf, url, dest_path, headers, rate_limiter)))
+
+        for hyperlink, permit_number, date, future in futures:
+            try:
+                downloaded = future.result()
+                if downloaded:
+                    save_maert(ledger, pdf_store, *downloaded, rn, zipcode, permit_number, date, hyperlink, on_saved)
+                else:
+                    record_failure(ledger, hyperlink, rn, zipcode, permit_number, date, "Invalid or missing PDF")
+                    complete = False
+            except Exception as err:
+                record_failure(ledger, hyperlink, rn, zipcode, permit_number, date, f"Error downloading: {err}")
+                complete = False
+
+    return complete
+
+def download_worker(worker_id, rn_queue, ledger, pdf_store, rate_limiter, backend="browser", on_saved=None):
+    """
+    Pulls (RN, zipcode) pairs off the shared queue until it is empty, using its own browser
+    and a fresh per-RN download directory so files from different workers never mix.
+    """
+    session = DriverSession()
+    try:
+        while True:
+            try:
+                rn, zipcode = rn_queue.get_nowait()
+            except Empty:
+                return
+
+            logging.info(f"[Worker {worker_id}] Processing RN: {rn} (Zip: {zipcode})")
+            ledger.mark_rn(rn, zipcode, "in_progress")
+
+            try:
+                with tempfile.TemporaryDirectory(prefix=f"maert_worker{worker_id}_") as tmp_dir:
+                    driver = session.acquire(tmp_dir)
+                    ledger.mark_rn(rn, zipcode, download_maerts_for_rn(driver, ledger, pdf_store, rn, zipcode, tmp_dir,
+                                                                       rate_limiter, backend, on_saved))
+            except WebDriverException as e:
+                logging.error(f"(Zip: {zipcode}) Browser error processing RN {rn}: {e}")
+                session.recycle()
+            except Exception as e:
+                logging.error(f"(Zip: {zipcode}) Error processing RN {rn}: {e}")
+    finally:
+        session.close()
+
+async def wait_for_results_or_empty_cdp(tab, rn, zipcode, timeout=10):
+    try:
+        await tab.wait_for_xpath(NO_RESULTS_XPATH, RESULTS_TABLE_XPATH, timeout=timeout, label="search results",
+                                 previous=lambda waited: polled_estimate(waited, 0.5))
+    except TimeoutError:
+        logging.warning("Timeout while waiting for results or empty message.")
+        return None
+
+    if await tab.exists(NO_RESULTS_XPATH):
+        logging.info(f"(Zip: {zipcode}) No MAERT found for RN {rn}.")
+        return False
+    logging.info("Results table found.")
+    return True
+
+async def download_maerts_for_rn_cdp(tab, ledger, pdf_store, rn, zipcode, tmp_dir, rate_limiter, backend="browser",
+                                     on_saved=None):
+    """
+    download_maerts_for_rn for the CDP engine: the same search, pagination and per-document
+    handling, driving a tab whose downloads go to tmp_dir. Blocking steps (rate limiting, ledger
+    lookups and writes, waiting for a download, validating and storing a PDF, direct HTTP fetches)
+    run in threads so other tabs keep going.
+    """
+    async def wait_for_slot():
+        await trio.to_thread.run_sync(rate_limiter.wait)
+
+    with metrics.span("download.search", rn=rn, engine="cdp") as span:
+        await wait_for_slot()
+        await tab.goto(SEARCH_URL)
+
+        try:
+            await tab.select(RECORD_SERIES_XPATH, '1081')
+            await tab.select(DOCUMENT_TYPE_XPATH, '27')
+            await tab.select(SEARCH_FIELD_XPATH, 'xRefNumTxt')
+        except Exception as e:
+            logging.error(f"Failed to select dropdowns: {e}")
+            return "failed"
+
+        try:
+            await tab.type(SEARCH_INPUT_XPATH, rn)
+            await wait_for_slot()
+            logging.info("Clicking: Search button")
+            await tab.click(SEARCH_BUTTON_XPATH)
+
+            found = await wait_for_results_or_empty_cdp(tab, rn, zipcode)
+            span["found"] = found
+            if found is None:
+                return "failed"
+            if not found:
+                return "no_maert"
+        except Exception as e:
+            logging.error(f"Failed to enter RN or click Search: {e}")
+            return "failed"
+
+    total_pages = await tab.option_count(PAGE_SELECT_XPATH) or 1
+    maerts_listed = 0
+    complete = True
+
+    for page_index in range(total_pages):
+        # The first results page is already showing after the search
+        if page_index > 0:
+            with metrics.span("download.results_page", rn=rn, page=page_index + 1, engine="cdp"):
                 try:
-                    select_element = driver.find_element(By.XPATH, "//select[contains(@name, 'pageSelectList')]")
-                    select = Select(select_element)
-                    total_pages = len(select.options)
-                except Exception:
-                    total_pages = 1
-                
-                maert_downloaded = False
-
-                for page_index in range(total_pages):
-                    if total_pages > 1:
-                        try:
-                            select_element = driver.find_element(By.XPATH, "//select[contains(@name, 'pageSelectList')]")
-                            select = Select(select_element)
-                            select.select_by_index(page_index)
-                            time.sleep(2)
-                        except Exception as e:
-                            logging.warning(f"Failed to select page {page_index+1}: {e}")
-                            break
-
-                    try:
-                        table_el = driver.find_element(By.XPATH, '/html/body/table[1]/tbody/tr[5]/td/table/tbody/tr/td/div/table[3]/tbody/tr/td[2]/table')
-                        table_html = table_el.get_attribute('outerHTML')
-                        df = pd.read_html(StringIO(table_html))[0]
-                        maerts = df[df.iloc[:, 12] == 'MAERT']
-                    except Exception as e:
-                        logging.warning(f"[Page {page_index+1}] Table parsing failed: {e}")
-                        continue
-
-                    for hyperlink, permit_number, date in zip(maerts.iloc[:, 2], maerts.iloc[:, 6], maerts.iloc[:, 16]):
-                        try:
-                            logging.info(f"(Zip: {zipcode}) Downloading permit {permit_number} for RN {rn}")
-                            safe_click(driver, By.LINK_TEXT, hyperlink, description=f"MAERT link: {hyperlink}")
-                            downloaded = wait_for_download(tmp_dir)
-                            if downloaded and validate_pdf(downloaded):
-                                unique_id = int(time.time() * 1e6)
-                                formatted_date = date.split()[0].replace('/', '-')
-                                final_name = f"{zipcode}_{permit_number}_{formatted_date}_{unique_id}.pdf"
-                                final_path = os.path.join(DATA_PATH, final_name)
-                                shutil.move(downloaded, final_path)
-                                logging.info(f"(Zip: {zipcode}) Saved to {final_path}")
-                                log_downloaded_file(rn, final_name, zipcode)
-                                maert_downloaded = True
-                            else:
-                                logging.warning(f"(Zip: {zipcode}) Invalid or missing PDF for {permit_number}")
-                        except Exception as err:
-                            logging.warning(f"(Zip: {zipcode}) Error downloading {permit_number}: {err}")
-                    
-                if not maert_downloaded:
-                    logging.info(f"(Zip: {zipcode}) No MAERT found for RN {rn}.")
-
-                driver.quit()
+                    await wait_for_slot()
+                    async with tab.expect_new(RESULTS_TABLE_XPATH, 10, "results page", 2):
+                        await tab.select(PAGE_SELECT_XPATH, index=page_index)
+                except TimeoutError:
+                    logging.warning(f"Timed out waiting for results page {page_index+1} to load.")
+                except Exception as e:
+                    logging.warning(f"Failed to select page {page_index+1}: {e}")
+                    complete = False
+                    break
 
+        try:
+            table_html = await tab.html(RESULTS_TABLE_XPATH)
+            with metrics.span("download.parse_results", rn=rn, page=page_index + 1):
+                links = parse_maert_links(table_html, await tab.evaluate("location.href"))
+        except Exception as e:
+            logging.warning(f"[Page {page_index+1}] Table parsing failed: {e}")
+            complete = False
+            continue
+
+        maerts_listed += len(links)
+        links = await trio.to_thread.run_sync(new_links, ledger, links)
+
+        if backend == "http":
+            complete &= await trio.to_thread.run_sync(fetch_links_http, await tab.headers(), ledger, pdf_store, links,
+                                                      rn, zipcode, tmp_dir, rate_limiter, on_saved)
+            continue
+
+        for hyperlink, _, permit_number, date in links:
+            try:
+                logging.info(f"(Zip: {zipcode}) Downloading permit {permit_number} for RN {rn}")
+                await wait_for_slot()
+                with metrics.span("download.document", rn=rn, document=hyperlink, engine="cdp"):
+                    await tab.click(link_text_xpath(hyperlink))
+                    downloaded = await trio.to_thread.run_sync(wait_for_download, tmp_dir)
+                check = await trio.to_thread.run_sync(validate_pdf, downloaded) if downloaded else None
+                if check and check.valid:
+                    await trio.to_thread.run_sync(save_maert, ledger, pdf_store, downloaded, check, rn, zipcode,
+                                                  permit_number, date, hyperlink, on_saved)
+                else:
+                    await trio.to_thread.run_sync(record_failure, ledger, hyperlink, rn, zipcode, permit_number, date,
+                                                  "Invalid or missing PDF")
+                    complete = False
+            except Exception as err:
+                await trio.to_thread.run_sync(record_failure, ledger, hyperlink, rn, zipcode, permit_number, date,
+                                              f"Error downloading: {err}")
+                complete = False
+            finally:
+                await trio.to_thread.run_sync(discard_downloads, tmp_dir, zipcode)
+
+    if not complete:
+        return "incomplete"
+    if not maerts_listed:
+        logging.info(f"(Zip: {zipcode}) No MAERT found for RN {rn}.")
+        return "no_maert"
+    return "done"
+
+async def download_tab_worker(worker_id, browser, rn_pairs, ledger, pdf_store, rate_limiter, backend="browser",
+                              on_saved=None):
+    """
+    CDP engine worker: takes (RN, zipcode) pairs from the shared iterator, each in a fresh tab
+    (and browser context) of the one browser, downloading into its own directory.
+    """
+    for rn, zipcode in rn_pairs:
+        logging.info(f"[Tab {worker_id}] Processing RN: {rn} (Zip: {zipcode})")
+        await trio.to_thread.run_sync(ledger.mark_rn, rn, zipcode, "in_progress")
+
+        try:
+            with tempfile.TemporaryDirectory(prefix=f"maert_tab{worker_id}_") as tmp_dir:
+                tab = await browser.new_tab(download_dir=tmp_dir)
+                try:
+                    status = await download_maerts_for_rn_cdp(tab, ledger, pdf_store, rn, zipcode, tmp_dir, rate_limiter,
+                                                              backend, on_saved)
+                finally:
+                    await tab.close()
+                await trio.to_thread.run_sync(ledger.mark_rn, rn, zipcode, status)
         except Exception as e:
             logging.error(f"(Zip: {zipcode}) Error processing RN {rn}: {e}")
 
+async def download_rns_cdp(rn_pairs, tabs, ledger, pdf_store, rate_limiter, backend="browser", on_saved=None):
+    rn_pairs = iter(rn_pairs)
+    async with launch_browser() as browser, trio.open_nursery() as nursery:
+        for i in range(tabs):
+            nursery.start_soon(download_tab_worker, i, browser, rn_pairs, ledger, pdf_store, rate_limiter, backend,
+                               on_saved)
+
+def scrape_maert_for_rns(rn_zip_df, concurrency=1, requests_per_second=DEFAULT_REQUESTS_PER_SECOND, backend="browser",
+                         on_saved=None, engine="selenium"):
+    """
+    Downloads the MAERTs of every (RN, zipcode) in rn_zip_df that the download ledger
+    hasn't finished, opening the ledger and PDF store for the run.
+    """
+    os.makedirs(DATA_PATH, exist_ok=True)
+    ledger = DownloadLedger(LEDGER_PATH)
+    try:
+        download_rns(rn_zip_df, ledger, PdfStore(PDF_STORE_PATH), concurrency, requests_per_second, backend,
+                     on_saved, engine)
+    finally:
+        ledger.close()
+
+def download_rns(rn_zip_df, ledger, pdf_store, concurrency=1, requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                 backend="browser", on_saved=None, engine="selenium"):
+    # Carry over progress recorded by the old CSV log
+    if os.path.exists(DOWNLOAD_LOGS_PATH):
+        imported = ledger.import_csv_log(DOWNLOAD_LOGS_PATH)
+        os.replace(DOWNLOAD_LOGS_PATH, f"{DOWNLOAD_LOGS_PATH}.imported")
+        logging.info(f"Imported {imported} rows from {DOWNLOAD_LOGS_PATH} into the download ledger.")
+
+    rate_limiter = RateLimiter(requests_per_second)
+
+    rn_zip_pairs = [(row['rn_number'], str(row['zipcode'])) for _, row in rn_zip_df.iterrows()]
+    pending = ledger.pending_rns(rn_zip_pairs)
+    logging.info(f"Skipping {len(rn_zip_pairs) - len(pending)} RNs already finished in the download ledger.")
+
+    if engine == "cdp":
+        logging.info(f"Downloading {len(pending)} RNs with {concurrency} tab(s) in one browser.")
+        trio.run(download_rns_cdp, pending, max(1, concurrency), ledger, pdf_store, rate_limiter, backend, on_saved)
+    else:
+        rn_queue = Queue()
+        for rn, zipcode in pending:
+            rn_queue.put((rn, zipcode))
+
+        if concurrency <= 1:
+            download_worker(0, rn_queue, ledger, pdf_store, rate_limiter, backend, on_saved)
+        else:
+            logging.info(f"Downloading {rn_queue.qsize()} RNs with {concurrency} browser workers.")
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                for future in [executor.submit(download_worker, i, rn_queue, ledger, pdf_store, rate_limiter, backend, on_saved) for i in range(concurrency)]:
+                    future.result()
+
+    wait_metrics.log_summary()
+
+def add_download_arguments(parser):
+    """The download options, shared with run_pipeline.py."""
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help="Number of browsers (tabs, with the cdp engine) downloading in parallel (default: 1)")
+    parser.add_argument('--max-requests-per-second', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help=f"Overall limit on page loads/clicks against the records site across all browsers "
+                             f"(default: {DEFAULT_REQUESTS_PER_SECOND}, 0 disables)")
+    parser.add_argument('--backend', choices=BACKENDS, default="browser",
+                        help="How MAERT PDFs are fetched once listed: by clicking in Chrome (default) "
+                             "or directly over HTTP with the browser's cookies")
+    parser.add_argument('--engine', choices=ENGINES, default="selenium",
+                        help="Drive Chrome through Selenium (default), or through the DevTools Protocol with "
+                             "every worker a tab of one browser")
+
 if __name__ == '__main__':
-    rn_zip_df = read_rn_numbers_and_zipcodes(RNS_CSV_PATH)
-    scrape_maert_for_rns(rn_zip_df)
+    parser = argparse.ArgumentParser(description="Download MAERT PDFs for the RNs in rns_by_zipcode.csv.")
+    add_download_arguments(parser)
+    parser.add_argument('--trace', metavar='JSONL',
+                        help="Append a JSON line per timed step (browser start, search, page, download, wait...) to this file")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Profile the run: cProfile stats, or pyinstrument HTML for a .html path")
+    args = parser.parse_args()
+
+    metrics.configure(args.trace)
+    with profiled(args.profile):
+        rn_zip_df = read_rn_numbers_and_zipcodes(RNS_CSV_PATH)
+        scrape_maert_for_rns(rn_zip_df, args.concurrency, args.max_requests_per_second, args.backend,
+                             engine=args.engine)
+    metrics.log_summary()
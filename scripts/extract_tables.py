@@ -1,8 +1,12 @@
 import os
 import re
-import pdfplumber
+import argparse
 import pandas as pd
 from pathlib import Path
+from itertools import chain
+from typing import Iterable
+from functools import partial
+from contextlib import closing
 import logging
 import numpy as np
 import sys
@@ -13,6 +17,16 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
 
 from utils import tricky_tables
+from utils.page_stream import stream_pages, OversizedDocument
+from utils.watchdog import PENDING, DocumentTimeout, WatchdogPool, time_limits
+from utils.maert_locator import LOCATOR_VERSION, format_page_range, locate_maert_pages, parse_page_range
+from utils.combined_dataset import CombinedDatasetWriter
+from utils.maert_index import MaertIndex
+from utils.normalization import normalize_rows
+from utils.download_ledger import DownloadLedger
+from utils.pdf_store import file_sha256
+from utils.pdf_validation import validate_pdf
+from utils.instrumentation import metrics, profiled
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(SCRIPT_DIR, '..', 'data')
@@ -20,8 +34,29 @@ DATA_PATH = os.path.join(SCRIPT_DIR, '..', 'data')
 PDF_DIR = os.path.join(DATA_PATH, 'raw_pdfs')
 OUTPUT_DIR = os.path.join(DATA_PATH, 'extracted_csvs')
 LOG_PATH = os.path.join(DATA_PATH, 'pdf_processing_log.csv')
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+COMBINED_DIR = os.path.join(DATA_PATH, 'combined', 'maerts')
+LEDGER_PATH = os.path.join(DATA_PATH, 'download_ledger.sqlite')
+MANIFEST_PATH = os.path.join(DATA_PATH, 'extraction_manifest.csv')
+INDEX_PATH = os.path.join(DATA_PATH, 'maert_index.sqlite')
+RNS_CSV_PATH = os.path.join(DATA_PATH, 'rns_by_zipcode.csv')
+
+# Bump whenever a change to the extraction logic should invalidate previously extracted CSVs
+EXTRACTOR_VERSION = 5
+MANIFEST_COLUMNS = ["pdf", "sha256", "mtime_ns", "size", "extractor_version", "status", "output_csv",
+                    "maert_pages", "locator_version"]
+
+# Per-document limits; a PDF over either is logged as "oversized" instead of being extracted
+MAX_PAGES = 500
+MAX_MEMORY_MB = 2048
+# Per-document time limits (seconds); a PDF over either is set aside and retried once at the
+# end of the run with both limits multiplied by RETRY_TIMEOUT_FACTOR
+DOCUMENT_TIMEOUT = 600
+DOCUMENT_CPU_TIMEOUT = 300
+RETRY_TIMEOUT_FACTOR = 4
+# How long past its limits a pool worker may go (e.g. stuck in C code) before it is killed
+HARD_KILL_GRACE = 30
+# Statuses of unsuccessful extractions, which are only retried with --retry-failed
+UNSUCCESSFUL_STATUSES = ("failed", "oversized", "timeout")
 
 COLUMNS = [
     "Emission Source",
@@ -38,111 +73,578 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 
-# ========== LOG FILE SETUP ==========
-
-if os.path.exists(LOG_PATH):
-    log_df = pd.read_csv(LOG_PATH)
-else:
-    log_df = pd.DataFrame(columns=["filename", "status", "note"])
-
-# ========== MAIN EXTRACTION LOOP ==========
-
-pdf_files = list(Path(PDF_DIR).rglob("*.pdf"))
-
-for pdf_path in pdf_files:
-    logging.info("-" * 26)  # separator line before each new file
-    logging.info(f"Processing: {pdf_path.name}")
+# ========== PER-PDF EXTRACTION ==========
+
+def find_maert_pages(pdf_path: Path) -> str:
+    """Runs the MAERT page pre-scan, returning the range as recorded in the manifest."""
+    with metrics.span("extract.locate_pages"):
+        return format_page_range(locate_maert_pages(pdf_path))
+
+
+def extract_pdf(pdf_path: Path, locate_pages: bool = True, max_pages: int | None = None,
+                max_memory_mb: float | None = None, maert_pages: str | None = None) -> tuple[pd.DataFrame, str]:
+    """
+    Extracts the MAERT from a single PDF.
+    Unless locate_pages is False, only the candidate MAERT pages found by a cheap
+    pypdfium2 pre-scan are run through pdfplumber; maert_pages is a range already found for
+    this content (as recorded in the manifest), which skips the pre-scan. Pages are streamed, each one's parsed
+    objects freed before the next is read; OversizedDocument is raised if the document has
+    more than max_pages pages to parse or extraction grows memory by more than max_memory_mb.
+    Returns the combined table, as written to the document's CSV, and a note ("easy" or
+    "tricky") describing the path taken.
+    """
     extracted_pages = []
     tricky_table_found = False
+    text_split_found = False
 
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_num = page.page_number
-                text = page.extract_text(keep_blank_chars=True)
-                text_simple = page.extract_text()
+    page_range = None
+    if locate_pages:
+        page_range = parse_page_range(maert_pages or find_maert_pages(pdf_path))
 
-                table = page.extract_table()
+    if page_range:
+        logging.info(f"Candidate MAERT pages {page_range[0] + 1}-{page_range[1] + 1} in {pdf_path.name}")
+
+    with closing(stream_pages(pdf_path, page_range, max_pages, max_memory_mb)) as pages:
+        for analysis in pages:
+            page_num = analysis.page_number
+            with metrics.span("extract.page", pdf=pdf_path.name, page=page_num) as span:
+                table = analysis.table
                 if table:
                     logging.info(f"Easy table found on page {page_num} of {pdf_path.name}")
+                    span["path"] = "easy"
                     df_easy = pd.DataFrame(table[1:], columns=table[0])
                     df_easy['Emission Source'] = df_easy['Emission Source'].ffill()
                     df_easy['Source Name'] = df_easy['Source Name'].ffill()
                     extracted_pages.append(df_easy)
+                    span["rows"] = len(df_easy)
 
+                    text_simple = analysis.text_simple
                     if text_simple and "point identification" in text_simple:
                         break
                 else:
                     logging.info(f"No easy table found on page {page_num}, using tricky extraction.")
                     tricky_table_found = True
-
-                    try:
-                        core_pat = re.compile(r"TPY[\-\s]+(.*)\n\s+", re.DOTALL)
-                        core = re.search(core_pat, text).group(1)
-                    except Exception:
-                        core = text
-
-                    lines = core.split("\n")
-
-                    if text_simple and "(1) Emission point identification" in text_simple:
-                        idx_list = [i for i, line in enumerate(lines) if "pointidentification" in line.replace(" ", "")]
-                        if idx_list:
-                            lines = lines[:idx_list[0]]
-
-                    df_tricky = tricky_tables.extract_table_custom(lines, COLUMNS)
+                    span["path"] = "tricky"
+                    df_tricky, end_of_table = tricky_tables.extract_table_layout(analysis.words, COLUMNS)
+                    if df_tricky is None:
+                        logging.info(f"No column layout found on page {page_num}, splitting its text instead.")
+                        span["path"] = "tricky_text"
+                        text_split_found = True
+                        df_tricky, end_of_table = extract_tricky_text(analysis)
                     extracted_pages.append(df_tricky)
+                    span["rows"] = len(df_tricky)
 
-                    if text_simple and "(1) Emission point identification" in text_simple:
+                    if end_of_table:
                         break
 
-        # ========== CLEANUP & COMBINE ==========
+    # ========== CLEANUP & COMBINE ==========
 
+    with metrics.span("extract.combine", pages=len(extracted_pages)):
         if tricky_table_found:
             combined_df = pd.concat(extracted_pages).dropna(axis=0, how='all').reset_index(drop=True)
-            combined_df = tricky_tables.clean_up_tricky_table(combined_df)
+            if text_split_found:
+                combined_df = tricky_tables.clean_up_tricky_table(combined_df)
+            else:
+                combined_df = tricky_tables.merge_wrapped_lines(combined_df)
         else:
             combined_df = pd.concat(extracted_pages).reset_index(drop=True)
 
-        # Add metadata columns
-        split_name = pdf_path.stem.split("_")
-        combined_df["filename"] = pdf_path.name
-        combined_df["zipcode"] = split_name[0] if len(split_name) > 0 else None
-        combined_df["entity"] = split_name[0] if len(split_name) > 0 else None
-        combined_df["permit_number"] = split_name[1] if len(split_name) > 1 else None
-        combined_df["publish_date"] = split_name[2] if len(split_name) > 2 else None
+    combined_df = add_metadata(combined_df, pdf_path)
 
-        # Drop duplicated header rows
-        combined_df = combined_df[combined_df["Emission Source"] != "Emission"]
+    # Drop duplicated header rows
+    combined_df = combined_df[combined_df["Emission Source"] != "Emission"].copy()
 
-        # Save CSV
-        out_csv = os.path.join(OUTPUT_DIR, f"{pdf_path.stem}_extracted.csv")
-        combined_df.to_csv(out_csv, index=False)
-        logging.info(f"Saved extracted CSV: {out_csv}")
+    return combined_df, "tricky" if tricky_table_found else "easy"
 
-        # Log success
-        log_df = pd.concat([
-            log_df,
-            pd.DataFrame([{
-                "filename": pdf_path.name,
-                "status": "processed",
-                "note": "tricky" if tricky_table_found else "easy"
-            }])
-        ], ignore_index=True)
 
-    except Exception as e:
-        logging.error(f"Failed to process {pdf_path.name}: {e}")
+def extract_tricky_text(analysis) -> tuple[pd.DataFrame, bool]:
+    """
+    Fallback for tricky pages without a usable word layout: splits the page text below the
+    "TPY" header on runs of blanks, guessing columns from the number of fields. Returns the
+    parsed lines and whether the page ends the table.
+    """
+    text = analysis.text
+    text_simple = analysis.text_simple
+
+    try:
+        core_pat = re.compile(r"TPY[\-\s]+(.*)\n\s+", re.DOTALL)
+        core = re.search(core_pat, text).group(1)
+    except Exception:
+        core = text
+
+    lines = core.split("\n")
+
+    end_of_table = bool(text_simple) and "(1) Emission point identification" in text_simple
+    if end_of_table:
+        idx_list = [i for i, line in enumerate(lines) if "pointidentification" in line.replace(" ", "")]
+        if idx_list:
+            lines = lines[:idx_list[0]]
+
+    return tricky_tables.extract_table_custom(lines, COLUMNS), end_of_table
+
+
+def add_metadata(combined_df: pd.DataFrame, pdf_path: Path) -> pd.DataFrame:
+    """
+    Sets the metadata columns parsed from the {zipcode}_{permit}_{date}_{id}.pdf file name.
+    """
+    split_name = pdf_path.stem.split("_")
+    combined_df["filename"] = pdf_path.name
+    combined_df["zipcode"] = split_name[0] if len(split_name) > 0 else None
+    combined_df["entity"] = split_name[0] if len(split_name) > 0 else None
+    combined_df["permit_number"] = split_name[1] if len(split_name) > 1 else None
+    combined_df["publish_date"] = split_name[2] if len(split_name) > 2 else None
+    return combined_df
+
+
+def read_extracted_csv(output_csv: str) -> pd.DataFrame:
+    """
+    Reads back a document's extracted CSV as text. Empty cells come back as missing values,
+    as they were when written, and nothing else does, so e.g. an "N/A" rate stays as it
+    was. Every read-back goes through here, so duplicates, backfilled documents and the
+    query index all see the same values.
+    """
+    return pd.read_csv(os.path.join(OUTPUT_DIR, output_csv), dtype=str, keep_default_na=False, na_values=[""])
+
+
+def reuse_result(pdf_path: Path, source: dict) -> tuple[Path, pd.DataFrame | None, str, str, str | None]:
+    """
+    Result for a PDF whose content was already extracted under another name: the source's
+    CSV is read back as text (so values round-trip unchanged) and relabelled with this PDF's metadata.
+    """
+    logging.info(f"{pdf_path.name} has the same content as {Path(source['pdf']).name}; reusing its extraction.")
+    if source["status"] != "processed":
+        return (pdf_path, None, source["status"], f"same content as {Path(source['pdf']).name}, which {source['status']}",
+                source.get("maert_pages"))
+    combined_df = read_extracted_csv(source["output_csv"])
+    return (pdf_path, add_metadata(combined_df, pdf_path), "processed", f"duplicate of {Path(source['pdf']).name}",
+            source.get("maert_pages"))
+
+
+def process_pdf(pdf_path: Path, locate_pages: bool = True, max_pages: int | None = None,
+                max_memory_mb: float | None = None, timeout: float | None = None,
+                cpu_timeout: float | None = None,
+                located_pages: dict[Path, str] | None = None) -> tuple[Path, pd.DataFrame | None, str, str, str | None]:
+    """
+    Worker entry point. Never raises, so one bad PDF can't take down the pool;
+    failures come back as status "failed" (or "oversized" for a document over the page
+    or memory limit, "timeout" for one over its wall-clock or CPU time limit) with the
+    error as the note. The MAERT page range is taken from located_pages if it has one for
+    this PDF, otherwise found by the pre-scan, and is returned for the manifest either way
+    (None if it wasn't needed or the PDF failed before it was found).
+    """
+    logging.info("-" * 26)  # separator line before each new file
+    logging.info(f"Processing: {pdf_path.name}")
+    maert_pages = (located_pages or {}).get(pdf_path)
+    with metrics.span("extract.pdf", pdf=pdf_path.name) as span:
+        try:
+            with time_limits(timeout, cpu_timeout):
+                if locate_pages and maert_pages is None:
+                    maert_pages = find_maert_pages(pdf_path)
+                combined_df, note = extract_pdf(pdf_path, locate_pages, max_pages, max_memory_mb, maert_pages)
+            result = pdf_path, combined_df, "processed", note, maert_pages
+            span["rows"] = len(combined_df)
+        except DocumentTimeout as e:
+            result = pdf_path, None, "timeout", str(e), maert_pages
+        except OversizedDocument as e:
+            result = pdf_path, None, "oversized", str(e), maert_pages
+        except Exception as e:
+            result = pdf_path, None, "failed", str(e), maert_pages
+        span["status"] = result[2]
+    metrics.count(f"pdfs_{result[2]}")
+    return result
+
+
+def init_worker(trace_path: str | None):
+    # A forked worker starts with a copy of the parent's totals; only its own work should be sent back
+    metrics.drain()
+    metrics.configure(trace_path)
+
+
+def process_pdf_in_worker(pdf_path: Path, **options):
+    """process_pdf for a pool worker: also hands back the worker's timers and counters for the parent to merge."""
+    return process_pdf(pdf_path, **options), metrics.drain()
+
+
+def lost_result(pdf_path: Path, reason: str, timed_out: bool):
+    """Stands in for the result (and worker metrics) of a PDF whose worker had to be killed or died."""
+    status = "timeout" if timed_out else "failed"
+    return (pdf_path, None, status, reason, None), {"timers": {}, "counters": {f"pdfs_{status}": 1}}
+
+
+def iter_results(pdf_files: Iterable[Path], workers: int = 1, trace_path: str | None = None,
+                 use_pool: bool = False, **options):
+    """
+    Yields process_pdf results in input order, either in-process or from a process pool,
+    passing options (locate_pages, max_pages, max_memory_mb, timeout, cpu_timeout,
+    located_pages) through to process_pdf. Keeping the order fixed means a parallel run writes exactly what a serial run would.
+    A single worker runs in-process unless use_pool is set.
+
+    Time limits are enforced inside process_pdf; in a pool, a worker that still hasn't finished
+    HARD_KILL_GRACE seconds past them (e.g. stuck in a C call) is killed and replaced, and
+    its PDF comes back as a timeout, so one pathological PDF never stalls the batch.
+    """
+    if workers <= 1 and not use_pool:
+        for pdf_path in pdf_files:
+            if pdf_path is not PENDING:
+                yield process_pdf(pdf_path, **options)
+        return
+
+    limit = options.get("timeout") or 2 * (options.get("cpu_timeout") or 0)
+    pool = WatchdogPool(workers, limit + HARD_KILL_GRACE if limit else None, init_worker, (trace_path,))
+    for result, worker_metrics in pool.imap(partial(process_pdf_in_worker, **options), pdf_files, lost_result):
+        metrics.merge(worker_metrics)
+        yield result
+
+
+def with_timeout_retries(results, retry_factor: float, workers: int = 1, trace_path: str | None = None,
+                         use_pool: bool = False, **options):
+    """
+    Passes results through, except that PDFs which timed out are put on a retry queue and,
+    once every other PDF is done, extracted once more with their time limits multiplied by
+    retry_factor (no retry if it is 0). Whatever times out again is yielded as a timeout.
+    MAERT page ranges found before the timeout are passed on to the retry.
+    """
+    retry_queue = []
+    located_pages = dict(options.get("located_pages") or {})
+    for result in results:
+        if result[2] == "timeout" and retry_factor:
+            logging.warning(f"{result[0].name} timed out ({result[3]}); queued for a retry at the end of the run.")
+            retry_queue.append(result[0])
+            if result[4] is not None:
+                located_pages[result[0]] = result[4]
+        else:
+            yield result
+    options["located_pages"] = located_pages
+
+    if retry_queue:
+        logging.info(f"Retrying {len(retry_queue)} timed-out PDFs with {retry_factor:g}x the time limits.")
+        for key in ("timeout", "cpu_timeout"):
+            if options.get(key):
+                options[key] *= retry_factor
+        yield from iter_results(retry_queue, workers, trace_path, use_pool, **options)
+
+# ========== MANIFEST ==========
+
+def manifest_key(pdf_path: Path) -> str:
+    return pdf_path.relative_to(PDF_DIR).as_posix()
+
+
+def load_manifest() -> dict[str, dict]:
+    """
+    Loads the extraction manifest, keyed by PDF path relative to PDF_DIR.
+    """
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    manifest_df = pd.read_csv(MANIFEST_PATH, dtype={"pdf": str, "sha256": str, "status": str, "output_csv": str,
+                                                    "maert_pages": str})
+    # Manifests written before a column existed get it empty
+    manifest_df = manifest_df.reindex(columns=MANIFEST_COLUMNS)
+    manifest_df = manifest_df.astype(object).where(manifest_df.notna(), None)
+    return {row["pdf"]: row for row in manifest_df.to_dict("records")}
+
+
+def save_manifest(manifest: dict[str, dict]):
+    pd.DataFrame(list(manifest.values()), columns=MANIFEST_COLUMNS).to_csv(MANIFEST_PATH, index=False)
+
+
+def is_up_to_date(pdf_path: Path, entry: dict | None, retry_failed: bool = False) -> bool:
+    """
+    Checks a PDF against its manifest entry. Size and mtime are compared first so
+    unchanged files are never read; the content hash is only computed when they differ
+    (e.g. after a copy or touch), and a matching hash refreshes the entry in place.
+    """
+    if entry is None or int(entry["extractor_version"]) != EXTRACTOR_VERSION:
+        return False
+    if entry["status"] != "processed" and (retry_failed or entry["status"] not in UNSUCCESSFUL_STATUSES):
+        return False
+    if entry["output_csv"] and not os.path.exists(os.path.join(OUTPUT_DIR, entry["output_csv"])):
+        return False
+
+    stat = pdf_path.stat()
+    if int(entry["mtime_ns"]) == stat.st_mtime_ns and int(entry["size"]) == stat.st_size:
+        return True
+    if file_sha256(pdf_path) == entry["sha256"]:
+        entry["mtime_ns"] = stat.st_mtime_ns
+        entry["size"] = stat.st_size
+        return True
+    return False
+
+
+def remove_output(entry: dict | None):
+    if entry and entry["output_csv"]:
+        out_csv = os.path.join(OUTPUT_DIR, entry["output_csv"])
+        if os.path.exists(out_csv):
+            os.remove(out_csv)
+            logging.info(f"Removed stale CSV: {out_csv}")
+
+# ========== MAIN EXTRACTION LOOP ==========
+
+def add_extraction_arguments(parser):
+    """The extraction options, shared with run_pipeline.py."""
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes used for extraction (default: 1, no pool)")
+    parser.add_argument('--force', action='store_true',
+                        help="Re-extract every PDF, ignoring the extraction manifest")
+    parser.add_argument('--retry-failed', action='store_true',
+                        help="Re-extract unchanged PDFs whose previous extraction failed, was oversized or timed out")
+    parser.add_argument('--all-pages', action='store_true',
+                        help="Run pdfplumber on every page instead of only the located MAERT pages")
+    parser.add_argument('--max-pages', type=int, default=MAX_PAGES,
+                        help=f"Mark PDFs with more pages than this to parse as oversized instead of extracting them "
+                             f"(default: {MAX_PAGES}, 0 disables)")
+    parser.add_argument('--max-memory-mb', type=float, default=MAX_MEMORY_MB,
+                        help=f"Stop extracting a PDF and mark it oversized once the extracting process's memory has "
+                             f"grown by more than this many MB while on it (default: {MAX_MEMORY_MB}, 0 disables)")
+    parser.add_argument('--timeout', type=float, default=DOCUMENT_TIMEOUT,
+                        help=f"Wall-clock seconds allowed per PDF before it is set aside as timed out "
+                             f"(default: {DOCUMENT_TIMEOUT}, 0 disables)")
+    parser.add_argument('--cpu-timeout', type=float, default=DOCUMENT_CPU_TIMEOUT,
+                        help=f"CPU seconds allowed per PDF before it is set aside as timed out "
+                             f"(default: {DOCUMENT_CPU_TIMEOUT}, 0 disables)")
+    parser.add_argument('--retry-timeout-factor', type=float, default=RETRY_TIMEOUT_FACTOR,
+                        help=f"Retry timed-out PDFs once at the end of the run with time limits this many times "
+                             f"longer (default: {RETRY_TIMEOUT_FACTOR}, 0 disables the retry)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract MAERT tables from downloaded permit PDFs into CSV files.")
+    add_extraction_arguments(parser)
+    parser.add_argument('--trace', metavar='JSONL',
+                        help="Append a JSON line per timed step (validation, page, table parsing, cleanup...) to this file")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Profile the run (main process only): cProfile stats, or pyinstrument HTML for a .html path")
+    args = parser.parse_args()
+
+    metrics.configure(args.trace)
+    with profiled(args.profile):
+        run(args)
+    metrics.log_summary()
+
+
+def admit_new_pdfs(incoming, digests: dict, seen: set, duplicates: list):
+    """
+    Passes on PDFs that arrive while a run is in progress, given as (path, sha256) for files
+    already validated on download. Content already extracted, or being extracted, is held back
+    in duplicates to reuse at the end, and files the run already picked up from disk are skipped.
+    PENDING markers from incoming are passed on.
+    """
+    for item in incoming:
+        if item is PENDING:
+            yield item
+            continue
+        pdf_path, sha256 = item
+        if pdf_path in digests:
+            continue
+        digests[pdf_path] = sha256
+        if sha256 in seen:
+            duplicates.append(pdf_path)
+        else:
+            seen.add(sha256)
+            yield pdf_path
+
+
+def run(args: argparse.Namespace, incoming=None):
+    """
+    One incremental extraction pass over PDF_DIR with the parsed command-line options.
+    incoming, if given, is an iterable of (path, sha256) for PDFs saved into PDF_DIR during the run
+    (see run_pipeline.py); they are extracted after those already on disk, as they arrive.
+    """
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    if os.path.exists(LOG_PATH):
+        # Earlier runs appended a row per attempt; keep only the latest per file
+        log_df = pd.read_csv(LOG_PATH).drop_duplicates("filename", keep="last")
+    else:
+        log_df = pd.DataFrame(columns=["filename", "status", "note"])
+
+    manifest = load_manifest()
+    pdf_files = list(Path(PDF_DIR).rglob("*.pdf"))
+
+    # Forget PDFs that have been deleted since the last run, along with their CSVs
+    current_keys = {manifest_key(pdf_path) for pdf_path in pdf_files}
+    removed = [key for key in manifest if key not in current_keys]
+    for key in removed:
+        remove_output(manifest.pop(key))
+        log_df = log_df[log_df["filename"] != Path(key).name]
+
+    pending = [
+        pdf_path for pdf_path in pdf_files
+        if args.force or not is_up_to_date(pdf_path, manifest.get(manifest_key(pdf_path)), args.retry_failed)
+    ]
+    logging.info(f"{len(pdf_files) - len(pending)} of {len(pdf_files)} PDFs unchanged since last extraction, "
+                 f"{len(pending)} to process.")
+
+    ledger = DownloadLedger(LEDGER_PATH)
+    missing = ledger.downloaded_files() - {pdf_path.name for pdf_path in pdf_files}
+    if missing:
+        logging.warning(f"{len(missing)} PDFs recorded as downloaded in the ledger are not in {PDF_DIR}.")
+    save_manifest(manifest)
+    log_df.to_csv(LOG_PATH, index=False)
 
-        # Log failure
+    combined = CombinedDatasetWriter(COMBINED_DIR)
+    index = MaertIndex(INDEX_PATH, LEDGER_PATH)
+    superseded = {Path(key).name for key in removed} | {pdf_path.name for pdf_path in pending}
+    combined.drop_documents(superseded)
+    index.drop_documents(superseded)
+    index.load_rns(RNS_CSV_PATH)
+    index.link_rns()
+
+    # Backfill unchanged documents missing from the combined dataset or the index (e.g. extracted before they existed)
+    pending_keys = {manifest_key(pdf_path) for pdf_path in pending}
+    combined_documents = combined.documents()
+    indexed_documents = index.documents()
+    for key, entry in manifest.items():
+        name = Path(key).name
+        if key in pending_keys or entry["status"] != "processed":
+            continue
+        if name not in combined_documents or name not in indexed_documents:
+            df = normalize_rows(read_extracted_csv(entry["output_csv"]))
+            if name not in combined_documents:
+                combined.write(df)
+            if name not in indexed_documents:
+                index.write(df)
+
+    # Each distinct content is parsed once: PDFs identical to one already extracted with this
+    # extractor version (or to one earlier in this batch) reuse that extraction
+    digests = {pdf_path: file_sha256(pdf_path) for pdf_path in pending}
+
+    # Corrupt PDFs are failed without being opened. Verdicts recorded at download time are
+    # reused; content without one (e.g. downloaded before validation was recorded) is checked once here
+    checks = ledger.checks(set(digests.values()))
+    for pdf_path, sha256 in digests.items():
+        if sha256 not in checks:
+            check = validate_pdf(pdf_path)
+            ledger.record_check(sha256, check)
+            checks[sha256] = check._asdict()
+    ledger.close()
+
+    rejected = []
+    for pdf_path in pending:
+        check = checks[digests[pdf_path]]
+        if not check["valid"]:
+            rejected.append((pdf_path, None, "failed", f"invalid PDF: {check['reason']}", None))
+        elif check["page_count"] == 0:
+            rejected.append((pdf_path, None, "failed", "PDF has no pages", None))
+    if rejected:
+        logging.info(f"{len(rejected)} PDFs failed validation and will not be opened.")
+    rejected_paths = {result[0] for result in rejected}
+
+    extracted_by_sha = {
+        entry["sha256"]: entry for key, entry in manifest.items()
+        if key not in pending_keys and int(entry["extractor_version"]) == EXTRACTOR_VERSION
+    }
+    to_extract, duplicates = [], []
+    seen = set(extracted_by_sha)
+    for pdf_path in pending:
+        if pdf_path in rejected_paths:
+            continue
+        if digests[pdf_path] in seen:
+            duplicates.append(pdf_path)
+        else:
+            seen.add(digests[pdf_path])
+            to_extract.append(pdf_path)
+    if duplicates:
+        logging.info(f"{len(duplicates)} PDFs duplicate content already extracted; {len(to_extract)} to parse.")
+
+    # MAERT page ranges located in earlier runs (including ones before an --all-pages run) are
+    # reused for the same content, as long as the locator hasn't changed since
+    located = {
+        entry["sha256"]: entry["maert_pages"] for entry in manifest.values()
+        if entry.get("maert_pages") and entry.get("locator_version") is not None
+        and int(entry["locator_version"]) == LOCATOR_VERSION
+    }
+
+    extract_options = {
+        "locate_pages": not args.all_pages,
+        "located_pages": {pdf_path: located[sha256] for pdf_path, sha256 in digests.items() if sha256 in located},
+        "max_pages": args.max_pages,
+        "max_memory_mb": args.max_memory_mb,
+        "timeout": args.timeout,
+        "cpu_timeout": args.cpu_timeout,
+    }
+    if incoming is not None:
+        to_extract = chain(to_extract, admit_new_pdfs(incoming, digests, seen, duplicates))
+    # While PDFs are still arriving, extraction always runs in worker processes: the CPU timer
+    # counts the whole process, so the download threads would otherwise use up each PDF's CPU time
+    use_pool = incoming is not None
+    results = chain(
+        rejected,
+        with_timeout_retries(
+            iter_results(to_extract, args.workers, args.trace, use_pool, **extract_options),
+            args.retry_timeout_factor, args.workers, args.trace, use_pool, **extract_options,
+        ),
+        # Evaluated lazily, after every distinct PDF has been extracted and recorded
+        (reuse_result(pdf_path, extracted_by_sha[digests[pdf_path]]) for pdf_path in duplicates),
+    )
+
+    # Only this (parent) process writes CSVs, the processing log, the manifest and the combined dataset
+    for pdf_path, combined_df, status, note, maert_pages in results:
+        key = manifest_key(pdf_path)
+        previous = manifest.get(key)
+        output_csv = None
+
+        if status == "processed":
+            try:
+                with metrics.span("extract.write", pdf=pdf_path.name, rows=len(combined_df)):
+                    output_csv = f"{pdf_path.stem}_extracted.csv"
+                    out_csv = os.path.join(OUTPUT_DIR, output_csv)
+                    combined_df.to_csv(out_csv, index=False)
+                    logging.info(f"Saved extracted CSV: {out_csv}")
+                    # The CSV keeps the text as extracted; only the combined dataset and index get typed columns
+                    typed_df = normalize_rows(combined_df)
+                    combined.write(typed_df)
+                    index.write(typed_df)
+            except Exception as e:
+                status, note, output_csv = "failed", str(e), None
+
+        if status == "failed":
+            logging.error(f"Failed to process {pdf_path.name}: {note}")
+        elif status == "oversized":
+            logging.warning(f"Skipped oversized {pdf_path.name}: {note}")
+        elif status == "timeout":
+            logging.error(f"Timed out extracting {pdf_path.name}: {note}")
+
+        # A CSV from an earlier extraction of this PDF is stale unless it was just overwritten
+        if previous and previous["output_csv"] != output_csv:
+            remove_output(previous)
+
+        maert_pages = maert_pages or located.get(digests[pdf_path])
+        if maert_pages:
+            located[digests[pdf_path]] = maert_pages
+
+        stat = pdf_path.stat()
+        manifest[key] = {
+            "pdf": key,
+            "sha256": digests[pdf_path],
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "extractor_version": EXTRACTOR_VERSION,
+            "status": status,
+            "output_csv": output_csv,
+            "maert_pages": maert_pages,
+            "locator_version": LOCATOR_VERSION if maert_pages else None,
+        }
+
+        extracted_by_sha.setdefault(digests[pdf_path], manifest[key])
+
+        # Replace, rather than append to, any earlier log row for this file
         log_df = pd.concat([
-            log_df,
+            log_df[log_df["filename"] != pdf_path.name],
             pd.DataFrame([{
                 "filename": pdf_path.name,
-                "status": "failed",
-                "note": str(e)
+                "status": status,
+                "note": note
             }])
         ], ignore_index=True)
 
-    # Write updated log after each file
-    log_df.to_csv(LOG_PATH, index=False)
+        # Write updated log and manifest after each file
+        log_df.to_csv(LOG_PATH, index=False)
+        save_manifest(manifest)
+
+    combined.close()
+    index.close()
+    logging.info("Done processing all PDFs.")
+
 
-logging.info("Done processing all PDFs.")
+if __name__ == "__main__":
+    main()
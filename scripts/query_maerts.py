@@ -0,0 +1,181 @@
+import os
+import sys
+import logging
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+# ========== PATH SETUP ==========
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from scripts import extract_tables
+from utils.maert_index import MaertIndex
+from utils.normalization import normalize_rows
+
+# Column of rns_by_zipcode.csv shown next to each RN, when present
+RN_NAME_COLUMN = "regulated_entity_name"
+DEFAULT_LIMIT = 50
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+# ========== INDEX UPDATE ==========
+
+def update_index(index: MaertIndex):
+    """
+    Brings the index in line with the extraction manifest without extracting anything:
+    documents no longer extracted are dropped, and extracted ones missing from the index are
+    loaded from their CSVs. Extraction runs keep the index up to date themselves; this is for
+    building it over an existing corpus.
+    """
+    manifest = extract_tables.load_manifest()
+    processed = {Path(key).name: entry for key, entry in manifest.items() if entry["status"] == "processed"}
+
+    indexed = index.documents()
+    stale = indexed - set(processed)
+    index.drop_documents(stale)
+    missing = sorted(set(processed) - indexed)
+    for name in missing:
+        index.write(normalize_rows(extract_tables.read_extracted_csv(processed[name]["output_csv"])))
+
+    loaded_rns = index.load_rns(extract_tables.RNS_CSV_PATH)
+    linked = index.link_rns()
+    logging.info(f"Indexed {len(missing)} documents, dropped {len(stale)}, linked {linked} to their RN"
+                 f"{', reloaded RN search results' if loaded_rns else ''}.")
+
+# ========== QUERIES ==========
+
+def filters(args: argparse.Namespace) -> tuple[str, list]:
+    """WHERE clause (on maerts m joined to documents d) and parameters for the common filter options."""
+    clauses, params = [], []
+    for column, values in (("m.zipcode", args.zipcode), ("m.rn_number", args.rn),
+                           ("m.permit_number", args.permit), ("m.air_contaminant_name", args.pollutant)):
+        if values:
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if args.since:
+        clauses.append("m.publish_date >= ?")
+        params.append(args.since)
+    if args.until:
+        clauses.append("m.publish_date <= ?")
+        params.append(args.until)
+    if not args.all_versions:
+        clauses.append("d.latest = 1")
+    return " AND ".join(clauses) or "1", params
+
+
+def rn_name_join(index: MaertIndex) -> tuple[str, str]:
+    """Select expression and join adding each RN's name from the rns table, if it has one."""
+    if RN_NAME_COLUMN not in index.rn_columns():
+        return "", ""
+    return (f", MIN(r.{RN_NAME_COLUMN}) AS {RN_NAME_COLUMN}",
+            f" LEFT JOIN (SELECT rn_number, MIN({RN_NAME_COLUMN}) AS {RN_NAME_COLUMN} FROM rns GROUP BY rn_number) r "
+            f"ON r.rn_number = m.rn_number")
+
+
+def query_rows(index: MaertIndex, args: argparse.Namespace) -> pd.DataFrame:
+    where, params = filters(args)
+    for column, minimum in (("emission_rate_tons_year", args.min_tons), ("emission_rate_lbs_hr", args.min_lbs)):
+        if minimum is not None:
+            where += f" AND m.{column} >= ?"
+            params.append(minimum)
+    sql = (
+        "SELECT m.zipcode, m.rn_number, m.permit_number, m.publish_date, m.emission_source, m.source_name, "
+        "m.air_contaminant_name, m.emission_rate_lbs_hr_qualifier AS lbs_hr_qualifier, m.emission_rate_lbs_hr, "
+        "m.emission_rate_tons_year_qualifier AS tons_year_qualifier, m.emission_rate_tons_year, m.filename "
+        f"FROM maerts m JOIN documents d ON d.filename = m.filename WHERE {where} "
+        "ORDER BY m.zipcode, m.rn_number, m.permit_number, m.publish_date, m.rowid LIMIT ?"
+    )
+    return index.query(sql, [*params, args.limit])
+
+
+def query_facilities(index: MaertIndex, args: argparse.Namespace) -> pd.DataFrame:
+    """
+    Permitted totals per facility (RN; documents with no known RN are grouped by permit),
+    largest tons/year first.
+    """
+    where, params = filters(args)
+    name_select, name_join = rn_name_join(index)
+    having, having_params = "", []
+    for column, minimum in (("tons_year", args.min_tons), ("lbs_hr", args.min_lbs)):
+        if minimum is not None:
+            having += f"{' AND' if having else ' HAVING'} {column} >= ?"
+            having_params.append(minimum)
+    sql = (
+        f"SELECT m.rn_number{name_select}, GROUP_CONCAT(DISTINCT m.zipcode) AS zipcodes, "
+        "GROUP_CONCAT(DISTINCT m.permit_number) AS permits, COUNT(*) AS rows, "
+        "SUM(m.emission_rate_lbs_hr) AS lbs_hr, SUM(m.emission_rate_tons_year) AS tons_year "
+        f"FROM maerts m JOIN documents d ON d.filename = m.filename{name_join} WHERE {where} "
+        "GROUP BY m.rn_number, CASE WHEN m.rn_number IS NULL THEN m.permit_number END"
+        f"{having} ORDER BY tons_year DESC LIMIT ?"
+    )
+    return index.query(sql, [*params, *having_params, args.limit])
+
+
+def query_pollutants(index: MaertIndex, args: argparse.Namespace) -> pd.DataFrame:
+    """Permitted totals per contaminant across the matching documents, largest tons/year first."""
+    where, params = filters(args)
+    sql = (
+        "SELECT m.air_contaminant_name, COUNT(DISTINCT COALESCE(m.rn_number, m.permit_number)) AS facilities, "
+        "COUNT(*) AS rows, SUM(m.emission_rate_lbs_hr) AS lbs_hr, SUM(m.emission_rate_tons_year) AS tons_year "
+        f"FROM maerts m JOIN documents d ON d.filename = m.filename WHERE {where} "
+        "GROUP BY m.air_contaminant_name ORDER BY tons_year DESC LIMIT ?"
+    )
+    return index.query(sql, [*params, args.limit])
+
+
+QUERIES = {"rows": query_rows, "facilities": query_facilities, "pollutants": query_pollutants}
+
+# ========== MAIN ==========
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Query the extracted MAERTs across documents, through the SQLite index kept by extract_tables.py.")
+    parser.add_argument('--index', default=extract_tables.INDEX_PATH,
+                        help="Index database (default: data/maert_index.sqlite)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("update", help="Build or catch up the index from the extracted CSVs and rns_by_zipcode.csv")
+
+    query_help = {
+        "rows": "List matching MAERT rows",
+        "facilities": "Total permitted rates per facility (RN), largest first",
+        "pollutants": "Total permitted rates per air contaminant, largest first",
+    }
+    for name, help_text in query_help.items():
+        query = commands.add_parser(name, help=help_text)
+        query.add_argument('--zipcode', nargs='+', help="Only these zip codes")
+        query.add_argument('--rn', nargs='+', help="Only these RNs")
+        query.add_argument('--permit', nargs='+', help="Only these permit numbers")
+        query.add_argument('--pollutant', nargs='+', help="Only these air contaminants (case-insensitive), e.g. NOx")
+        query.add_argument('--since', metavar='YYYY-MM-DD', help="Only MAERTs published on or after this date")
+        query.add_argument('--until', metavar='YYYY-MM-DD', help="Only MAERTs published on or before this date")
+        query.add_argument('--all-versions', action='store_true',
+                           help="Include MAERTs superseded by a later one for the same permit")
+        if name != "pollutants":
+            target = "rows" if name == "rows" else "facilities whose totals are"
+            query.add_argument('--min-tons', type=float, help=f"Only {target} at least this many tons/year")
+            query.add_argument('--min-lbs', type=float, help=f"Only {target} at least this many lbs/hr")
+        query.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help=f"Maximum results (default: {DEFAULT_LIMIT})")
+        query.add_argument('--output', metavar='CSV', help="Write the results to this CSV file instead of printing them")
+    args = parser.parse_args()
+
+    with MaertIndex(args.index, extract_tables.LEDGER_PATH) as index:
+        if args.command == "update":
+            update_index(index)
+            return
+        results = QUERIES[args.command](index, args)
+
+    if args.output:
+        results.to_csv(args.output, index=False)
+        logging.info(f"Saved {len(results)} results to {args.output}")
+    elif results.empty:
+        logging.info("No matching results.")
+    else:
+        with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", None):
+            print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
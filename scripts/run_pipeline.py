@@ -0,0 +1,114 @@
+import os
+import sys
+import logging
+import argparse
+import threading
+import multiprocessing
+from pathlib import Path
+from queue import Queue, Empty, Full
+
+# ========== PATH SETUP ==========
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from scripts import extract_tables
+from scripts import download_maert_pdfs
+from utils.instrumentation import metrics, profiled
+from utils.watchdog import PENDING
+
+# How many downloaded PDFs may wait for extraction before downloading pauses
+DEFAULT_QUEUE_SIZE = 16
+# How often the extraction side stops waiting for a download to pass on finished PDFs
+POLL_SECONDS = 0.5
+
+# ========== DOWNLOAD -> EXTRACTION HAND-OFF ==========
+
+class DownloadQueue:
+    """
+    Bounded queue of (path, sha256) for PDFs the downloader has saved, read by the extraction
+    loop in the main thread. A full queue blocks the download workers until extraction catches
+    up; once the reading side stops (e.g. extraction raised), puts are dropped so the download
+    threads can finish instead of blocking forever. While nothing has arrived, iterating yields
+    PENDING every POLL_SECONDS, so PDFs already extracted are written out in the meantime.
+    """
+
+    def __init__(self, maxsize: int):
+        self.queue = Queue(maxsize=maxsize)
+        self.stopped = threading.Event()
+
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=1)
+                return
+            except Full:
+                continue
+
+    def on_saved(self, path: str, sha256: str):
+        # Downloads land in the same data/raw_pdfs directory the extractor scans
+        self.put((Path(extract_tables.PDF_DIR) / os.path.basename(path), sha256))
+
+    def close(self):
+        """Called by the download side once it is finished."""
+        self.put(None)
+
+    def __iter__(self):
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=POLL_SECONDS)
+                except Empty:
+                    yield PENDING
+                    continue
+                if item is None:
+                    return
+                yield item
+        finally:
+            self.stopped.set()
+
+
+def download(args: argparse.Namespace, downloads: DownloadQueue):
+    try:
+        rn_zip_df = download_maert_pdfs.read_rn_numbers_and_zipcodes(download_maert_pdfs.RNS_CSV_PATH)
+        download_maert_pdfs.scrape_maert_for_rns(rn_zip_df, args.concurrency, args.max_requests_per_second,
+                                                 args.backend, on_saved=downloads.on_saved, engine=args.engine)
+    except Exception as e:
+        logging.error(f"Downloading stopped early: {e}")
+    finally:
+        downloads.close()
+
+# ========== MAIN ==========
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download MAERT PDFs and extract their tables in one run, extracting each PDF as soon as it is saved.")
+    download_maert_pdfs.add_download_arguments(parser.add_argument_group("download options"))
+    extract_tables.add_extraction_arguments(parser.add_argument_group("extraction options"))
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f"Downloaded PDFs that may wait for extraction before downloading pauses "
+                             f"(default: {DEFAULT_QUEUE_SIZE})")
+    parser.add_argument('--trace', metavar='JSONL',
+                        help="Append a JSON line per timed download and extraction step to this file")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Profile the main (extraction) thread: cProfile stats, or pyinstrument HTML for a .html path")
+    args = parser.parse_args()
+
+    # Extraction workers are started while the download threads are running, and forking a
+    # multi-threaded process can leave a lock held forever in the child
+    multiprocessing.set_start_method("forkserver")
+    metrics.configure(args.trace)
+
+    # Downloads run in a background thread; the main thread hands PDFs to extraction worker
+    # processes (at least one, whatever --workers is) and writes out their results
+    downloads = DownloadQueue(args.queue_size)
+    downloader = threading.Thread(target=download, args=(args, downloads), name="downloads", daemon=True)
+    with profiled(args.profile):
+        downloader.start()
+        extract_tables.run(args, incoming=downloads)
+        downloader.join()
+    metrics.log_summary()
+
+
+if __name__ == "__main__":
+    main()
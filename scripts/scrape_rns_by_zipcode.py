@@ -4,10 +4,10 @@ import re
 import sys
 import logging
 import argparse
-from time import sleep
 from io import StringIO
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from bs4 import BeautifulSoup
 
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -16,6 +16,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.common.exceptions import TimeoutException
+import trio
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
@@ -29,49 +30,53 @@ options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) Apple
 
 # Constants
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BASE_DIR))
+
+from utils.waits import wait_metrics, wait_until
+from utils.rn_results import parse_results_table, parse_single_record
+from utils.instrumentation import metrics, profiled
+from utils.cdp import launch_browser
+
 DATA_PATH = os.path.join(BASE_DIR, '..', 'data')
-URL = "https://www15.tceq.texas.gov/crpub/index.cfm?fuseaction=regent.RNSearch"
+CHECKPOINT_DIR = os.path.join(DATA_PATH, 'zip_checkpoints')
+# Overridable (e.g. in the environment) to point the scraper at a local stand-in of the site
+URL = os.getenv("TCEQ_RN_SEARCH_URL", "https://www15.tceq.texas.gov/crpub/index.cfm?fuseaction=regent.RNSearch")
 WAIT_TIME = 10
+ENGINES = ("selenium", "cdp")
+
+RECORD_COUNT_XPATH = '/html/body/div/div[2]/div[2]/span'
+# XPath equivalents of the Selenium locators, for the CDP engine
+PGM_AREA_XPATH = "//select[@name='pgm_area']"
+ZIP_INPUT_XPATH = "//*[@id='zip_cd']"
+SEARCH_BUTTON_XPATH = "//*[@name='_fuseaction=regent.validateRE']"
+ERROR_XPATH = "//div[contains(concat(' ', normalize-space(@class), ' '), ' error ')]"
+NEXT_PAGE_XPATH = "//a[normalize-space(.)='>']"
 
 # Helper functions
 def wait_for_element(driver, by, value, timeout=WAIT_TIME):
     return WebDriverWait(driver, timeout).until(EC.presence_of_element_located((by, value)))
 
 def parse_single_record_page(html, zip_code):
-    soup = BeautifulSoup(html, "html.parser")
-    data = {}
-
-    reinfo = soup.find("div", id="reinfo")
-    if reinfo:
-        rows = reinfo.find_all(["div", "p"])
-        for row in rows:
-            label = row.find(class_="lbl")
-            if label:
-                label_text = label.get_text(strip=True).replace(":", "")
-                value = row.get_text(strip=True).replace(label.get_text(strip=True), "").strip()
-                data[label_text] = value
-
-    street = soup.find("div", id="street_addr")
-    if street:
-        span = street.find("span", class_="lbl")
-        if span:
-            label = span.get_text(strip=True).replace(":", "")
-            value = street.get_text(strip=True).replace(span.get_text(strip=True), "").strip()
-            data[label] = value
-
-    geo = soup.find("div", id="geo_loc")
-    if geo:
-        ps = geo.find_all("p")
-        for p in ps:
-            label = p.find("label")
-            if label:
-                label_text = label.get_text(strip=True).replace(":", "")
-                value = p.get_text(strip=True).replace(label.get_text(strip=True), "").strip()
-                data[label_text] = value
-
+    data = parse_single_record(html)
     data["zipcode"] = zip_code
     return pd.DataFrame([data])
 
+def parse_results_page(page_source, zip_code):
+    try:
+        with metrics.span("scrape.parse_page", zipcode=zip_code):
+            df = parse_results_table(page_source)
+        logging.info(f"DataFrame shape after parsing results table: {df.shape}")
+    except Exception as e:
+        logging.warning(f"Results table parsing failed for ZIP {zip_code}, falling back to pd.read_html: {e}")
+        try:
+            df = pd.read_html(StringIO(page_source))[0]
+        except Exception as e:
+            logging.error(f"pd.read_html failed for ZIP {zip_code}: {e}")
+            df = pd.DataFrame()
+
+    df["zipcode"] = zip_code
+    return df
+
 def scrape_zip(driver, zip_code):
     logging.info(f"Scraping ZIP {zip_code}")
     driver.get(URL)
@@ -88,7 +93,7 @@ def scrape_zip(driver, zip_code):
 
         try:
             results_text = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, '/html/body/div/div[2]/div[2]/span')))
+                EC.presence_of_element_located((By.XPATH, RECORD_COUNT_XPATH)))
             record_line = results_text.text.strip()
             record_numbers = [s for s in record_line.split() if s.isdigit()]
             if not record_numbers:
@@ -113,21 +118,19 @@ def scrape_zip(driver, zip_code):
         dfs = []
         while True:
             try:
-                sleep(3)
                 try:
-                    df = pd.read_html(StringIO(driver.page_source))[0]
-                    logging.info(f"DataFrame shape after read_html: {df.shape}")
-                except Exception as e:
-                    logging.error(f"pd.read_html failed for ZIP {zip_code}: {e}")
-                    df = pd.DataFrame()
-
-                #df = pd.read_html(StringIO(driver.page_source))[0]
-                df["zipcode"] = zip_code
-                dfs.append(df)
+                    wait_until(driver, EC.presence_of_element_located((By.TAG_NAME, "table")), WAIT_TIME, "results page", 3)
+                except TimeoutException:
+                    logging.warning(f"Timed out waiting for a results table for ZIP {zip_code}")
+                dfs.append(parse_results_page(driver.page_source, zip_code))
 
                 next_btn = driver.find_element(By.LINK_TEXT, ">")
+                current_table = driver.find_element(By.TAG_NAME, "table")
                 next_btn.click()
-                sleep(1)
+                try:
+                    wait_until(driver, EC.staleness_of(current_table), WAIT_TIME, "next page", 1)
+                except TimeoutException:
+                    logging.warning(f"Timed out waiting for the next results page for ZIP {zip_code}")
             except Exception:
                 break
 
@@ -136,28 +139,194 @@ def scrape_zip(driver, zip_code):
 
     except Exception as e:
         logging.error(f"Error scraping ZIP {zip_code}: {e}")
+        return None
+
+async def scrape_zip_cdp(tab, zip_code):
+    """scrape_zip for the CDP engine: the same search, record count, single-record and pagination handling."""
+    logging.info(f"Scraping ZIP {zip_code}")
+
+    try:
+        await tab.goto(URL)
+        await tab.wait_for_xpath(PGM_AREA_XPATH, timeout=WAIT_TIME)
+        await tab.select(PGM_AREA_XPATH, 'AIRNSR    ')
+        await tab.type(ZIP_INPUT_XPATH, zip_code)
+        await tab.click(SEARCH_BUTTON_XPATH)
+
+        try:
+            await tab.wait_for_xpath(RECORD_COUNT_XPATH, timeout=10)
+            record_line = (await tab.text(RECORD_COUNT_XPATH) or "").strip()
+            record_numbers = [s for s in record_line.split() if s.isdigit()]
+            if not record_numbers:
+                logging.warning(f"No numeric record count found in: '{record_line}'")
+                return pd.DataFrame()
+
+            num_records = int(record_numbers[0])
+            logging.info(f"Found {num_records} records for ZIP {zip_code}")
+
+        except TimeoutError:
+            if "No results were found" in (await tab.text(ERROR_XPATH) or ""):
+                logging.info(f"No results for ZIP {zip_code}. Skipping.")
+                return pd.DataFrame()
+            logging.info("Assuming single record view.")
+            return parse_single_record_page(await tab.html(), zip_code)
+
+        # Multi-record page scraping
+        dfs = []
+        while True:
+            try:
+                await tab.wait_for_xpath("//table", timeout=WAIT_TIME, label="results page", previous=3)
+            except TimeoutError:
+                logging.warning(f"Timed out waiting for a results table for ZIP {zip_code}")
+            dfs.append(parse_results_page(await tab.html(), zip_code))
+
+            if not await tab.exists(NEXT_PAGE_XPATH):
+                break
+            try:
+                async with tab.expect_new("//table", WAIT_TIME, "next page", 1):
+                    await tab.click(NEXT_PAGE_XPATH)
+            except TimeoutError:
+                logging.warning(f"Timed out waiting for the next results page for ZIP {zip_code}")
+
+        return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+
+    except Exception as e:
+        logging.error(f"Error scraping ZIP {zip_code}: {e}")
+        return None
+
+def checkpoint_path(zip_code):
+    return os.path.join(CHECKPOINT_DIR, f"{zip_code}.csv")
+
+def write_checkpoint(zip_code, df):
+    """
+    Records a finished ZIP. ZIPs without results get an empty file so --resume skips them too.
+    Written to a temp file first so a crash never leaves a half-written checkpoint.
+    """
+    path = checkpoint_path(zip_code)
+    tmp_path = f"{path}.tmp"
+    if df.empty:
+        open(tmp_path, 'w').close()
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def read_checkpoint(zip_code):
+    path = checkpoint_path(zip_code)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
         return pd.DataFrame()
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+def scrape_worker(worker_id, zip_queue):
+    """
+    Scrapes ZIPs off the shared queue in its own browser, checkpointing each one as it finishes.
+    ZIPs that fail are left without a checkpoint so a --resume run retries them.
+    """
+    with metrics.span("scrape.init_driver"):
+        driver = webdriver.Chrome(service=Service(), options=options)
+    with driver:
+        while True:
+            try:
+                zip_code = zip_queue.get_nowait()
+            except Empty:
+                return
+
+            with metrics.span("scrape.zip", zipcode=zip_code) as span:
+                try:
+                    df = scrape_zip(driver, zip_code)
+                except Exception as e:
+                    logging.error(f"[Worker {worker_id}] Error scraping ZIP {zip_code}: {e}")
+                    df = None
+                span["rows"] = None if df is None else len(df)
+            finish_zip(worker_id, zip_code, df)
+
+def finish_zip(worker_id, zip_code, df):
+    if df is None:
+        logging.warning(f"[Worker {worker_id}] ZIP {zip_code} failed; not checkpointed.")
+        return
+    if not df.empty:
+        logging.info(f"Checkpointing {len(df)} rows for ZIP {zip_code}")
+    else:
+        logging.info(f"No data for ZIP {zip_code}")
+    write_checkpoint(zip_code, df)
+
+async def scrape_tab_worker(worker_id, browser, zip_codes):
+    """CDP engine worker: scrapes ZIPs from the shared iterator, each in a fresh tab of the one browser."""
+    for zip_code in zip_codes:
+        with metrics.span("scrape.zip", zipcode=zip_code, engine="cdp") as span:
+            tab = await browser.new_tab()
+            try:
+                df = await scrape_zip_cdp(tab, zip_code)
+            except Exception as e:
+                logging.error(f"[Tab {worker_id}] Error scraping ZIP {zip_code}: {e}")
+                df = None
+            finally:
+                await tab.close()
+            span["rows"] = None if df is None else len(df)
+        finish_zip(worker_id, zip_code, df)
+
+async def scrape_zips_cdp(zip_codes, tabs):
+    """Scrapes zip_codes with the CDP engine: one headless Chrome, `tabs` pages loading at once."""
+    zip_codes = iter(zip_codes)
+    async with launch_browser() as browser, trio.open_nursery() as nursery:
+        for i in range(tabs):
+            nursery.start_soon(scrape_tab_worker, i, browser, zip_codes)
 
 def main():
     parser = argparse.ArgumentParser(description="Scrape RN numbers for one or more zipcodes and save a combined CSV.")
     parser.add_argument('zipcodes', nargs='+', help="One or more Texas zipcodes to scrape.")
     parser.add_argument('--output', default='rns_by_zipcode.csv',
                         help="Output CSV filename (default: rns_by_zipcode.csv)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip zipcodes already checkpointed by an earlier run")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of browsers (tabs, with the cdp engine) scraping zipcodes in parallel (default: 1)")
+    parser.add_argument('--engine', choices=ENGINES, default="selenium",
+                        help="Drive Chrome through Selenium (default), or through the DevTools Protocol with "
+                             "every worker a tab of one browser")
+    parser.add_argument('--trace', metavar='JSONL',
+                        help="Append a JSON line per timed step (browser start, zipcode, results page, wait...) to this file")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Profile the run: cProfile stats, or pyinstrument HTML for a .html path")
     args = parser.parse_args()
 
+    metrics.configure(args.trace)
+    with profiled(args.profile):
+        run(args)
+    metrics.log_summary()
+
+def run(args):
+    """Scrapes the requested zipcodes and merges their checkpoints into the output CSV."""
     os.makedirs(DATA_PATH, exist_ok=True)
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
     output_path = os.path.join(DATA_PATH, args.output)
 
-    combined_results = []
+    zipcodes = list(dict.fromkeys(args.zipcodes))
+    zip_queue = Queue()
+    for zip_code in zipcodes:
+        if args.resume and os.path.exists(checkpoint_path(zip_code)):
+            logging.info(f"Skipping checkpointed ZIP {zip_code}")
+            continue
+        # A fresh scrape must not fall back to an older run's checkpoint if it fails
+        if os.path.exists(checkpoint_path(zip_code)):
+            os.remove(checkpoint_path(zip_code))
+        zip_queue.put(zip_code)
+
+    workers = max(1, min(args.workers, zip_queue.qsize()))
+    if args.engine == "cdp":
+        logging.info(f"Scraping {zip_queue.qsize()} of {len(zipcodes)} zipcodes with {workers} tab(s) in one browser.")
+        trio.run(scrape_zips_cdp, list(zip_queue.queue), workers)
+    else:
+        logging.info(f"Scraping {zip_queue.qsize()} of {len(zipcodes)} zipcodes with {workers} browser(s).")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(scrape_worker, i, zip_queue) for i in range(workers)]:
+                future.result()
+
+    # Merge step: build the combined CSV from every requested ZIP's checkpoint
+    missing = [zip_code for zip_code in zipcodes if not os.path.exists(checkpoint_path(zip_code))]
+    if missing:
+        logging.warning(f"{len(missing)} zipcodes failed and are missing from the output "
+                        f"(re-run with --resume to retry): {', '.join(missing)}")
 
-    with webdriver.Chrome(service=Service(), options=options) as driver:
-        for zip_code in args.zipcodes:
-            df = scrape_zip(driver, zip_code)
-            if not df.empty:
-                logging.info(f"Appending {len(df)} rows for ZIP {zip_code}")
-                combined_results.append(df)
-            else:
-                logging.info(f"No data for ZIP {zip_code}")
+    combined_results = [df for df in (read_checkpoint(zip_code) for zip_code in zipcodes) if not df.empty]
 
     if combined_results:
         logging.info(f"Total DataFrames collected: {len(combined_results)}")
@@ -179,5 +348,7 @@ def main():
     else:
         logging.info("No data found for provided zipcodes. No CSV generated.")
 
+    wait_metrics.log_summary()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
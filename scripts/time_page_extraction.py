@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+from types import SimpleNamespace
+import pdfplumber
+
+# ========== PATH SETUP ==========
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from utils.page_analysis import PageAnalysis
+from utils.tricky_tables import extract_table_layout
+from scripts.extract_tables import COLUMNS, extract_tricky_text
+
+PDF_DIR = os.path.join(BASE_DIR, 'data', 'raw_pdfs')
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+# ========== PER-PAGE STRATEGIES ==========
+
+def legacy_page(page) -> bool:
+    """
+    The three independent calls extract_tables.py used to make on every page, and for a page
+    without a ruled table, the text-splitting parse it used to run on them. Returns whether
+    the page ends the table.
+    """
+    text = page.extract_text(keep_blank_chars=True)
+    text_simple = page.extract_text()
+    table = page.extract_table()
+    if table:
+        return bool(text_simple) and "point identification" in text_simple
+    try:
+        return extract_tricky_text(SimpleNamespace(text=text, text_simple=text_simple))[1]
+    except ValueError:
+        return False
+
+
+def analysis_page(page) -> bool:
+    """
+    What extract_pdf now does with each page: the ruled table and plain text from PageAnalysis
+    for an easy page, otherwise the word-position parse, falling back to splitting the text
+    only where no column layout is found. Returns whether the page ends the table.
+    """
+    analysis = PageAnalysis(page)
+    if analysis.table:
+        return bool(analysis.text_simple) and "point identification" in analysis.text_simple
+    df, end_of_table = extract_table_layout(analysis.words, COLUMNS)
+    if df is not None:
+        return end_of_table
+    try:
+        return extract_tricky_text(analysis)[1]
+    except ValueError:
+        return False
+
+
+def time_pdf(pdf_path: Path, max_pages: int) -> list[tuple[int, float, float]]:
+    """
+    Times both strategies on each page, flushing pdfplumber's page cache in between
+    so each measurement includes the layout pass.
+    """
+    timings = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[:max_pages]:
+            costs = []
+            for strategy in (legacy_page, analysis_page):
+                page.close()
+                start = time.perf_counter()
+                end_of_table = strategy(page)
+                costs.append(time.perf_counter() - start)
+            timings.append((page.page_number, *costs))
+            page.close()
+            if end_of_table:
+                break
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report per-page extraction cost before the PageAnalysis layer and on the current extraction path.")
+    parser.add_argument('pdfs', nargs='*', help="PDFs to time (default: every PDF under data/raw_pdfs)")
+    parser.add_argument('--max-pages', type=int, default=20, help="Pages to time per PDF (default: 20)")
+    args = parser.parse_args()
+
+    pdf_files = [Path(p) for p in args.pdfs] or sorted(Path(PDF_DIR).rglob("*.pdf"))
+
+    totals = [0, 0.0, 0.0]
+    for pdf_path in pdf_files:
+        try:
+            timings = time_pdf(pdf_path, args.max_pages)
+        except Exception as e:
+            logging.warning(f"Skipping {pdf_path.name}: {e}")
+            continue
+        for page_num, before, after in timings:
+            logging.info(f"{pdf_path.name} p{page_num}: before {before * 1000:.1f} ms, after {after * 1000:.1f} ms")
+            totals[0] += 1
+            totals[1] += before
+            totals[2] += after
+
+    pages, before, after = totals
+    if pages:
+        logging.info(f"{pages} pages: before {before / pages * 1000:.1f} ms/page, "
+                     f"after {after / pages * 1000:.1f} ms/page ({(1 - after / before) * 100:.0f}% saved)")
+    else:
+        logging.info("No pages timed.")
+
+
+if __name__ == "__main__":
+    main()
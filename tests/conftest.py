@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests import the repository's modules the same way the scripts do
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
@@ -0,0 +1,56 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+from utils.combined_dataset import CombinedDatasetWriter, SCHEMA
+from utils.normalization import normalize_rows
+
+
+def document(filename: str) -> pd.DataFrame:
+    return normalize_rows(pd.DataFrame({
+        "Emission Source": ["EPN1", "EPN1"],
+        "Source Name": ["Heater", "Heater"],
+        "Air Contaminant Name": ["NOx", "CO"],
+        "Emission Rate lbs/hr": ["<0.01 (6)", "1,234.5"],
+        "Emission Rate tons/year": ["3.1*", "empty"],
+        "filename": [filename, filename],
+        "zipcode": ["77001", "77001"],
+        "permit_number": ["12345", "12345"],
+        "publish_date": ["01-02-2020", "01-02-2020"],
+    }))
+
+
+def test_parts_read_back_with_the_current_schema(tmp_path):
+    with CombinedDatasetWriter(tmp_path) as writer:
+        writer.write(document("a.pdf"))
+    assert pq.read_schema(writer.part_path).equals(SCHEMA, check_metadata=False)
+
+
+def test_reopening_keeps_existing_parts(tmp_path):
+    with CombinedDatasetWriter(tmp_path) as first:
+        first.write(document("a.pdf"))
+
+    with CombinedDatasetWriter(tmp_path) as second:
+        assert first.part_path.exists()
+        assert second.documents() == {"a.pdf"}
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_rows_keep_their_types(tmp_path):
+    with CombinedDatasetWriter(tmp_path) as writer:
+        writer.write(document("a.pdf"))
+    maerts = pd.read_parquet(tmp_path)
+
+    assert maerts["emission_rate_lbs_hr"].tolist() == [0.01, 1234.5]
+    assert maerts["emission_rate_lbs_hr_qualifier"].tolist()[0] == "<"
+    assert maerts["publish_date"].tolist() == [pd.Timestamp("2020-01-02")] * 2
+    assert isinstance(maerts["air_contaminant_name"].dtype, pd.CategoricalDtype)
+
+
+def test_drop_documents(tmp_path):
+    with CombinedDatasetWriter(tmp_path) as writer:
+        writer.write(document("a.pdf"))
+        writer.write(document("b.pdf"))
+    with CombinedDatasetWriter(tmp_path) as writer:
+        writer.drop_documents({"a.pdf"})
+    assert set(pd.read_parquet(tmp_path)["filename"]) == {"b.pdf"}
+    assert not list(tmp_path.glob("*.tmp"))
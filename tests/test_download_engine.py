@@ -0,0 +1,258 @@
+import os
+import re
+import sys
+import zlib
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode, urljoin
+from urllib.request import urlopen
+
+import lxml.html
+import pandas as pd
+import pytest
+import trio
+
+from scripts import download_maert_pdfs
+from utils.cdp import CdpError, find_chrome
+from utils.download_ledger import DownloadLedger
+from utils.pdf_store import PdfStore
+from utils.pdf_validation import validate_pdf
+from utils.waits import completed_downloads, wait_for_download
+
+# The mock site imports its PDF generator as a top-level module, as when run from benchmarks/
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from mock_tceq import MockTceqServer, documents_for_rn, rns_for_zip  # noqa: E402
+
+ZIP_CODES = ["77001", "77002"]
+# Seven MAERTs and two permit letters per RN, so the results run to a second page
+MAERTS_PER_RN = 7
+HTML_ERROR_PAGE = b"<html><body><h1>Service Unavailable</h1></body></html>"
+
+
+def chrome_available() -> bool:
+    try:
+        find_chrome()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class HttpTab:
+    """
+    Stands in for utils.cdp.Tab where there is no Chrome. Pages are fetched over plain HTTP and
+    queried with lxml. Forms are submitted as GETs. A select with an onchange handler loads the
+    chosen option's value, as the records site's page list does. Following a link to an attachment
+    saves it to download_dir as a browser would: a partial file first, then renamed.
+    """
+
+    def __init__(self, download_dir: str):
+        self.download_dir = download_dir
+        self.url = None
+        self.doc = None
+
+    def _load(self, url: str):
+        with urlopen(url) as response:
+            body = response.read()
+            disposition = response.headers.get("Content-Disposition")
+        if disposition:
+            name = re.search(r'filename="([^"]+)"', disposition).group(1)
+            partial = os.path.join(self.download_dir, f"{name}.crdownload")
+            with open(partial, "wb") as f:
+                f.write(body)
+            os.replace(partial, os.path.join(self.download_dir, name))
+        else:
+            self.url = url
+            self.doc = lxml.html.fromstring(body, base_url=url)
+
+    def _element(self, xpath: str):
+        found = self.doc.xpath(xpath) if self.doc is not None else []
+        if not found:
+            raise CdpError(f"No element at {xpath}")
+        return found[0]
+
+    async def goto(self, url: str, timeout: float = 30):
+        await trio.to_thread.run_sync(self._load, url)
+
+    async def evaluate(self, expression: str):
+        assert expression == "location.href"
+        return self.url
+
+    async def wait_for_xpath(self, *xpaths: str, timeout: float, label: str | None = None, previous=0):
+        if not any([await self.exists(xpath) for xpath in xpaths]):
+            raise TimeoutError(f"Timed out after {timeout}s waiting for {label}")
+
+    @asynccontextmanager
+    async def expect_new(self, xpath: str, timeout: float, label: str | None = None, previous=0):
+        old = self.doc
+        yield
+        if self.doc is old or not await self.exists(xpath):
+            raise TimeoutError(f"Timed out after {timeout}s waiting for {label}")
+
+    async def exists(self, xpath: str) -> bool:
+        return self.doc is not None and bool(self.doc.xpath(xpath))
+
+    async def html(self, xpath: str | None = None) -> str:
+        return lxml.html.tostring(self._element(xpath) if xpath else self.doc, encoding="unicode")
+
+    async def click(self, xpath: str):
+        element = self._element(xpath)
+        if element.tag == "a":
+            await self.goto(urljoin(self.url, element.get("href")))
+        else:
+            form = next(element.iterancestors("form"))
+            await self.goto(f"{urljoin(self.url, form.get('action'))}?{urlencode(form.form_values())}")
+
+    async def type(self, xpath: str, text: str):
+        self._element(xpath).value = text
+
+    async def select(self, xpath: str, value: str | None = None, index: int | None = None):
+        element = self._element(xpath)
+        options = [option.get("value") for option in element.xpath(".//option")]
+        if index is not None:
+            value = options[index] if 0 <= index < len(options) else None
+        if value not in options:
+            raise CdpError(f"No option {value if index is None else index} in {xpath}")
+        element.value = value
+        if "location.href" in element.get("onchange", ""):
+            await self.goto(urljoin(self.url, value))
+
+    async def option_count(self, xpath: str) -> int | None:
+        return len(self._element(xpath).xpath(".//option")) if await self.exists(xpath) else None
+
+    async def headers(self) -> dict[str, str]:
+        return {"Referer": self.url}
+
+    async def close(self):
+        pass
+
+
+class HttpBrowser:
+    def __init__(self):
+        self.tabs = 0
+
+    async def new_tab(self, download_dir: str | None = None) -> HttpTab:
+        self.tabs += 1
+        return HttpTab(download_dir)
+
+
+@pytest.fixture
+def mock_site(tmp_path, monkeypatch):
+    with MockTceqServer(latency=0.01, rns_per_zip=5, maerts_per_rn=MAERTS_PER_RN, n_pdfs=2, sources=5) as server:
+        monkeypatch.setattr(download_maert_pdfs, "SEARCH_URL", server.records_search_url)
+        monkeypatch.setattr(download_maert_pdfs, "DATA_PATH", str(tmp_path / "raw_pdfs"))
+        monkeypatch.setattr(download_maert_pdfs, "DOWNLOAD_LOGS_PATH", str(tmp_path / "download_logs.csv"))
+        os.makedirs(tmp_path / "raw_pdfs")
+        yield server
+
+
+@pytest.fixture
+def http_browser(monkeypatch):
+    browser = HttpBrowser()
+
+    @asynccontextmanager
+    async def launch_browser():
+        yield browser
+
+    monkeypatch.setattr(download_maert_pdfs, "launch_browser", launch_browser)
+    return browser
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = DownloadLedger(str(tmp_path / "ledger.sqlite"))
+    yield ledger
+    ledger.close()
+
+
+def rn_zip_df(server) -> pd.DataFrame:
+    return pd.DataFrame([{"rn_number": rn, "zipcode": int(zip_code)}
+                         for zip_code in ZIP_CODES for rn in rns_for_zip(zip_code, server.rns_per_zip)])
+
+
+def assert_everything_downloaded(server, ledger, tmp_path):
+    documents = ledger.documents()
+    assert len(documents) == server.expected(ZIP_CODES)["maerts"]
+    assert set(documents["status"]) == {"downloaded"}
+    assert sorted(os.listdir(tmp_path / "raw_pdfs")) == sorted(documents["file_name"])
+
+    statuses = dict(ledger.conn.execute("SELECT rn_number, status FROM rns").fetchall())
+    assert len(statuses) == server.expected(ZIP_CODES)["rns"]
+    # Every fifth RN of the mock site has no documents at all
+    assert {rn: status for rn, status in statuses.items() if status != "done"} == {
+        rn: "no_maert" for rn in statuses if rn.endswith("4")}
+
+
+def off_loop(calls: list, name: str, function):
+    """Wraps function to note calls made on the trio event loop's thread instead of in a worker thread."""
+    def wrapper(*args, **kwargs):
+        try:
+            trio.lowlevel.current_task()
+            calls.append(name)
+        except RuntimeError:
+            pass
+        return function(*args, **kwargs)
+    return wrapper
+
+
+@pytest.mark.parametrize("backend", download_maert_pdfs.BACKENDS)
+def test_cdp_engine_downloads_the_mock_site(mock_site, ledger, tmp_path, monkeypatch, http_browser, backend):
+    # SQLite and validation block, so the engine must keep them off the event loop
+    on_loop = []
+    for name in ("is_downloaded", "mark_rn", "record_document", "record_check", "find_file"):
+        setattr(ledger, name, off_loop(on_loop, name, getattr(ledger, name)))
+    monkeypatch.setattr(download_maert_pdfs, "validate_pdf", off_loop(on_loop, "validate_pdf", validate_pdf))
+
+    download_maert_pdfs.download_rns(rn_zip_df(mock_site), ledger, PdfStore(str(tmp_path / "pdf_store")),
+                                     concurrency=3, requests_per_second=0, backend=backend, engine="cdp")
+
+    assert_everything_downloaded(mock_site, ledger, tmp_path)
+    assert on_loop == []
+    assert http_browser.tabs == mock_site.expected(ZIP_CODES)["rns"]
+
+    # A second run finds nothing left to do
+    download_maert_pdfs.download_rns(rn_zip_df(mock_site), ledger, PdfStore(str(tmp_path / "pdf_store")),
+                                     concurrency=3, requests_per_second=0, backend=backend, engine="cdp")
+    assert http_browser.tabs == mock_site.expected(ZIP_CODES)["rns"]
+    assert len(ledger.documents()) == mock_site.expected(ZIP_CODES)["maerts"]
+
+
+@pytest.mark.parametrize("backend", download_maert_pdfs.BACKENDS)
+def test_rejected_downloads_are_deleted(mock_site, ledger, tmp_path, monkeypatch, http_browser, backend):
+    # The site answers some document links with an error page instead of the PDF
+    mock_site.pdfs = [mock_site.pdfs[0], HTML_ERROR_PAGE]
+    rejected = {document_id for zip_code in ZIP_CODES for rn in rns_for_zip(zip_code, mock_site.rns_per_zip)
+                for document_id, _, doc_type, _ in documents_for_rn(rn, MAERTS_PER_RN)
+                if doc_type == "MAERT" and zlib.crc32(document_id.encode()) % 2 == 1}
+    assert rejected
+
+    # Each document must find the download directory empty but for its own download
+    leftovers = []
+
+    def checked_wait(directory):
+        downloaded = wait_for_download(directory)
+        leftovers.append(len(completed_downloads(directory)) - 1)
+        return downloaded
+
+    def checked_fetch(*args):
+        complete = fetch_links_http(*args)
+        leftovers.append(len(os.listdir(args[6])))
+        return complete
+
+    fetch_links_http = download_maert_pdfs.fetch_links_http
+    monkeypatch.setattr(download_maert_pdfs, "wait_for_download", checked_wait)
+    monkeypatch.setattr(download_maert_pdfs, "fetch_links_http", checked_fetch)
+
+    download_maert_pdfs.download_rns(rn_zip_df(mock_site), ledger, PdfStore(str(tmp_path / "pdf_store")),
+                                     concurrency=3, requests_per_second=0, backend=backend, engine="cdp")
+
+    documents = ledger.documents().set_index("document_id")
+    assert set(documents.index[documents["status"] == "failed"]) == rejected
+    assert set(documents.loc[list(rejected), "note"]) == {"Invalid or missing PDF"}
+    assert (documents["status"] == "downloaded").sum() == mock_site.expected(ZIP_CODES)["maerts"] - len(rejected)
+    assert leftovers and set(leftovers) == {0}
+
+
+@pytest.mark.skipif(not chrome_available(), reason="needs Chrome (set CHROME_PATH)")
+def test_cdp_engine_downloads_the_mock_site_in_chrome(mock_site, ledger, tmp_path):
+    download_maert_pdfs.download_rns(rn_zip_df(mock_site), ledger, PdfStore(str(tmp_path / "pdf_store")),
+                                     concurrency=3, requests_per_second=0, engine="cdp")
+    assert_everything_downloaded(mock_site, ledger, tmp_path)
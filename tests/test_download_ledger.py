@@ -0,0 +1,157 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from utils.download_ledger import DownloadLedger
+from utils.pdf_validation import PdfCheck
+
+# The documents table as the first release of the ledger created it, before sha256
+FIRST_RELEASE_SCHEMA = """
+CREATE TABLE rns (
+    rn_number TEXT NOT NULL,
+    zipcode TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (rn_number, zipcode)
+);
+CREATE TABLE documents (
+    document_id TEXT PRIMARY KEY,
+    rn_number TEXT NOT NULL,
+    zipcode TEXT NOT NULL,
+    permit_number TEXT,
+    document_date TEXT,
+    file_name TEXT,
+    status TEXT NOT NULL,
+    note TEXT,
+    updated_at TEXT NOT NULL
+);
+INSERT INTO rns VALUES ('RN100', '77001', 'done', '2024-01-01T00:00:00+00:00');
+INSERT INTO documents VALUES ('doc-1', 'RN100', '77001', '12345', '01/02/2020', '77001_12345_01-02-2020_1.pdf',
+                              'downloaded', NULL, '2024-01-01T00:00:00+00:00');
+"""
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = DownloadLedger(str(tmp_path / "ledger.sqlite"))
+    yield ledger
+    ledger.close()
+
+
+def test_migration_adds_sha256_to_a_first_release_ledger(tmp_path):
+    path = str(tmp_path / "ledger.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.executescript(FIRST_RELEASE_SCHEMA)
+    conn.close()
+
+    ledger = DownloadLedger(path)
+    try:
+        columns = {row["name"] for row in ledger.conn.execute("PRAGMA table_info(documents)")}
+        indexes = {row["name"] for row in ledger.conn.execute("PRAGMA index_list(documents)")}
+        assert "sha256" in columns and "idx_documents_sha256" in indexes
+
+        # Existing progress survives, with no hash for documents recorded before it was kept
+        assert ledger.is_downloaded("doc-1")
+        assert ledger.pending_rns([("RN100", "77001")]) == []
+        assert ledger.documents()["sha256"].isna().all()
+
+        ledger.record_document("doc-2", "RN100", "77001", "12345", "01/02/2020", "b.pdf", sha256="abc")
+        assert ledger.find_file("abc", "77001", "12345", "01/02/2020") == "b.pdf"
+    finally:
+        ledger.close()
+
+    # Opening an already migrated ledger again changes nothing
+    DownloadLedger(path).close()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 2
+    conn.close()
+
+
+def test_pending_rns_keeps_input_order_and_skips_finished(ledger):
+    ledger.mark_rn("RN1", "77001", "done")
+    ledger.mark_rn("RN2", "77001", "no_maert")
+    ledger.mark_rn("RN3", "77001", "incomplete")
+    ledger.mark_rn("RN4", "77001", "in_progress")
+    ledger.mark_rn("RN5", "77001", "failed")
+
+    pairs = [("RN5", "77001"), ("RN1", "77001"), ("RN3", "77001"), ("RN2", "77001"), ("RN4", "77001"),
+             ("RN6", "77001"), ("RN1", "77002")]
+    assert ledger.pending_rns(pairs) == [("RN5", "77001"), ("RN3", "77001"), ("RN4", "77001"),
+                                         ("RN6", "77001"), ("RN1", "77002")]
+
+
+def test_pending_rns_compares_as_text(ledger):
+    # Zip codes read from the CSV can arrive as integers
+    ledger.mark_rn("RN1", 77001, "done")
+    assert ledger.pending_rns([("RN1", 77001), ("RN1", "77001"), ("RN2", 77001)]) == [("RN2", 77001)]
+
+
+def test_mark_rn_updates_status(ledger):
+    ledger.mark_rn("RN1", "77001", "in_progress")
+    assert ledger.pending_rns([("RN1", "77001")]) == [("RN1", "77001")]
+    ledger.mark_rn("RN1", "77001", "done")
+    assert ledger.pending_rns([("RN1", "77001")]) == []
+
+
+def test_is_downloaded(ledger):
+    ledger.record_document("ok", "RN1", "77001", "12345", "01/02/2020", "a.pdf")
+    ledger.record_document("bad", "RN1", "77001", "12346", "01/02/2020", status="failed", note="Invalid or missing PDF")
+    ledger.record_document(123, "RN1", "77001")
+
+    assert ledger.is_downloaded("ok")
+    assert not ledger.is_downloaded("bad")
+    assert not ledger.is_downloaded("unknown")
+    assert ledger.is_downloaded("123") and ledger.is_downloaded(123)
+
+    # A failed document that is later downloaded counts, and the reverse doesn't
+    ledger.record_document("bad", "RN1", "77001", "12346", "01/02/2020", "b.pdf")
+    ledger.record_document("ok", "RN1", "77001", "12345", "01/02/2020", status="failed")
+    assert ledger.is_downloaded("bad") and not ledger.is_downloaded("ok")
+    assert ledger.downloaded_files() == {"b.pdf"}
+
+
+def test_find_file_matches_content_and_document(ledger):
+    ledger.record_document("a", "RN1", "77001", "12345", "01/02/2020", "a.pdf", sha256="abc")
+    ledger.record_document("f", "RN1", "77001", "12345", "01/02/2020", status="failed", sha256="def")
+
+    assert ledger.find_file("abc", "77001", "12345", "01/02/2020") == "a.pdf"
+    assert ledger.find_file("abc", 77001, 12345, "01/02/2020") == "a.pdf"
+    assert ledger.find_file("abc", "77001", "12345", "03/04/2021") is None
+    assert ledger.find_file("def", "77001", "12345", "01/02/2020") is None
+
+
+def test_checks_round_trip(ledger):
+    ledger.record_check("abc", PdfCheck(True, 3, "quick", None))
+    ledger.record_check("def", PdfCheck(False, None, "full", "truncated"))
+    assert ledger.checks(["abc", "def", "missing"]) == {
+        "abc": {"valid": True, "page_count": 3, "method": "quick", "reason": None},
+        "def": {"valid": False, "page_count": None, "method": "full", "reason": "truncated"},
+    }
+
+
+def test_import_csv_log(ledger, tmp_path):
+    csv_path = tmp_path / "download_logs.csv"
+    pd.DataFrame({
+        "rn_number": ["RN1", "RN1", "RN2"],
+        "file_name": ["77001_1_01-02-2020_1.pdf", "77001_2_01-02-2020_2.pdf", "77002_3_01-02-2020_3.pdf"],
+        "zipcode": ["77001", "77001", "77002"],
+    }).to_csv(csv_path, index=False)
+    ledger.mark_rn("RN2", "77002", "incomplete")
+
+    assert ledger.import_csv_log(str(csv_path)) == 3
+
+    # Logged RNs count as done, but progress already in the ledger is kept
+    assert ledger.pending_rns([("RN1", "77001"), ("RN2", "77002"), ("RN3", "77003")]) == [
+        ("RN2", "77002"), ("RN3", "77003")]
+    assert ledger.is_downloaded("legacy:77001_1_01-02-2020_1.pdf")
+    assert ledger.downloaded_files() == {"77001_1_01-02-2020_1.pdf", "77001_2_01-02-2020_2.pdf",
+                                         "77002_3_01-02-2020_3.pdf"}
+
+    # Importing the same log again adds nothing
+    ledger.import_csv_log(str(csv_path))
+    assert len(ledger.documents()) == 3
+
+
+def test_import_csv_log_without_a_log(ledger, tmp_path):
+    assert ledger.import_csv_log(str(tmp_path / "missing.csv")) == 0
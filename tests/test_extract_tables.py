@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+from pandas.testing import assert_frame_equal
+
+from scripts import extract_tables
+from utils.maert_index import MaertIndex
+from utils.normalization import normalize_rows
+
+NAN = np.nan
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract_tables, "OUTPUT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def write_extracted_csv(output_dir, pdf_name: str) -> str:
+    """An extracted CSV as run() writes it: blank cells were NaN in the extracted rows."""
+    df = pd.DataFrame({
+        "Emission Source": ["EPN1", "EPN1", "EPN2"],
+        "Source Name": ["Heater", NAN, "NA"],
+        "Air Contaminant Name": ["NOx", "CO", "VOC"],
+        "Emission Rate lbs/hr": ["0.5", NAN, "N/A"],
+        "Emission Rate tons/year": ["<0.01 (6)", "2.0", "null"],
+    })
+    df = extract_tables.add_metadata(df, Path(pdf_name))
+    output_csv = f"{Path(pdf_name).stem}_extracted.csv"
+    df.to_csv(output_dir / output_csv, index=False)
+    return output_csv
+
+
+def test_read_extracted_csv_only_blanks_are_missing(output_dir):
+    df = extract_tables.read_extracted_csv(write_extracted_csv(output_dir, "77001_12345_01-02-2020_1.pdf"))
+
+    assert df["Source Name"].tolist()[0] == "Heater" and pd.isna(df["Source Name"][1])
+    assert df["Source Name"][2] == "NA"
+    assert pd.isna(df["Emission Rate lbs/hr"][1])
+    assert df["Emission Rate lbs/hr"][2] == "N/A" and df["Emission Rate tons/year"][2] == "null"
+    assert df["publish_date"].tolist() == ["01-02-2020"] * 3
+
+
+def test_duplicate_rows_match_the_backfilled_original(output_dir, tmp_path):
+    original = "77001_12345_01-02-2020_1.pdf"
+    source = {"pdf": original, "status": "processed", "output_csv": write_extracted_csv(output_dir, original)}
+    duplicate = "77001_12345_01-02-2020_2.pdf"
+
+    backfilled = normalize_rows(extract_tables.read_extracted_csv(source["output_csv"]))
+    pdf_path, reused, status, note, _ = extract_tables.reuse_result(Path(duplicate), source)
+    reused = normalize_rows(reused)
+
+    assert (pdf_path, status, note) == (Path(duplicate), "processed", f"duplicate of {original}")
+    assert set(reused["filename"]) == {duplicate}
+    assert_frame_equal(reused.drop(columns="filename"), backfilled.drop(columns="filename"))
+
+    with MaertIndex(str(tmp_path / "index.sqlite")) as index:
+        index.write(backfilled)
+        index.write(reused)
+        nulls = index.query("SELECT filename, COUNT(*) AS n FROM maerts WHERE source_name IS NULL "
+                            "AND emission_rate_lbs_hr IS NULL GROUP BY filename ORDER BY filename")
+    assert nulls.to_dict("records") == [{"filename": original, "n": 1}, {"filename": duplicate, "n": 1}]
@@ -0,0 +1,198 @@
+import argparse
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from scripts import extract_tables, query_maerts
+from utils.download_ledger import DownloadLedger
+from utils.maert_index import MaertIndex
+from utils.normalization import normalize_rows
+
+# Two MAERTs of permit 100 (the 2021 one supersedes the 2019 one) and one of permit 200
+OLD_100 = "77001_100_01-15-2019_1.pdf"
+NEW_100 = "77001_100_06-30-2021_2.pdf"
+ONLY_200 = "77002_200_03-01-2020_3.pdf"
+
+ROWS = {
+    OLD_100: [("EPN1", "Heater", "NOx", "1.0", "4.0"),
+              ("EPN1", "Heater", "CO", "2.0", "8.0")],
+    NEW_100: [("EPN1", "Heater", "NOx", "0.5", "2.0"),
+              ("EPN2", "Flare", "VOC", "<0.01 (6)", "0.04"),
+              ("EPN2", "Flare", "SO2", "empty", "1.5")],
+    ONLY_200: [("T-1", "Tank", "nox", "3.0", "12.0"),
+               ("T-1", "Tank", "VOC", "1.0", "3.0")],
+}
+RNS = {OLD_100: "RN100", NEW_100: "RN100", ONLY_200: "RN200"}
+
+
+def document(filename: str) -> pd.DataFrame:
+    """A document's rows as extraction hands them to the index."""
+    df = pd.DataFrame(ROWS[filename], columns=extract_tables.COLUMNS)
+    return normalize_rows(extract_tables.add_metadata(df, Path(filename)))
+
+
+def query_args(**options) -> argparse.Namespace:
+    """The options of a query subcommand, as parsed with none given, overridden by options."""
+    defaults = {"zipcode": None, "rn": None, "permit": None, "pollutant": None, "since": None, "until": None,
+                "all_versions": False, "min_tons": None, "min_lbs": None, "limit": query_maerts.DEFAULT_LIMIT}
+    return argparse.Namespace(**{**defaults, **options})
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    path = str(tmp_path / "ledger.sqlite")
+    ledger = DownloadLedger(path)
+    for filename, rn in RNS.items():
+        ledger.record_document(f"doc-{filename}", rn, filename[:5], filename.split("_")[1], None, filename)
+    ledger.close()
+    return path
+
+
+@pytest.fixture
+def index(tmp_path, ledger_path):
+    with MaertIndex(str(tmp_path / "index.sqlite"), ledger_path) as index:
+        yield index
+
+
+@pytest.fixture
+def full_index(index, tmp_path):
+    for filename in ROWS:
+        index.write(document(filename))
+    pd.DataFrame({"rn_number": ["RN100", "RN200"], "zipcode": ["77001", "77002"],
+                  query_maerts.RN_NAME_COLUMN: ["Refinery", "Tank Farm"]}).to_csv(tmp_path / "rns.csv", index=False)
+    index.load_rns(str(tmp_path / "rns.csv"))
+    return index
+
+
+def latest(index: MaertIndex) -> dict[str, int]:
+    return dict(index.conn.execute("SELECT filename, latest FROM documents").fetchall())
+
+
+def test_write_and_drop_documents(index):
+    index.write(document(OLD_100))
+    index.write(document(ONLY_200))
+    assert index.documents() == {OLD_100, ONLY_200}
+
+    rows = index.query("SELECT * FROM maerts WHERE filename = ? ORDER BY rowid", (OLD_100,))
+    assert rows[["rn_number", "zipcode", "permit_number", "publish_date"]].drop_duplicates().values.tolist() == [
+        ["RN100", "77001", "100", "2019-01-15"]]
+    assert rows["air_contaminant_name"].tolist() == ["NOx", "CO"]
+    assert rows["emission_rate_tons_year"].tolist() == [4.0, 8.0]
+
+    # Writing a document again replaces its rows
+    index.write(document(OLD_100))
+    assert index.query("SELECT COUNT(*) AS n FROM maerts")["n"][0] == 4
+
+    index.drop_documents({OLD_100})
+    assert index.documents() == {ONLY_200}
+    assert set(index.query("SELECT DISTINCT filename FROM maerts")["filename"]) == {ONLY_200}
+
+
+def test_rates_keep_their_qualifier(index):
+    index.write(document(NEW_100))
+    rows = index.query("SELECT air_contaminant_name, emission_rate_lbs_hr, emission_rate_lbs_hr_qualifier "
+                       "FROM maerts ORDER BY rowid")
+    assert rows.values.tolist()[1] == ["VOC", 0.01, "<"]
+    assert rows["emission_rate_lbs_hr"].isna().tolist() == [False, False, True]
+
+
+def test_republished_permit_flips_latest(index):
+    index.write(document(OLD_100))
+    index.write(document(ONLY_200))
+    assert latest(index) == {OLD_100: 1, ONLY_200: 1}
+
+    index.write(document(NEW_100))
+    assert latest(index) == {OLD_100: 0, NEW_100: 1, ONLY_200: 1}
+
+    # Dropping the newer MAERT makes the older one current again
+    index.drop_documents({NEW_100})
+    assert latest(index) == {OLD_100: 1, ONLY_200: 1}
+
+
+def test_link_rns_fills_in_documents_indexed_before_their_download(tmp_path, ledger_path):
+    unknown = "77003_300_01-01-2020_4.pdf"
+    with MaertIndex(str(tmp_path / "index.sqlite"), ledger_path) as index:
+        index.write(document(OLD_100).assign(filename=unknown))
+        assert index.link_rns() == 0
+
+        ledger = DownloadLedger(ledger_path)
+        ledger.record_document("doc-unknown", "RN300", "77003", "300", None, unknown)
+        ledger.close()
+
+        assert index.link_rns() == 1
+        assert set(index.query("SELECT rn_number FROM maerts")["rn_number"]) == {"RN300"}
+
+
+def test_load_rns_skips_an_unchanged_file(index, tmp_path):
+    csv_path = tmp_path / "rns.csv"
+    pd.DataFrame({"rn_number": ["RN100"], "zipcode": ["77001"]}).to_csv(csv_path, index=False)
+    assert index.load_rns(str(csv_path))
+    assert not index.load_rns(str(csv_path))
+    assert index.rn_columns() == ["rn_number", "zipcode"]
+    assert not index.load_rns(str(tmp_path / "missing.csv"))
+
+
+def test_query_rows(full_index):
+    rows = query_maerts.query_rows(full_index, query_args())
+    # Only the latest MAERT of each permit, unless all versions are asked for
+    assert set(rows["filename"]) == {NEW_100, ONLY_200}
+    assert len(query_maerts.query_rows(full_index, query_args(all_versions=True))) == 7
+
+    nox = query_maerts.query_rows(full_index, query_args(pollutant=["NOX"]))
+    assert nox[["rn_number", "air_contaminant_name", "emission_rate_tons_year"]].values.tolist() == [
+        ["RN100", "NOx", 2.0], ["RN200", "nox", 12.0]]
+
+    filtered = query_maerts.query_rows(full_index, query_args(zipcode=["77001"], min_tons=1.0))
+    assert filtered["air_contaminant_name"].tolist() == ["NOx", "SO2"]
+    assert filtered["lbs_hr_qualifier"].isna().all()
+
+    old = query_maerts.query_rows(full_index, query_args(until="2019-12-31", all_versions=True))
+    assert set(old["filename"]) == {OLD_100}
+    assert len(query_maerts.query_rows(full_index, query_args(limit=2))) == 2
+
+
+def test_query_facilities(full_index):
+    facilities = query_maerts.query_facilities(full_index, query_args())
+    assert facilities[["rn_number", query_maerts.RN_NAME_COLUMN, "permits", "rows"]].values.tolist() == [
+        ["RN200", "Tank Farm", "200", 2], ["RN100", "Refinery", "100", 3]]
+    assert facilities["tons_year"].tolist() == pytest.approx([15.0, 3.54])
+    assert facilities["lbs_hr"].tolist() == pytest.approx([4.0, 0.51])
+
+    everything = query_maerts.query_facilities(full_index, query_args(all_versions=True))
+    assert everything.set_index("rn_number")["tons_year"].to_dict() == pytest.approx({"RN200": 15.0, "RN100": 15.54})
+
+    assert query_maerts.query_facilities(full_index, query_args(min_tons=10))["rn_number"].tolist() == ["RN200"]
+
+
+def test_query_pollutants(full_index):
+    pollutants = query_maerts.query_pollutants(full_index, query_args())
+    # Contaminant names are grouped case-insensitively, as they are filtered
+    assert pollutants[["air_contaminant_name", "facilities", "rows"]].values.tolist() == [
+        ["NOx", 2, 2], ["VOC", 2, 2], ["SO2", 1, 1]]
+    assert pollutants["tons_year"].tolist() == pytest.approx([14.0, 3.04, 1.5])
+
+    in_77002 = query_maerts.query_pollutants(full_index, query_args(zipcode=["77002"]))
+    assert in_77002["air_contaminant_name"].tolist() == ["nox", "VOC"]
+
+
+def test_update_index_follows_the_manifest(index, tmp_path, monkeypatch):
+    monkeypatch.setattr(extract_tables, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(extract_tables, "RNS_CSV_PATH", str(tmp_path / "missing.csv"))
+    manifest = {}
+    for filename in (NEW_100, ONLY_200):
+        output_csv = f"{Path(filename).stem}_extracted.csv"
+        raw = extract_tables.add_metadata(pd.DataFrame(ROWS[filename], columns=extract_tables.COLUMNS), Path(filename))
+        raw.to_csv(tmp_path / output_csv, index=False)
+        manifest[filename] = {"pdf": filename, "status": "processed", "output_csv": output_csv}
+    manifest["failed.pdf"] = {"pdf": "failed.pdf", "status": "failed", "output_csv": None}
+    monkeypatch.setattr(extract_tables, "load_manifest", lambda: manifest)
+
+    # OLD_100 is no longer extracted, and ONLY_200 is already indexed
+    index.write(document(OLD_100))
+    index.write(document(ONLY_200))
+    query_maerts.update_index(index)
+
+    assert index.documents() == {NEW_100, ONLY_200}
+    assert latest(index) == {NEW_100: 1, ONLY_200: 1}
+    assert len(query_maerts.query_rows(index, query_args())) == 5
@@ -0,0 +1,45 @@
+import pytest
+from pandas.testing import assert_frame_equal
+
+import utils.maert_locator as maert_locator
+from benchmarks.synthetic_maert import synthetic_rows, write_easy_maert
+from scripts.extract_tables import process_pdf
+from utils.maert_locator import ALL_PAGES, format_page_range, locate_maert_pages, parse_page_range
+
+
+@pytest.mark.parametrize("page_range, text", [((0, 0), "1-1"), ((2, 14), "3-15"), (None, ALL_PAGES)])
+def test_page_range_round_trip(page_range, text):
+    assert format_page_range(page_range) == text
+    assert parse_page_range(text) == page_range
+
+
+def test_locate_synthetic_maert(tmp_path):
+    path = tmp_path / "77000_900000_01-01-2020_0.pdf"
+    page_count = write_easy_maert(path, synthetic_rows(40))
+    assert page_count > 1
+    assert locate_maert_pages(path) == (0, page_count - 1)
+
+
+def test_locate_unreadable_pdf_extracts_all_pages(tmp_path):
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"not a pdf")
+    assert locate_maert_pages(path) is None
+
+
+def test_process_pdf_reuses_located_pages(tmp_path, monkeypatch):
+    path = tmp_path / "77000_900000_01-01-2020_0.pdf"
+    write_easy_maert(path, synthetic_rows(10))
+    scanned_path, scanned_df, status, _, maert_pages = process_pdf(path)
+    assert scanned_path == path and status == "processed"
+    assert maert_pages == format_page_range(locate_maert_pages(path))
+
+    def fail_scan(pdf_path):
+        raise AssertionError("recorded page range was not reused")
+
+    monkeypatch.setattr(maert_locator, "scan_maert_pages", fail_scan)
+    _, reused_df, status, _, reused_pages = process_pdf(path, located_pages={path: maert_pages})
+    assert status == "processed" and reused_pages == maert_pages
+    assert_frame_equal(reused_df, scanned_df)
+
+    _, _, _, _, all_pages = process_pdf(path, locate_pages=False)
+    assert all_pages is None
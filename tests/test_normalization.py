@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from benchmarks.synthetic_maert import synthetic_rows, write_easy_maert
+from scripts.extract_tables import COLUMNS, extract_pdf
+from utils.normalization import normalize_rows, parse_dates, parse_rates
+
+NAN = np.nan
+
+
+@pytest.mark.parametrize("raw, rate, qualifier, footnote", [
+    ("4.07", 4.07, None, None),
+    (" 12 ", 12.0, None, None),
+    (".5", 0.5, None, None),
+    ("1,234.5", 1234.5, None, None),
+    ("1.2e-3", 0.0012, None, None),
+    ("<0.01", 0.01, "<", None),
+    ("< 0.01", 0.01, "<", None),
+    ("<=2", 2.0, "<=", None),
+    ("≤2", 2.0, "<=", None),
+    (">5", 5.0, ">", None),
+    ("≥5", 5.0, ">=", None),
+    ("~3", 3.0, "~", None),
+    ("Less  than 0.5", 0.5, "<", None),
+    ("0.02 (6)", 0.02, None, "6"),
+    ("0.02(6)", 0.02, None, "6"),
+    ("<0.01 (6) (7)", 0.01, "<", "6,7"),
+    ("0.99 ( 4a )", 0.99, None, "4a"),
+    ("3.1*", 3.1, None, "*"),
+    ("3.1 **", 3.1, None, "**"),
+])
+def test_parse_rates(raw, rate, qualifier, footnote):
+    parsed = parse_rates(pd.Series([raw]))
+    assert parsed["rate"][0] == pytest.approx(rate)
+    assert (parsed["qualifier"][0] if pd.notna(parsed["qualifier"][0]) else None) == qualifier
+    assert (parsed["footnote"][0] if pd.notna(parsed["footnote"][0]) else None) == footnote
+
+
+@pytest.mark.parametrize("raw", [None, NAN, "", "   ", "empty", "N/A", "-", "see note", "Page 1 of 2",
+                                 "1.2.3", "(6)", "<", "0.02 (footnote)", "12 lbs"])
+def test_parse_rates_non_rates_are_missing(raw):
+    parsed = parse_rates(pd.Series([raw], dtype=object))
+    assert parsed.isna().all(axis=None)
+
+
+def test_parse_rates_types_and_index():
+    raw = pd.Series(["1.5", "<0.01 (6)", "empty"], index=[10, 11, 12])
+    parsed = parse_rates(raw)
+
+    assert parsed.index.tolist() == [10, 11, 12]
+    assert parsed["rate"].dtype == "float64"
+    assert isinstance(parsed["qualifier"].dtype, pd.CategoricalDtype)
+    assert parsed["rate"].tolist()[:2] == [1.5, 0.01]
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("01-02-2020", "2020-01-02"),
+    ("12-31-1999", "1999-12-31"),
+    ("2020-01-02", "2020-01-02"),
+])
+def test_parse_dates(raw, expected):
+    assert parse_dates(pd.Series([raw]))[0] == pd.Timestamp(expected)
+
+
+@pytest.mark.parametrize("raw", [None, "", "13-01-2020", "02-30-2020", "2020/01/02", "01-02-20", "not a date"])
+def test_parse_dates_bad_values_are_nat(raw):
+    dates = parse_dates(pd.Series([raw], dtype=object))
+    assert dates.dtype == "datetime64[ns]"
+    assert pd.isna(dates[0])
+
+
+def test_parse_dates_mixed_formats():
+    dates = parse_dates(pd.Series(["01-02-2020", "2021-03-04", "bad"]))
+    assert dates.tolist()[:2] == [pd.Timestamp("2020-01-02"), pd.Timestamp("2021-03-04")]
+    assert pd.isna(dates[2])
+
+
+def test_normalize_rows_keeps_raw_rates_and_adds_typed_columns():
+    df = normalize_rows(pd.DataFrame({
+        "Air Contaminant Name": ["  Hydrogen   Sulfide ", "", NAN],
+        "Emission Rate lbs/hr": ["<0.01 (6)", "empty", NAN],
+        "Emission Rate tons/year": ["3.1*", "2", ""],
+        "publish_date": ["01-02-2020", "01-02-2020", "bad"],
+    }))
+
+    assert df["Emission Rate lbs/hr"].tolist()[:2] == ["<0.01 (6)", "empty"]
+    assert df["emission_rate_lbs_hr"].tolist()[0] == 0.01
+    assert df["emission_rate_lbs_hr_qualifier"].tolist()[0] == "<"
+    assert df["emission_rate_lbs_hr_footnote"].tolist()[0] == "6"
+    assert df["emission_rate_tons_year"].tolist()[:2] == [3.1, 2.0]
+    assert df["emission_rate_tons_year_footnote"].tolist()[0] == "*"
+    assert df["Air Contaminant Name"].tolist()[0] == "Hydrogen Sulfide"
+    assert df["Air Contaminant Name"].isna().tolist() == [False, True, True]
+    assert pd.isna(df["publish_date"][2])
+
+
+def test_extract_pdf_rows_are_the_raw_csv_rows(tmp_path):
+    path = tmp_path / "77001_12345_01-02-2020_1.pdf"
+    write_easy_maert(path, synthetic_rows(5))
+    df, _ = extract_pdf(path)
+
+    # The per-document CSV keeps the text as extracted, with no typed columns
+    assert list(df.columns) == COLUMNS + ["filename", "zipcode", "entity", "permit_number", "publish_date"]
+    assert set(df["publish_date"]) == {"01-02-2020"}
+
+    # Rows read back from the CSV normalize exactly as the extracted rows do
+    csv_path = tmp_path / "extracted.csv"
+    df.to_csv(csv_path, index=False)
+    read_back = pd.read_csv(csv_path, dtype=str)
+    assert_frame_equal(normalize_rows(read_back), normalize_rows(df.reset_index(drop=True)))
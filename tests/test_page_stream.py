@@ -0,0 +1,80 @@
+from contextlib import closing
+
+import pytest
+
+import utils.page_stream as page_stream
+from benchmarks.synthetic_maert import synthetic_rows, write_easy_maert
+from utils.page_stream import OversizedDocument, current_rss_mb, stream_pages
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "77001_12345_01-02-2020_1.pdf"
+    page_count = write_easy_maert(path, synthetic_rows(60))
+    assert page_count >= 3
+    return path, page_count
+
+
+def fake_rss(monkeypatch, readings: list[float]) -> list[float]:
+    """Makes current_rss_mb return readings in turn; returns the list, which empties as they are read."""
+    readings = list(readings)
+    monkeypatch.setattr(page_stream, "current_rss_mb", lambda: readings.pop(0))
+    return readings
+
+
+def page_numbers(pages) -> list[int]:
+    with closing(pages):
+        return [analysis.page_number for analysis in pages]
+
+
+def test_streams_every_page(pdf):
+    path, page_count = pdf
+    assert page_numbers(stream_pages(path)) == list(range(1, page_count + 1))
+    assert page_numbers(stream_pages(path, page_range=(1, 2))) == [2, 3]
+
+
+def test_page_cap(pdf):
+    path, page_count = pdf
+    pages = stream_pages(path, max_pages=page_count - 1)
+    with pytest.raises(OversizedDocument, match=f"{page_count} pages to parse, over the cap of {page_count - 1}"):
+        next(pages)
+
+    # The cap applies to the pages to parse, not the whole document
+    assert page_numbers(stream_pages(path, page_range=(0, 1), max_pages=2)) == [1, 2]
+    assert len(page_numbers(stream_pages(path, max_pages=page_count))) == page_count
+    assert len(page_numbers(stream_pages(path, max_pages=0))) == page_count
+
+
+def test_memory_ceiling_counts_growth_since_the_start(pdf, monkeypatch):
+    path, _ = pdf
+    # A baseline reading, then one after each page
+    readings = fake_rss(monkeypatch, [5000, 5010, 5120, 5500])
+    pages = stream_pages(path, max_memory_mb=100)
+
+    assert next(pages).page_number == 1
+    assert next(pages).page_number == 2
+    with pytest.raises(OversizedDocument, match="grew by 120 MB by page 2, over the ceiling of 100 MB"):
+        next(pages)
+    assert readings == [5500]
+
+
+def test_memory_ceiling_ignores_memory_held_before_the_document(pdf, monkeypatch):
+    path, page_count = pdf
+    # The process is already far over the ceiling, but this document adds little
+    fake_rss(monkeypatch, [3000] + [3000 + page for page in range(page_count)])
+    assert len(page_numbers(stream_pages(path, max_memory_mb=2048))) == page_count
+
+
+@pytest.mark.parametrize("max_memory_mb", [None, 0])
+def test_memory_ceiling_disabled(pdf, monkeypatch, max_memory_mb):
+    path, page_count = pdf
+
+    def fail():
+        raise AssertionError("memory was checked with the ceiling disabled")
+
+    monkeypatch.setattr(page_stream, "current_rss_mb", fail)
+    assert len(page_numbers(stream_pages(path, max_memory_mb=max_memory_mb))) == page_count
+
+
+def test_current_rss_mb():
+    assert 1 < current_rss_mb() < 1024 * 1024
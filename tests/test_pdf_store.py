@@ -0,0 +1,75 @@
+import os
+import shutil
+import threading
+
+import pytest
+
+import utils.pdf_store as pdf_store
+from utils.pdf_store import PdfStore, file_sha256
+
+CONTENT = b"%PDF-1.4\n% test document\n%%EOF\n"
+
+
+def download(tmp_path, name: str, content: bytes = CONTENT) -> str:
+    path = tmp_path / "downloads" / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_add_stores_content_once(tmp_path):
+    store = PdfStore(tmp_path / "store")
+
+    sha256, blob, is_new = store.add(download(tmp_path, "a.pdf"))
+    assert is_new and blob.read_bytes() == CONTENT
+    assert sha256 == file_sha256(blob)
+
+    again = download(tmp_path, "b.pdf")
+    assert store.add(again) == (sha256, blob, False)
+    assert not os.path.exists(again)
+
+
+def test_link(tmp_path):
+    store = PdfStore(tmp_path / "store")
+    sha256, blob, _ = store.add(download(tmp_path, "a.pdf"))
+
+    store.link(sha256, tmp_path / "77001_12345_01-02-2020_1.pdf")
+    assert (tmp_path / "77001_12345_01-02-2020_1.pdf").read_bytes() == CONTENT
+
+
+@pytest.mark.parametrize("workers", [2, 8])
+def test_concurrent_adds_of_the_same_content(tmp_path, monkeypatch, workers):
+    store = PdfStore(tmp_path / "store")
+    paths = [download(tmp_path, f"{i}.pdf") for i in range(workers)]
+
+    # Every worker moves its download into place before any of them finishes storing it
+    barrier = threading.Barrier(workers, timeout=10)
+    original_move = shutil.move
+
+    def move(src, dst):
+        result = original_move(src, dst)
+        barrier.wait()
+        return result
+
+    monkeypatch.setattr(pdf_store.shutil, "move", move)
+    results, errors = [], []
+
+    def add(path):
+        try:
+            results.append(store.add(path))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=add, args=(path,)) for path in paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    sha256, blob, _ = results[0]
+    assert {result[:2] for result in results} == {(sha256, blob)}
+    assert any(is_new for _, _, is_new in results)
+    assert blob.read_bytes() == CONTENT
+    assert os.listdir(blob.parent) == [blob.name]
+    assert not any(os.path.exists(path) for path in paths)
@@ -0,0 +1,104 @@
+import re
+
+import pytest
+
+from benchmarks.synthetic_maert import synthetic_rows, write_easy_maert
+from utils.pdf_validation import full_check, quick_check, validate_pdf
+
+HTML_ERROR_PAGE = (b"<!DOCTYPE html>\n<html><head><title>503 Service Unavailable</title></head>\n"
+                   b"<body><h1>Service Unavailable</h1><p>Please try again later.</p></body></html>\n")
+
+
+@pytest.fixture
+def valid_pdf(tmp_path):
+    path = tmp_path / "valid.pdf"
+    page_count = write_easy_maert(path, synthetic_rows(40))
+    return path, page_count
+
+
+def with_startxref(data: bytes, offset: int) -> bytes:
+    return re.sub(rb"startxref\s+\d+", b"startxref\n%d" % offset, data)
+
+
+def xref_stream_pdf(xref_type: bytes = b"/Type /XRef") -> bytes:
+    """A PDF 1.5 file whose startxref points at a cross-reference stream instead of a table."""
+    out = (b"%PDF-1.5\n"
+           b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n"
+           b"2 0 obj\n<< /Type /Pages /Kids [] /Count 0 >>\nendobj\n")
+    offset = len(out)
+    out += (b"3 0 obj\n<< " + xref_type + b" /Size 4 /W [1 2 1] /Root 1 0 R /DecodeParms << /Columns 4 >> "
+            b"/Length 0 >>\nstream\n\nendstream\nendobj\n")
+    return out + b"startxref\n%d\n%%%%EOF\n" % offset
+
+
+def test_valid_pdf(valid_pdf):
+    path, page_count = valid_pdf
+    assert quick_check(path) == (True, page_count, "quick", None)
+    assert validate_pdf(path) == (True, page_count, "quick", None)
+    assert full_check(path) == (True, page_count, "full", None)
+
+
+def test_xref_stream(tmp_path):
+    path = tmp_path / "stream.pdf"
+    path.write_bytes(xref_stream_pdf())
+    assert quick_check(path) == (True, 0, "quick", None)
+
+
+def test_object_that_is_not_an_xref_stream(tmp_path):
+    path = tmp_path / "not_xref.pdf"
+    path.write_bytes(xref_stream_pdf(xref_type=b"/Type /XObject"))
+    check = quick_check(path)
+    assert not check.valid and "does not point at an xref" in check.reason
+
+
+@pytest.mark.parametrize("target", [b"1 0 obj", b"2 0 obj", b"/Type /Catalog"])
+def test_startxref_pointing_at_another_object(valid_pdf, tmp_path, target):
+    data = valid_pdf[0].read_bytes()
+    path = tmp_path / "mis_offset.pdf"
+    path.write_bytes(with_startxref(data, data.index(target)))
+
+    check = quick_check(path)
+    assert check.valid is False and check.method == "quick"
+    assert "does not point at an xref" in check.reason
+
+
+def test_startxref_past_the_end(valid_pdf, tmp_path):
+    data = valid_pdf[0].read_bytes()
+    path = tmp_path / "past_end.pdf"
+    path.write_bytes(with_startxref(data, len(data) + 100))
+    assert not quick_check(path).valid
+
+
+def test_mis_offset_pdf_is_unreadable(valid_pdf, tmp_path):
+    # The full parse can't read the trailer either, so the quick check mustn't accept the file
+    data = valid_pdf[0].read_bytes()
+    path = tmp_path / "mis_offset.pdf"
+    path.write_bytes(with_startxref(data, data.index(b"1 0 obj")))
+    assert full_check(path).valid is False
+    assert validate_pdf(path).valid is False
+
+
+@pytest.mark.parametrize("fraction", [0.1, 0.5, 0.95])
+def test_truncated_pdf(valid_pdf, tmp_path, fraction):
+    data = valid_pdf[0].read_bytes()
+    path = tmp_path / "truncated.pdf"
+    path.write_bytes(data[:int(len(data) * fraction)])
+
+    assert quick_check(path) == (False, None, "quick", "no startxref / %%EOF trailer")
+    check = validate_pdf(path)
+    assert check.valid is False and check.method == "full"
+
+
+def test_html_error_page(tmp_path):
+    path = tmp_path / "error.pdf"
+    path.write_bytes(HTML_ERROR_PAGE)
+
+    assert quick_check(path) == (False, None, "quick", "no %PDF- header")
+    assert validate_pdf(path).valid is False
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.pdf"
+    path.write_bytes(b"")
+    assert quick_check(path) == (False, None, "quick", "empty file")
+    assert validate_pdf(path).valid is False
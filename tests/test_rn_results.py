@@ -0,0 +1,83 @@
+import os
+from io import StringIO
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from benchmarks.bench_rn_results import beautifulsoup_record, read_html_table, results_page, single_record_page
+from utils.rn_results import parse_results_table, parse_single_record
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return f.read()
+
+
+def baseline_results_table(html: str, columns: list[str]) -> pd.DataFrame:
+    """read_html_table, with converters keeping every cell a string as parse_results_table does."""
+    return pd.read_html(StringIO(html), converters={column: str for column in columns})[0]
+
+
+@pytest.mark.parametrize("name", ["rn_results.html", "rn_results_no_thead.html"])
+def test_results_table_matches_read_html(name):
+    html = fixture(name)
+    df = parse_results_table(html)
+    # read_html adds "Unnamed: n" columns for cells past the header; those cells are dropped
+    assert_frame_equal(df, baseline_results_table(html, list(df.columns))[df.columns])
+
+
+def test_results_table_matches_read_html_on_a_long_page():
+    html = results_page(200)
+    df = parse_results_table(html)
+    assert_frame_equal(df, baseline_results_table(html, list(df.columns)))
+    assert read_html_table(html).shape == df.shape
+
+
+def test_results_table_values():
+    df = parse_results_table(fixture("rn_results.html"))
+
+    assert list(df.columns) == ["RN Number", "Regulated Entity  Name", "Location", "County", "Zip Code", "Program Area"]
+    assert df["RN Number"].tolist() == [f"RN10000000{i}" for i in range(1, 8)]
+    # Whitespace runs are collapsed the way read_html does it: a line break and the
+    # indentation after it each become one space
+    assert df.iloc[0, 1] == "ACME REFINING CO"
+    assert df.iloc[1, 1] == "BAYOU CHEMICAL  PLANT & TERMINAL"
+    # Zip codes stay strings, and empty cells are missing values
+    assert df.loc[0, "Zip Code"] == "77001"
+    assert df[["Location", "Program Area"]].isna().sum().tolist() == [1, 1]
+
+
+def test_results_table_rows_are_fitted_to_the_header():
+    df = parse_results_table(fixture("rn_results_no_thead.html"))
+
+    assert df.shape == (3, 4)
+    assert pd.isna(df.loc[1, "Zip Code"])
+    assert df.loc[2].tolist() == ["RN200000003", "JUNCTION  COMPRESSOR STATION", "TRAVIS", "78701"]
+
+
+def test_results_table_without_a_table():
+    with pytest.raises(ValueError):
+        parse_results_table("<html><body><div class='error'>No results were found.</div></body></html>")
+
+
+def test_single_record_matches_beautifulsoup():
+    html = fixture("rn_single_record.html")
+    assert parse_single_record(html) == beautifulsoup_record(html)
+
+
+def test_single_record_matches_beautifulsoup_on_the_benchmark_page():
+    html = single_record_page()
+    assert parse_single_record(html) == beautifulsoup_record(html)
+
+
+def test_single_record_values():
+    data = parse_single_record(fixture("rn_single_record.html"))
+
+    assert data["RN Number"] == "RN100000009"
+    assert data["Regulated Entity Type"] == "Facility"
+    assert data["Street Address"] == "9 REFINERY RDPASADENA, TX 77503"
+    assert data["Longitude"] == "-95.1801"
+    assert len(data) == 10
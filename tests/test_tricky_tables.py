@@ -0,0 +1,440 @@
+import os
+import re
+import json
+import random
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from benchmarks.synthetic_maert import synthetic_rows, tricky_lines
+from scripts import extract_tables
+from utils.tricky_tables import (clean_up_tricky_table, extract_table_custom, extract_table_layout,
+                                 merge_wrapped_lines, parse_row)
+
+COLUMNS = ["Emission Source", "Source Name", "Air Contaminant Name", "Emission Rate lbs/hr", "Emission Rate tons/year"]
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+with open(os.path.join(FIXTURES_DIR, "tricky_lines.txt")) as f:
+    FIXTURE_LINES = f.read().split("\n")[:-1]
+
+# ========== BASELINE ==========
+# The line parser as it was before rows were collected as tuples: one single-row DataFrame
+# per line, concatenated at the end. Kept verbatim so the current parser can be checked against it.
+
+def baseline_parse_row(split_line: list[str], COLUMNS: list[str]) -> pd.DataFrame:
+    remove_white = [x for x in split_line if x != '']
+
+    if len(remove_white) == 1 and remove_white[0].isdigit():
+        emsource = np.nan
+        sourcename = np.nan
+        air_cont = remove_white[0]
+        lbs_hr = np.nan
+        tons_year = np.nan
+    elif len(remove_white) == 1:
+        emsource = np.nan
+        sourcename = remove_white[0] if len(remove_white[0]) > 1 else np.nan
+        air_cont = np.nan
+        lbs_hr = np.nan
+        tons_year = np.nan
+    elif len(remove_white) == 2 and split_line[0] == '':
+        emsource = np.nan
+        sourcename = np.nan
+        joint_entry = remove_white[0]
+        parts = joint_entry.split(" ")
+        air_cont = parts[2]
+        lbs_hr = parts[3]
+        tons_year = remove_white[1]
+    elif len(remove_white) == 2:
+        emsource, sourcename = remove_white
+        air_cont = lbs_hr = tons_year = np.nan
+    elif len(remove_white) == 3:
+        emsource = sourcename = np.nan
+        air_cont, lbs_hr, tons_year = remove_white
+    elif len(remove_white) == 4:
+        emsource = np.nan
+        sourcename, air_cont, lbs_hr, tons_year = remove_white
+    else:
+        emsource, sourcename, air_cont, lbs_hr, tons_year = remove_white[:5]
+
+    return pd.DataFrame([[emsource, sourcename, air_cont, lbs_hr, tons_year]], columns=COLUMNS)
+
+
+def baseline_extract_table_custom(lines: list[str], COLUMNS: list[str]) -> pd.DataFrame:
+    total_df = []
+    for l in lines:
+        split_line = re.split(r'\s{3,}', l)
+        try:
+            df = baseline_parse_row(split_line, COLUMNS)
+            total_df.append(df)
+        except Exception as e:
+            print(f"Parse error on line: {l}\nError: {e}")
+    return pd.concat(total_df, ignore_index=True)
+
+# ========== TESTS ==========
+
+def assert_same_as_baseline(lines: list[str], capsys):
+    """Same table (values and dtypes), same parse-error messages, or the same exception."""
+    try:
+        expected, expected_error = baseline_extract_table_custom(lines, COLUMNS), None
+    except ValueError as e:
+        expected, expected_error = None, str(e)
+    expected_output = capsys.readouterr().out
+
+    if expected_error is not None:
+        with pytest.raises(ValueError, match=expected_error):
+            extract_table_custom(lines, COLUMNS)
+    else:
+        assert_frame_equal(extract_table_custom(lines, COLUMNS), expected)
+    assert capsys.readouterr().out == expected_output
+
+
+def test_fixture_lines(capsys):
+    assert_same_as_baseline(FIXTURE_LINES, capsys)
+
+
+@pytest.mark.parametrize("line", FIXTURE_LINES)
+def test_each_fixture_line(line, capsys):
+    assert_same_as_baseline([line], capsys)
+
+
+def test_random_line_sets(capsys):
+    rng = random.Random(0)
+    for _ in range(300):
+        assert_same_as_baseline(rng.choices(FIXTURE_LINES, k=rng.randint(1, 12)), capsys)
+
+
+def test_synthetic_table(capsys):
+    assert_same_as_baseline(tricky_lines(synthetic_rows(50, seed=1)), capsys)
+
+
+def test_no_lines(capsys):
+    assert_same_as_baseline([], capsys)
+
+
+def test_parse_row_matches_baseline():
+    for line in FIXTURE_LINES:
+        split_line = re.split(r'\s{3,}', line)
+        try:
+            expected = baseline_parse_row(split_line, COLUMNS)
+        except Exception as e:
+            with pytest.raises(type(e)):
+                parse_row(split_line, COLUMNS)
+            continue
+        assert_frame_equal(parse_row(split_line, COLUMNS), expected)
+
+
+# ========== CLEANUP ==========
+
+def table(rows: list[list]) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def test_cleanup_fixture_table(capsys):
+    df_lines = extract_table_custom(FIXTURE_LINES, COLUMNS).dropna(axis=0, how='all').reset_index(drop=True)
+    expected = pd.read_csv(os.path.join(FIXTURES_DIR, "tricky_table_cleaned.csv"), dtype=str, index_col="line")
+    expected.index.name = None
+
+    assert_frame_equal(clean_up_tricky_table(df_lines), expected)
+    assert capsys.readouterr().out.splitlines()[-2:] == [
+        "Tricky cleanup: 30 → 28 rows after Air Contaminant merging.",
+        "Tricky cleanup: 28 → 25 rows after Source Name merging.",
+    ]
+
+
+def test_cleanup_groups_in_sorted_emission_source_order():
+    df = table([
+        [np.nan, "Header", "Air Contaminant Name", np.nan, np.nan],
+        ["TK-2", "Tank 2", "VOC", "0.93", "2.71"],
+        ["B-1", "Boiler", "NOx", "1.0", "4.0"],
+        [np.nan, np.nan, "CO", "0.5", "2.0"],
+    ])
+    cleaned = clean_up_tricky_table(df)
+
+    # Lines before the first Emission Source are dropped; the rest are grouped by the filled-in source
+    assert cleaned["Emission Source"].tolist() == ["B-1", "B-1", "TK-2"]
+    assert cleaned["Air Contaminant Name"].tolist() == ["NOx", "CO", "VOC"]
+    assert cleaned["Source Name"].tolist() == ["Boiler", "Boiler", "Tank 2"]
+    assert cleaned.index.tolist() == [0, 1, 2]
+
+
+def test_cleanup_marks_missing_rates_empty():
+    df = table([
+        ["B-1", "Boiler", "NOx", np.nan, "4.0"],
+        [np.nan, np.nan, "CO", "0.5", "empty"],
+    ])
+    cleaned = clean_up_tricky_table(df)
+
+    assert cleaned["Emission Rate lbs/hr"].tolist() == ["empty", "0.5"]
+    assert cleaned["Emission Rate tons/year"].tolist() == ["4.0", "empty"]
+
+
+def test_cleanup_merges_wrapped_air_contaminant_names():
+    df = table([
+        ["TK-2", "Tank 2", "VOC", "0.93", "2.71"],
+        [np.nan, np.nan, "Hydrogen", "0.01", "0.03"],
+        [np.nan, np.nan, "Sulfide", np.nan, np.nan],
+        [np.nan, np.nan, "Oxides", "empty", np.nan],
+    ])
+    cleaned = clean_up_tricky_table(df)
+
+    # Lines with no rates and no Source Name are joined onto the line above with "_"
+    assert cleaned["Air Contaminant Name"].tolist() == ["VOC", "Hydrogen_Sulfide_Oxides"]
+    assert cleaned["Emission Rate lbs/hr"].tolist() == ["0.93", "0.01"]
+
+
+def test_cleanup_merges_wrapped_source_names():
+    df = table([
+        ["B-1", "Boiler", np.nan, np.nan, np.nan],
+        [np.nan, "(Startup and", np.nan, np.nan, np.nan],
+        [np.nan, "Shutdown)", "NOx", "1.0", "4.0"],
+        [np.nan, np.nan, "CO", "0.5", "2.0"],
+    ])
+    cleaned = clean_up_tricky_table(df)
+
+    # The rate-less lines become one row holding the joined Source Name; the next line is kept
+    # as it was, and Source Name is filled down from there
+    assert cleaned["Source Name"].tolist() == ["Boiler (Startup and", "Shutdown)", "Shutdown)"]
+    assert cleaned["Air Contaminant Name"].isna().tolist() == [True, False, False]
+    assert cleaned.index.tolist() == [0, 2, 3]
+
+
+def test_cleanup_drops_trailing_rows_without_rates():
+    df = table([
+        ["B-1", "Boiler", "NOx", "1.0", "4.0"],
+        [np.nan, "Notes", np.nan, np.nan, np.nan],
+    ])
+    cleaned = clean_up_tricky_table(df)
+    assert cleaned["Source Name"].tolist() == ["Boiler"]
+
+
+@pytest.mark.parametrize("rows", [
+    [[np.nan, "Header", "Air Contaminant Name", np.nan, np.nan]],
+    [["B-1", "Boiler", np.nan, np.nan, np.nan], [np.nan, "Notes", np.nan, np.nan, np.nan]],
+])
+def test_cleanup_raises_when_no_rows_remain(rows):
+    with pytest.raises(ValueError, match="No rows left"):
+        clean_up_tricky_table(table(rows))
+
+
+# ========== LAYOUT ==========
+# Hand-built pages are word lists in a monospaced 5pt-wide font, one line every 10pt
+
+CHAR_WIDTH, LINE_PITCH = 5.0, 10.0
+COLUMN_X = [40, 110, 250, 400, 480]
+HEADER = {40: "Emission Point No. (1)", 110: "Source Name (2)", 250: "Air Contaminant Name (3)",
+          400: "lbs/hour", 480: "TPY"}
+FOOTNOTE = {40: "(1) Emission point identification - either specific equipment designation"}
+NAN = np.nan
+
+with open(os.path.join(FIXTURES_DIR, "tricky_page_words.json")) as f:
+    FIXTURE_PAGES = json.load(f)
+
+
+def row(*texts) -> dict:
+    """A table line: the text in each column, '' where it is blank."""
+    return {x: text for x, text in zip(COLUMN_X, texts) if text}
+
+
+def words(lines: list[dict | None]) -> list[dict]:
+    """page.extract_words()-style words of lines of {x: text}; None leaves an empty line."""
+    page = []
+    for i, line in enumerate(lines):
+        for x, text in (line or {}).items():
+            for match in re.finditer(r"\S+", text):
+                x0 = x + match.start() * CHAR_WIDTH
+                page.append({"text": match.group(), "x0": x0, "x1": x0 + len(match.group()) * CHAR_WIDTH,
+                             "top": 100 + i * LINE_PITCH, "bottom": 108 + i * LINE_PITCH})
+    return page
+
+
+def layout_table(rows: list[list]) -> pd.DataFrame:
+    """Lines as extract_table_layout returns them: every column object, NaN where blank."""
+    return table(rows).astype(object)
+
+
+def merged(pages: list[list[dict]]) -> pd.DataFrame:
+    """All pages through extract_table_layout and merge_wrapped_lines, as extract_pdf does."""
+    df_lines = pd.concat([extract_table_layout(page, COLUMNS)[0] for page in pages])
+    return merge_wrapped_lines(df_lines.dropna(axis=0, how='all').reset_index(drop=True))
+
+
+def test_layout_fixture_pages():
+    assert [extract_table_layout(page, COLUMNS)[1] for page in FIXTURE_PAGES] == [False, True]
+    assert_frame_equal(merged(FIXTURE_PAGES), table([
+        ["BLR-1", "Auxiliary Boiler (218 MMBtu/hr)", "NOx", "2.45", "10.73"],
+        ["BLR-1", "Auxiliary Boiler (218 MMBtu/hr)", "CO", "6.51", "28.51"],
+        ["BLR-1", "Auxiliary Boiler (218 MMBtu/hr)", "PM10/PM2.5", "0.89", "3.90"],
+        ["BLR-1", "Auxiliary Boiler (218 MMBtu/hr)", "SO2", "0.11", "0.48"],
+        ["BLR-1", "Auxiliary Boiler (218 MMBtu/hr)", "VOC", "0.64", "2.81"],
+        ["FL-1", "Process Flare", "NOx", "14.21", "2.35"],
+        ["FL-1", "Process Flare", "CO", "28.38", "4.69"],
+        ["FL-1", "Process Flare", "H2S", "0.03", "<0.01"],
+        ["TK-101", "Gasoline Storage Tank (5)", "VOC", "11.62", "4.07"],
+        ["TK-101", "Gasoline Storage Tank (5)", "Benzene", "0.09", "0.03"],
+        ["FUG-1", "Process Fugitives (5)", "VOC", "3.41", "14.93"],
+        ["FUG-1", "Process Fugitives (5)", "Hexane", "0.18", "0.79"],
+        ["FUG-1", "Process Fugitives (5)", "Total Reduced Sulfur", "0.02", "0.09"],
+        ["FUG-1", "Process Fugitives (5)", "NH3", "0.05", "0.22"],
+        ["CT-1", "Cooling Tower", "PM", "0.44", "1.93"],
+        ["CT-1", "Cooling Tower", "PM10", "0.29", "1.27"],
+        ["CT-1", "Cooling Tower", "PM2.5", "<0.01", "0.01"],
+        ["GEN-1", "Emergency Diesel Generator", "NOx", "19.84", "0.99 (6)"],
+        ["GEN-1", "Emergency Diesel Generator", "CO", "10.69", "0.53 (6)"],
+    ]))
+
+
+def test_layout_lines_between_header_and_footnote():
+    page = words([
+        {220: "Emission Sources - Maximum Allowable Emission Rates"},
+        HEADER,
+        {40: "-" * 100},
+        row("B-1", "Boiler", "NOx", "1.00", "4.00"),
+        row("", "Unit 1", "CO", "0.50", "<0.01"),
+        row("", "", "Particulate", "", ""),
+        FOOTNOTE,
+        row("B-2", "Not in the table", "CO", "9.00", "9.00"),
+    ])
+    df_lines, end_of_table = extract_table_layout(page, COLUMNS)
+
+    assert end_of_table
+    assert_frame_equal(df_lines, layout_table([
+        ["B-1", "Boiler", "NOx", "1.00", "4.00"],
+        [NAN, "Unit 1", "CO", "0.50", "<0.01"],
+        [NAN, NAN, "Particulate", NAN, NAN],
+    ]))
+
+
+def test_layout_page_without_header_starts_at_the_top():
+    page = words([row("B-1", "Boiler", "NOx", "1.00", "4.00"), row("", "", "CO", "0.50", "2.00")])
+    df_lines, end_of_table = extract_table_layout(page, COLUMNS)
+
+    assert not end_of_table
+    assert df_lines["Emission Source"].tolist()[0] == "B-1"
+    assert df_lines["Air Contaminant Name"].tolist() == ["NOx", "CO"]
+
+
+def test_layout_fewer_column_segments_are_the_rightmost_columns():
+    # A page continuing the previous page's source has no Emission Source or Source Name text
+    page = words([row("", "", "NOx", "1.00", "4.00"), row("", "", "CO", "0.50", "2.00")])
+    df_lines, _ = extract_table_layout(page, COLUMNS)
+
+    assert_frame_equal(df_lines, layout_table([[NAN, NAN, "NOx", "1.00", "4.00"], [NAN, NAN, "CO", "0.50", "2.00"]]))
+
+
+def test_layout_drops_blocks_without_rates():
+    # The footer sits well below the table; its page number falls under the tons/year column
+    # and "Project Number" would bridge the first two columns if it were kept
+    page = words([
+        HEADER,
+        row("B-1", "Boiler", "NOx", "1.00", "4.00"),
+        row("", "", "CO", "0.50", "2.00"),
+        row("", "", "VOC", "0.10", "0.40"),
+        row("B-2", "Heater", "NOx", "2.00", "8.00"),
+        None, None, None,
+        {40: "Project Number: 331907", 480: "Page 1 of 2"},
+    ])
+    df_lines, end_of_table = extract_table_layout(page, COLUMNS)
+
+    assert not end_of_table
+    assert_frame_equal(df_lines, layout_table([
+        ["B-1", "Boiler", "NOx", "1.00", "4.00"],
+        [NAN, NAN, "CO", "0.50", "2.00"],
+        [NAN, NAN, "VOC", "0.10", "0.40"],
+        ["B-2", "Heater", "NOx", "2.00", "8.00"],
+    ]))
+
+
+def test_layout_page_with_only_blocks_without_rates():
+    page = words([HEADER, row("B-1", "Boiler", "Stack", "", ""), row("", "", "Vent", "", ""),
+                  None, None, None, row("", "Notes", "See permit", "", "")])
+    df_lines, _ = extract_table_layout(page, COLUMNS)
+    assert df_lines.empty and list(df_lines.columns) == COLUMNS
+
+
+def test_layout_nothing_between_header_and_footnote():
+    df_lines, end_of_table = extract_table_layout(words([HEADER, {40: "-" * 100}, FOOTNOTE]), COLUMNS)
+    assert end_of_table
+    assert df_lines.empty and list(df_lines.columns) == COLUMNS
+
+
+@pytest.mark.parametrize("page", [
+    [],
+    # Running text: single spaces between words, so there is no column gap at all
+    words([{40: "This table lists the maximum allowable emission rates and all sources"},
+           {40: "of air contaminants on the property covered by this permit."}]),
+])
+def test_layout_without_columns_is_none(page):
+    assert extract_table_layout(page, COLUMNS) == (None, False)
+
+
+def test_merge_source_line_without_rates_takes_the_next_lines_rates():
+    df_lines = table([
+        ["FL-1", "Process Flare", NAN, NAN, NAN],
+        [NAN, NAN, "NOx", "14.21", "2.35"],
+        [NAN, NAN, "CO", "28.38", "4.69"],
+    ])
+    assert_frame_equal(merge_wrapped_lines(df_lines), table([
+        ["FL-1", "Process Flare", "NOx", "14.21", "2.35"],
+        ["FL-1", "Process Flare", "CO", "28.38", "4.69"],
+    ]))
+
+
+def test_merge_joins_source_name_pieces_across_contaminant_rows():
+    df_lines = table([
+        ["GEN-1", "Emergency", "NOx", "19.84", "0.99"],
+        [NAN, "Diesel", "CO", "10.69", "0.53"],
+        [NAN, "Generator", "VOC", "0.20", "0.01"],
+        ["CT-1", "Cooling Tower", "PM", "0.44", "1.93"],
+    ])
+    assert merge_wrapped_lines(df_lines)["Source Name"].tolist() == [
+        "Emergency Diesel Generator", "Emergency Diesel Generator", "Emergency Diesel Generator", "Cooling Tower"]
+
+
+def test_merge_appends_wrapped_cells_to_their_row():
+    df_lines = table([
+        ["FUG-1", "Process", "Total Reduced", "0.02", "0.09"],
+        [NAN, "Fugitives", "Sulfur", NAN, NAN],
+        [NAN, NAN, "NH3", "0.05", "0.22"],
+    ])
+    assert_frame_equal(merge_wrapped_lines(df_lines), table([
+        ["FUG-1", "Process Fugitives", "Total Reduced Sulfur", "0.02", "0.09"],
+        ["FUG-1", "Process Fugitives", "NH3", "0.05", "0.22"],
+    ]))
+
+
+def test_merge_drops_rows_without_rates_and_before_the_first_source():
+    df_lines = table([
+        [NAN, NAN, "NOx", "1.00", "4.00"],
+        ["B-1", "Boiler", "CO", "0.50", "2.00"],
+        ["B-2", "Standby Boiler", NAN, NAN, NAN],
+    ])
+    assert_frame_equal(merge_wrapped_lines(df_lines), table([["B-1", "Boiler", "CO", "0.50", "2.00"]]))
+
+
+@pytest.mark.parametrize("rows", [
+    [["B-1", "Boiler", NAN, NAN, NAN], [NAN, "Notes", NAN, NAN, NAN]],
+    [[NAN, NAN, "NOx", "1.00", "4.00"]],
+])
+def test_merge_raises_when_no_rows_remain(rows):
+    with pytest.raises(ValueError, match="No rows left"):
+        merge_wrapped_lines(table(rows))
+
+
+def test_extract_pdf_splits_text_when_there_is_no_column_layout(monkeypatch, capsys):
+    lines = FIXTURE_LINES[:12]
+    text = "\n".join(["Emission Point No. (1)   Source Name (2)   lbs/hour   TPY", "-" * 60, *lines, "   "])
+    page = SimpleNamespace(page_number=1, table=None, text=text, text_simple=text,
+                           words=words([{40: "Scanned page with running text only"}]))
+    monkeypatch.setattr(extract_tables, "stream_pages", lambda *args: (analysis for analysis in [page]))
+
+    df, note = extract_tables.extract_pdf(Path("77001_12345_01-01-2020_1.pdf"), locate_pages=False)
+    expected = clean_up_tricky_table(extract_table_custom(lines, COLUMNS).dropna(axis=0, how='all')
+                                     .reset_index(drop=True))
+    expected = expected[expected["Emission Source"] != "Emission"].reset_index(drop=True)
+
+    assert note == "tricky"
+    assert_frame_equal(df[COLUMNS].astype(object).reset_index(drop=True), expected.astype(object))
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+
+import pytest
+
+from utils.waits import POLL_INTERVAL, clear_downloads, completed_downloads, wait_for_download
+
+
+def write_later(delay: float, action):
+    """Runs action in a background thread after delay seconds; returns the thread to join."""
+    thread = threading.Thread(target=lambda: (time.sleep(delay), action()))
+    thread.start()
+    return thread
+
+
+def test_completed_downloads_skips_partial_files_and_directories(tmp_path):
+    for name in ("a.pdf", "b.pdf.crdownload", "c.part", "d.tmp", "e"):
+        (tmp_path / name).write_bytes(b"x")
+    (tmp_path / "sub").mkdir()
+    assert sorted(os.path.basename(path) for path in completed_downloads(str(tmp_path))) == ["a.pdf", "e"]
+
+
+def test_wait_for_download_times_out_on_an_empty_directory(tmp_path):
+    assert wait_for_download(str(tmp_path), timeout=0.3) is None
+
+
+@pytest.mark.parametrize("suffix", [".crdownload", ".part", ".tmp"])
+def test_wait_for_download_times_out_while_a_partial_file_is_left(tmp_path, suffix):
+    # A finished file doesn't count while another download is still in progress
+    (tmp_path / "done.pdf").write_bytes(b"%PDF-1.4")
+    (tmp_path / f"next.pdf{suffix}").write_bytes(b"%PDF")
+    assert wait_for_download(str(tmp_path), timeout=0.5) is None
+
+
+def test_wait_for_download_waits_for_the_partial_file_to_be_renamed(tmp_path):
+    partial = tmp_path / "maert.pdf.crdownload"
+    partial.write_bytes(b"%PDF-1.4 ...")
+    start = time.monotonic()
+    thread = write_later(0.4, lambda: os.replace(partial, tmp_path / "maert.pdf"))
+    try:
+        assert wait_for_download(str(tmp_path), timeout=5) == str(tmp_path / "maert.pdf")
+    finally:
+        thread.join()
+    assert time.monotonic() - start >= 0.4
+
+
+def test_wait_for_download_waits_for_the_size_to_settle(tmp_path):
+    path = tmp_path / "maert.pdf"
+    path.write_bytes(b"%PDF")
+    chunks, chunk = 12, b"x" * 1000
+
+    def grow():
+        # Appends faster than the wait polls, so the size changes between every two checks
+        with open(path, "ab") as f:
+            for _ in range(chunks):
+                time.sleep(POLL_INTERVAL / 3)
+                f.write(chunk)
+                f.flush()
+
+    thread = threading.Thread(target=grow)
+    thread.start()
+    try:
+        assert wait_for_download(str(tmp_path), timeout=5) == str(path)
+        assert os.path.getsize(path) == 4 + chunks * len(chunk)
+    finally:
+        thread.join()
+
+
+def test_wait_for_download_returns_the_newest_file(tmp_path):
+    (tmp_path / "old.pdf").write_bytes(b"old")
+    time.sleep(0.05)
+    (tmp_path / "new.pdf").write_bytes(b"new")
+    assert wait_for_download(str(tmp_path), timeout=5) == str(tmp_path / "new.pdf")
+
+
+def test_clear_downloads_leaves_nothing_for_the_next_wait(tmp_path):
+    for name in ("rejected.pdf", "late.pdf.crdownload"):
+        (tmp_path / name).write_bytes(b"x")
+    (tmp_path / "sub").mkdir()
+
+    assert sorted(clear_downloads(str(tmp_path))) == ["late.pdf.crdownload", "rejected.pdf"]
+    assert os.listdir(tmp_path) == ["sub"]
+    assert wait_for_download(str(tmp_path), timeout=0.3) is None
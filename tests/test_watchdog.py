@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from utils.watchdog import PENDING, DocumentTimeout, WatchdogPool, time_limits
+
+
+def double(item):
+    if item == "hang":
+        time.sleep(60)
+    return item * 2
+
+
+def lost(item, reason, timed_out):
+    return ("lost", item, timed_out)
+
+
+def slow_source(first, second, gap: float, produced: dict):
+    """Yields first, then PENDING for gap seconds (like an idle download queue), then second."""
+    yield first
+    deadline = time.monotonic() + gap
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        yield PENDING
+    produced["second"] = time.monotonic()
+    yield second
+
+
+def test_results_in_input_order():
+    pool = WatchdogPool(3)
+    assert list(pool.imap(double, range(20), lost)) == [i * 2 for i in range(20)]
+
+
+def test_result_is_passed_on_while_the_source_is_waiting():
+    produced = {}
+    results = WatchdogPool(2).imap(double, slow_source(1, 2, 2, produced), lost)
+    assert next(results) == 2
+    assert "second" not in produced
+    assert list(results) == [4]
+
+
+def test_stuck_worker_is_killed_while_the_source_is_waiting():
+    produced = {}
+    results = WatchdogPool(2, hard_timeout=0.5).imap(double, slow_source("hang", 3, 3, produced), lost)
+    assert next(results) == ("lost", "hang", True)
+    assert "second" not in produced
+    assert list(results) == [6]
+
+
+def test_time_limits_wall_clock():
+    with pytest.raises(DocumentTimeout, match="wall-clock"):
+        with time_limits(wall_seconds=0.2):
+            time.sleep(5)
+
+
+def test_time_limits_cpu():
+    with pytest.raises(DocumentTimeout, match="CPU"):
+        with time_limits(cpu_seconds=0.2):
+            while True:
+                pass
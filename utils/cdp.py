@@ -0,0 +1,317 @@
+import os
+import json
+import math
+import time
+import shutil
+import logging
+import tempfile
+import itertools
+import subprocess
+from contextlib import contextmanager, asynccontextmanager
+
+import trio
+from trio_websocket import open_websocket_url, ConnectionClosed
+
+from utils.waits import POLL_INTERVAL, wait_metrics
+from utils.instrumentation import metrics
+
+CHROME_CANDIDATES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+# Same download handling as the Selenium driver's prefs: PDFs are saved, not shown in the viewer
+PREFERENCES = {"plugins": {"always_open_pdf_externally": True}, "download": {"prompt_for_download": False}}
+# Whole results pages come back as one message
+MAX_MESSAGE_SIZE = 256 * 1024 * 1024
+
+
+class CdpError(Exception):
+    """An error response to a DevTools command, or JavaScript that threw in the page."""
+
+
+def find_chrome() -> str:
+    path = os.getenv("CHROME_PATH") or next(filter(None, map(shutil.which, CHROME_CANDIDATES)), None)
+    if path is None:
+        raise FileNotFoundError("Chrome not found; set CHROME_PATH to its executable")
+    return path
+
+
+def xpath_literal(text: str) -> str:
+    """text as an XPath 1.0 string literal (which has no escapes, so mixed quotes need concat())."""
+    if "'" not in text:
+        return f"'{text}'"
+    if '"' not in text:
+        return f'"{text}"'
+    return "concat(" + ", \"'\", ".join(f"'{part}'" for part in text.split("'")) + ")"
+
+
+def link_text_xpath(text: str) -> str:
+    """XPath equivalent of Selenium's By.LINK_TEXT."""
+    return f"//a[normalize-space(.)={xpath_literal(text.strip())}]"
+
+
+def node_js(xpath: str) -> str:
+    """JavaScript expression for the first node matching xpath, or null."""
+    return f"document.evaluate({json.dumps(xpath)}, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue"
+
+
+class Tab:
+    """
+    A page in its own browser context (separate cookies and download directory), with the
+    handful of interactions the scrapers need. Elements are located by XPath and driven with
+    JavaScript, so no call waits on anything but the page itself.
+    """
+
+    def __init__(self, browser: "Browser", target_id: str, session_id: str, context_id: str):
+        self.browser = browser
+        self.target_id = target_id
+        self.session_id = session_id
+        self.context_id = context_id
+
+    async def send(self, method: str, **params) -> dict:
+        return await self.browser.send(method, params, self.session_id)
+
+    async def goto(self, url: str, timeout: float = 30):
+        with self.browser.listen("Page.loadEventFired", self.session_id) as loads:
+            result = await self.send("Page.navigate", url=url)
+            if result.get("errorText"):
+                raise CdpError(f"Navigation to {url} failed: {result['errorText']}")
+            with trio.fail_after(timeout):
+                await loads.receive()
+
+    async def evaluate(self, expression: str):
+        result = await self.send("Runtime.evaluate", expression=expression, returnByValue=True, awaitPromise=True)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise CdpError(details.get("exception", {}).get("description") or details.get("text"))
+        return result["result"].get("value")
+
+    async def wait_for(self, expression: str, timeout: float, label: str | None = None, previous=0):
+        """
+        Polls expression every POLL_INTERVAL seconds until it is truthy and returns its value;
+        raises TimeoutError after timeout seconds. Errors while the page is between documents
+        count as not yet. With a label, the wait is recorded like utils.waits.wait_until.
+        """
+        start = time.monotonic()
+        try:
+            with trio.fail_after(timeout):
+                while True:
+                    try:
+                        value = await self.evaluate(expression)
+                    except CdpError:
+                        value = None
+                    if value:
+                        return value
+                    await trio.sleep(POLL_INTERVAL)
+        except trio.TooSlowError:
+            raise TimeoutError(f"Timed out after {timeout}s waiting for {label or expression}") from None
+        finally:
+            if label:
+                waited = time.monotonic() - start
+                wait_metrics.record(label, waited, previous(waited) if callable(previous) else previous)
+
+    async def wait_for_xpath(self, *xpaths: str, timeout: float, label: str | None = None, previous=0):
+        """Waits for any of xpaths to match."""
+        await self.wait_for(" || ".join(f"!!{node_js(xpath)}" for xpath in xpaths), timeout, label, previous)
+
+    @asynccontextmanager
+    async def expect_new(self, xpath: str, timeout: float, label: str | None = None, previous=0):
+        """
+        Waits, after the block, for the element at xpath to be replaced (by a new page or a
+        script), like Selenium's staleness_of followed by a presence check.
+        """
+        await self.evaluate(f"(() => {{ const el = {node_js(xpath)}; if (el) el.dataset.cdpStale = '1'; }})()")
+        yield
+        await self.wait_for(f"(() => {{ const el = {node_js(xpath)}; return !!el && !el.dataset.cdpStale; }})()",
+                            timeout, label, previous)
+
+    async def exists(self, xpath: str) -> bool:
+        return await self.evaluate(f"!!{node_js(xpath)}")
+
+    async def text(self, xpath: str) -> str | None:
+        return await self.evaluate(f"{node_js(xpath)}?.textContent ?? null")
+
+    async def html(self, xpath: str | None = None) -> str:
+        """The element's outerHTML, or the whole document's."""
+        html = await self.evaluate(f"{node_js(xpath)}?.outerHTML ?? null" if xpath else "document.documentElement.outerHTML")
+        if html is None:
+            raise CdpError(f"No element at {xpath}")
+        return html
+
+    async def _on_element(self, xpath: str, body: str, *args):
+        """Runs body, a function of (el, ...args), on the element at xpath; raises CdpError if there is none."""
+        found = await self.evaluate(
+            f"(() => {{ const el = {node_js(xpath)}; if (!el) return false; "
+            f"({body})(el, ...{json.dumps(args)}); return true; }})()")
+        if not found:
+            raise CdpError(f"No element at {xpath}")
+
+    async def click(self, xpath: str):
+        await self._on_element(xpath, "el => el.click()")
+
+    async def type(self, xpath: str, text: str):
+        await self._on_element(xpath, "(el, text) => { el.focus(); el.value = text; "
+                                      "el.dispatchEvent(new Event('input', {bubbles: true})); "
+                                      "el.dispatchEvent(new Event('change', {bubbles: true})); }", text)
+
+    async def select(self, xpath: str, value: str | None = None, index: int | None = None):
+        """Selects an option by value or index and fires the change event, as a user would."""
+        found = await self.evaluate(
+            f"(() => {{ const el = {node_js(xpath)}; if (!el) return false; "
+            f"const i = {json.dumps(index)} ?? [...el.options].findIndex(o => o.value === {json.dumps(value)}); "
+            f"if (i < 0 || i >= el.options.length) return false; el.selectedIndex = i; "
+            f"el.dispatchEvent(new Event('change', {{bubbles: true}})); return true; }})()")
+        if not found:
+            raise CdpError(f"No option {value if index is None else index} in {xpath}")
+
+    async def option_count(self, xpath: str) -> int | None:
+        return await self.evaluate(f"{node_js(xpath)}?.options.length ?? null")
+
+    async def headers(self) -> dict[str, str]:
+        """Headers that let a plain HTTP client reuse this tab's session, like browser_headers() for Selenium."""
+        cookies = (await self.send("Network.getCookies"))["cookies"]
+        return {
+            "Cookie": "; ".join(f"{c['name']}={c['value']}" for c in cookies),
+            "User-Agent": await self.evaluate("navigator.userAgent"),
+            "Referer": await self.evaluate("location.href"),
+        }
+
+    async def close(self):
+        try:
+            await self.browser.send("Target.closeTarget", {"targetId": self.target_id})
+            await self.browser.send("Target.disposeBrowserContext", {"browserContextId": self.context_id})
+        except (CdpError, ConnectionClosed) as e:
+            logging.debug(f"Error closing tab: {e}")
+
+
+class Browser:
+    """
+    One Chrome process driven over a single DevTools websocket. Every tab is a flattened
+    session on that connection, so any number of tabs can be driven concurrently from one
+    trio task each: commands are matched to responses by id, and events are routed to the
+    listeners registered for their session.
+    """
+
+    def __init__(self, ws):
+        self._ws = ws
+        self._ids = itertools.count(1)
+        self._calls = {}
+        self._listeners = []
+        self._closed = None
+
+    async def _read_messages(self):
+        try:
+            while True:
+                message = json.loads(await self._ws.get_message())
+                if "id" in message:
+                    call = self._calls.pop(message["id"], None)
+                    if call is not None:
+                        call[1] = message
+                        call[0].set()
+                    continue
+                for method, session_id, channel in list(self._listeners):
+                    if method == message.get("method") and session_id == message.get("sessionId"):
+                        channel.send_nowait(message.get("params", {}))
+        except ConnectionClosed as e:
+            self._closed = f"DevTools connection closed ({e.reason})"
+            for event, _ in self._calls.values():
+                event.set()
+
+    async def send(self, method: str, params: dict | None = None, session_id: str | None = None) -> dict:
+        if self._closed:
+            raise CdpError(self._closed)
+        call_id = next(self._ids)
+        call = self._calls[call_id] = [trio.Event(), None]
+        message = {"id": call_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        await self._ws.send_message(json.dumps(message))
+        await call[0].wait()
+
+        response = call[1]
+        if response is None:
+            raise CdpError(f"{method}: {self._closed}")
+        if "error" in response:
+            raise CdpError(f"{method}: {response['error'].get('message')}")
+        return response.get("result", {})
+
+    @contextmanager
+    def listen(self, method: str, session_id: str | None = None):
+        """Collects method events (for session_id, or the browser itself) while the block runs."""
+        send_channel, receive_channel = trio.open_memory_channel(math.inf)
+        listener = (method, session_id, send_channel)
+        self._listeners.append(listener)
+        try:
+            yield receive_channel
+        finally:
+            self._listeners.remove(listener)
+
+    async def new_tab(self, download_dir: str | None = None) -> Tab:
+        """Opens a blank tab in a fresh browser context, saving its downloads to download_dir."""
+        context_id = (await self.send("Target.createBrowserContext", {"disposeOnDetach": True}))["browserContextId"]
+        target_id = (await self.send("Target.createTarget",
+                                     {"url": "about:blank", "browserContextId": context_id}))["targetId"]
+        session_id = (await self.send("Target.attachToTarget", {"targetId": target_id, "flatten": True}))["sessionId"]
+        tab = Tab(self, target_id, session_id, context_id)
+        await tab.send("Page.enable")
+        if download_dir:
+            await self.send("Browser.setDownloadBehavior",
+                            {"behavior": "allow", "downloadPath": download_dir, "browserContextId": context_id})
+        return tab
+
+
+async def _devtools_url(profile_dir: str, process, timeout: float) -> str:
+    # Chrome writes the port it picked, and the browser endpoint's path, once it is listening
+    port_file = os.path.join(profile_dir, "DevToolsActivePort")
+    with trio.fail_after(timeout):
+        while True:
+            if process.poll() is not None:
+                raise CdpError(f"Chrome exited with code {process.returncode} during startup")
+            try:
+                with open(port_file) as f:
+                    port, path = f.read().split()[:2]
+                return f"ws://127.0.0.1:{port}{path}"
+            except (FileNotFoundError, ValueError):
+                await trio.sleep(0.05)
+
+
+@asynccontextmanager
+async def launch_browser(headless: bool = True, timeout: float = 30):
+    """
+    Starts Chrome with remote debugging on a free port, in a throwaway profile, and yields a
+    connected Browser. Chrome is closed (and killed if need be) when the block exits.
+    """
+    with tempfile.TemporaryDirectory(prefix="cdp_chrome_") as profile_dir:
+        os.makedirs(os.path.join(profile_dir, "Default"))
+        with open(os.path.join(profile_dir, "Default", "Preferences"), 'w') as f:
+            json.dump(PREFERENCES, f)
+
+        args = [find_chrome(), "--remote-debugging-port=0", f"--user-data-dir={profile_dir}", "--no-first-run",
+                "--no-default-browser-check", "--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu", "about:blank"]
+        if headless:
+            args.insert(1, "--headless=new")
+
+        with metrics.span("cdp.launch_browser"):
+            process = await trio.lowlevel.open_process(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            with metrics.span("cdp.connect"):
+                url = await _devtools_url(profile_dir, process, timeout)
+            async with open_websocket_url(url, max_message_size=MAX_MESSAGE_SIZE) as ws:
+                async with trio.open_nursery() as nursery:
+                    browser = Browser(ws)
+                    nursery.start_soon(browser._read_messages)
+                    try:
+                        yield browser
+                    finally:
+                        with trio.move_on_after(5) as cleanup:
+                            cleanup.shield = True
+                            try:
+                                await browser.send("Browser.close")
+                            except (CdpError, ConnectionClosed):
+                                pass
+                        nursery.cancel_scope.cancel()
+        finally:
+            with trio.move_on_after(5) as cleanup:
+                cleanup.shield = True
+                await process.wait()
+            if process.returncode is None:
+                process.kill()
+                with trio.CancelScope(shield=True):
+                    await process.wait()
@@ -0,0 +1,176 @@
+import os
+import time
+import logging
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Extracted column -> combined dataset column
+SOURCE_COLUMNS = {
+    "Emission Source": "emission_source",
+    "Source Name": "source_name",
+    "Air Contaminant Name": "air_contaminant_name",
+    "Emission Rate lbs/hr": "emission_rate_lbs_hr_raw",
+    "Emission Rate tons/year": "emission_rate_tons_year_raw",
+    "emission_rate_lbs_hr": "emission_rate_lbs_hr",
+    "emission_rate_lbs_hr_qualifier": "emission_rate_lbs_hr_qualifier",
+    "emission_rate_lbs_hr_footnote": "emission_rate_lbs_hr_footnote",
+    "emission_rate_tons_year": "emission_rate_tons_year",
+    "emission_rate_tons_year_qualifier": "emission_rate_tons_year_qualifier",
+    "emission_rate_tons_year_footnote": "emission_rate_tons_year_footnote",
+    "filename": "filename",
+    "zipcode": "zipcode",
+    "permit_number": "permit_number",
+    "publish_date": "publish_date",
+}
+
+# Rows arrive typed by utils.normalization.normalize_rows; categorical columns are stored
+# dictionary-encoded and read back as pandas categoricals
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema([
+    ("emission_source", pa.string()),
+    ("source_name", pa.string()),
+    ("air_contaminant_name", CATEGORY),
+    ("emission_rate_lbs_hr_raw", pa.string()),
+    ("emission_rate_tons_year_raw", pa.string()),
+    ("emission_rate_lbs_hr", pa.float64()),
+    ("emission_rate_lbs_hr_qualifier", CATEGORY),
+    ("emission_rate_lbs_hr_footnote", pa.string()),
+    ("emission_rate_tons_year", pa.float64()),
+    ("emission_rate_tons_year_qualifier", CATEGORY),
+    ("emission_rate_tons_year_footnote", pa.string()),
+    ("filename", pa.string()),
+    ("zipcode", pa.string()),
+    ("permit_number", pa.string()),
+    ("publish_date", pa.timestamp("ms")),
+])
+
+
+def to_combined_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Converts one document's normalized rows into a table with the combined dataset schema.
+    Missing source columns come through as nulls.
+    """
+    columns = {}
+    for source, target in SOURCE_COLUMNS.items():
+        if source in df.columns:
+            values = df[source]
+        else:
+            values = pd.Series(None, index=df.index, dtype=object)
+        if SCHEMA.field(target).type == pa.string():
+            values = values.astype("string")
+        columns[target] = values
+    combined = pd.DataFrame(columns)[SCHEMA.names]
+    return pa.Table.from_pandas(combined, schema=SCHEMA, preserve_index=False)
+
+
+class CombinedDatasetWriter:
+    """
+    Streams extracted rows into a Parquet dataset (a directory of part files sharing SCHEMA).
+
+    Each run appends to its own part file, buffering at most max_buffered_rows rows before
+    writing them out as a row group, so memory stays bounded however large the corpus is.
+    Part files are only renamed to *.parquet once closed, so a crashed run never leaves a
+    truncated file behind. The whole dataset reads back as one table with
+    pd.read_parquet(dataset_dir).
+    """
+
+    def __init__(self, dataset_dir: str, max_buffered_rows: int = 50_000):
+        self.dataset_dir = Path(dataset_dir)
+        self.max_buffered_rows = max_buffered_rows
+        os.makedirs(self.dataset_dir, exist_ok=True)
+
+        # Leftovers from a run that never reached close()
+        for partial in self.dataset_dir.glob("*.parquet.tmp"):
+            partial.unlink()
+        # Parts written with an older schema can't be read or rewritten alongside current ones;
+        # their documents are backfilled from the extracted CSVs or re-extracted
+        for part in self.part_files():
+            if not pq.read_schema(part).equals(SCHEMA, check_metadata=False):
+                logging.info(f"Removing {part.name}, written with an older schema")
+                part.unlink()
+
+        part_name = f"part-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.parquet"
+        self.part_path = self.dataset_dir / part_name
+        self._tmp_path = self.dataset_dir / f"{part_name}.tmp"
+        self._writer = None
+        self._buffer = []
+        self._buffered_rows = 0
+        self.rows_written = 0
+
+    def part_files(self) -> list[Path]:
+        return sorted(self.dataset_dir.glob("*.parquet"))
+
+    def documents(self) -> set[str]:
+        """Filenames of the PDFs that already have rows in the dataset."""
+        names = set()
+        for part in self.part_files():
+            names.update(pq.read_table(part, columns=["filename"])["filename"].unique().to_pylist())
+        return names
+
+    def drop_documents(self, filenames: set[str]):
+        """
+        Removes every row belonging to the given PDFs, e.g. before they are re-extracted.
+        Affected part files are rewritten one row group at a time.
+        """
+        if not filenames:
+            return
+        value_set = pa.array(sorted(filenames), type=pa.string())
+        for part in self.part_files():
+            part_file = pq.ParquetFile(part)
+            if not pc.any(pc.is_in(part_file.read(columns=["filename"])["filename"], value_set=value_set)).as_py():
+                continue
+
+            rewritten = part.with_suffix(".rewrite.tmp")
+            kept = 0
+            with pq.ParquetWriter(rewritten, SCHEMA) as writer:
+                for i in range(part_file.num_row_groups):
+                    group = part_file.read_row_group(i)
+                    group = group.filter(pc.invert(pc.is_in(group["filename"], value_set=value_set)))
+                    if group.num_rows:
+                        writer.write_table(group)
+                        kept += group.num_rows
+            part_file.close()
+
+            if kept:
+                os.replace(rewritten, part)
+            else:
+                os.remove(rewritten)
+                os.remove(part)
+            logging.info(f"Dropped superseded rows from {part.name} ({kept} rows kept)")
+
+    def write(self, df: pd.DataFrame):
+        """Appends one document's extracted rows."""
+        table = to_combined_table(df)
+        self._buffer.append(table)
+        self._buffered_rows += table.num_rows
+        if self._buffered_rows >= self.max_buffered_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._buffered_rows:
+            self._buffer = []
+            return
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._tmp_path, SCHEMA)
+        self._writer.write_table(pa.concat_tables(self._buffer))
+        self.rows_written += self._buffered_rows
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self._tmp_path, self.part_path)
+            logging.info(f"Wrote {self.rows_written} rows to combined dataset part {self.part_path}")
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# RN statuses that need no further downloading
+FINISHED_RN_STATUSES = ("done", "no_maert")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rns (
+    rn_number TEXT NOT NULL,
+    zipcode TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (rn_number, zipcode)
+);
+CREATE INDEX IF NOT EXISTS idx_rns_status ON rns (status);
+
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    rn_number TEXT NOT NULL,
+    zipcode TEXT NOT NULL,
+    permit_number TEXT,
+    document_date TEXT,
+    file_name TEXT,
+    sha256 TEXT,
+    status TEXT NOT NULL,
+    note TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_rn ON documents (rn_number);
+CREATE INDEX IF NOT EXISTS idx_documents_permit ON documents (permit_number);
+CREATE INDEX IF NOT EXISTS idx_documents_file ON documents (file_name);
+CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status);
+
+CREATE TABLE IF NOT EXISTS pdf_checks (
+    sha256 TEXT PRIMARY KEY,
+    valid INTEGER NOT NULL,
+    page_count INTEGER,
+    method TEXT NOT NULL,
+    reason TEXT,
+    checked_at TEXT NOT NULL
+);
+"""
+
+# Columns added after the first release of the ledger, created on open if missing
+MIGRATIONS = {
+    "sha256": "ALTER TABLE documents ADD COLUMN sha256 TEXT",
+}
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_documents_sha256 ON documents (sha256);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class DownloadLedger:
+    """
+    SQLite record of download progress, per RN and per MAERT document.
+
+    RNs move through in_progress -> done / no_maert / incomplete, and each document is
+    recorded as downloaded or failed in its own transaction, so a run interrupted halfway
+    through an RN resumes at the first document it hadn't finished. The database is in WAL
+    mode so the extractor can query it while a download is running, and a single connection
+    is shared (under a lock) by all of a process's download threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+            columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(documents)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self.conn.execute(statement)
+            self.conn.executescript(INDEXES)
+
+    def close(self):
+        self.conn.close()
+
+    def _execute(self, sql: str, params=()):
+        with self._lock, self.conn:
+            return self.conn.execute(sql, params).fetchall()
+
+    # ---------- RNs ----------
+
+    def mark_rn(self, rn_number, zipcode, status: str):
+        self._execute(
+            "INSERT INTO rns (rn_number, zipcode, status, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (rn_number, zipcode) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at",
+            (str(rn_number), str(zipcode), status, _now()),
+        )
+
+    def finished_rns(self) -> set[tuple[str, str]]:
+        placeholders = ", ".join("?" * len(FINISHED_RN_STATUSES))
+        rows = self._execute(f"SELECT rn_number, zipcode FROM rns WHERE status IN ({placeholders})", FINISHED_RN_STATUSES)
+        return {(row["rn_number"], row["zipcode"]) for row in rows}
+
+    def pending_rns(self, rn_zip_pairs) -> list[tuple[str, str]]:
+        """The (RN, zipcode) pairs, in input order, that still have downloading left to do."""
+        finished = self.finished_rns()
+        return [(rn, zipcode) for rn, zipcode in rn_zip_pairs if (str(rn), str(zipcode)) not in finished]
+
+    # ---------- Documents ----------
+
+    def record_document(self, document_id, rn_number, zipcode, permit_number=None, document_date=None,
+                        file_name=None, status="downloaded", note=None, sha256=None):
+        self._execute(
+            "INSERT INTO documents (document_id, rn_number, zipcode, permit_number, document_date, file_name, "
+            "sha256, status, note, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (document_id) DO UPDATE SET rn_number = excluded.rn_number, zipcode = excluded.zipcode, "
+            "permit_number = excluded.permit_number, document_date = excluded.document_date, "
+            "file_name = excluded.file_name, sha256 = excluded.sha256, status = excluded.status, "
+            "note = excluded.note, updated_at = excluded.updated_at",
+            (str(document_id), str(rn_number), str(zipcode),
+             None if permit_number is None else str(permit_number), document_date, file_name, sha256,
+             status, note, _now()),
+        )
+
+    def find_file(self, sha256, zipcode, permit_number, document_date) -> str | None:
+        """File name already holding this content for the same zipcode, permit and date, if any."""
+        rows = self._execute(
+            "SELECT file_name FROM documents WHERE sha256 = ? AND zipcode = ? AND permit_number = ? "
+            "AND document_date = ? AND status = 'downloaded' LIMIT 1",
+            (sha256, str(zipcode), str(permit_number), document_date),
+        )
+        return rows[0]["file_name"] if rows else None
+
+    def is_downloaded(self, document_id) -> bool:
+        rows = self._execute("SELECT 1 FROM documents WHERE document_id = ? AND status = 'downloaded'", (str(document_id),))
+        return bool(rows)
+
+    def documents(self, status: str | None = None) -> pd.DataFrame:
+        """All documents (optionally only those with the given status) as a DataFrame."""
+        with self._lock:
+            if status is None:
+                return pd.read_sql_query("SELECT * FROM documents", self.conn)
+            return pd.read_sql_query("SELECT * FROM documents WHERE status = ?", self.conn, params=(status,))
+
+    def downloaded_files(self) -> set[str]:
+        rows = self._execute("SELECT file_name FROM documents WHERE status = 'downloaded' AND file_name IS NOT NULL")
+        return {row["file_name"] for row in rows}
+
+    # ---------- PDF validation ----------
+
+    def record_check(self, sha256, check):
+        """Stores a utils.pdf_validation.PdfCheck verdict for the content with this SHA-256."""
+        self._execute(
+            "INSERT INTO pdf_checks (sha256, valid, page_count, method, reason, checked_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (sha256) DO UPDATE SET valid = excluded.valid, page_count = excluded.page_count, "
+            "method = excluded.method, reason = excluded.reason, checked_at = excluded.checked_at",
+            (sha256, int(check.valid), check.page_count, check.method, check.reason, _now()),
+        )
+
+    def checks(self, sha256s) -> dict[str, dict]:
+        """
+        Recorded validation verdicts for whichever of the given SHA-256s have one, as dicts
+        with the PdfCheck fields (valid, page_count, method, reason).
+        """
+        sha256s = list(sha256s)
+        found = {}
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(sha256s), 500):
+            batch = sha256s[start:start + 500]
+            placeholders = ", ".join("?" * len(batch))
+            for row in self._execute(f"SELECT * FROM pdf_checks WHERE sha256 IN ({placeholders})", batch):
+                found[row["sha256"]] = {"valid": bool(row["valid"]), "page_count": row["page_count"],
+                                        "method": row["method"], "reason": row["reason"]}
+        return found
+
+    # ---------- Migration ----------
+
+    def import_csv_log(self, csv_path: str) -> int:
+        """
+        One-off import of the old download_logs.csv (rn_number, file_name, zipcode): every RN in
+        it counts as done, as it did before, and each file becomes a downloaded document keyed
+        by its file name. Returns the number of rows imported.
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        df = pd.read_csv(csv_path, dtype=str)
+        now = _now()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO rns (rn_number, zipcode, status, updated_at) VALUES (?, ?, 'done', ?)",
+                [(row.rn_number, row.zipcode, now) for row in df.itertuples()],
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO documents (document_id, rn_number, zipcode, file_name, status, updated_at) "
+                "VALUES (?, ?, ?, ?, 'downloaded', ?)",
+                [(f"legacy:{row.file_name}", row.rn_number, row.zipcode, row.file_name, now) for row in df.itertuples()],
+            )
+        return len(df)
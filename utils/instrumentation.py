@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import pstats
+import logging
+import cProfile
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class Metrics:
+    """
+    Thread-safe timers and counters for the scraping, download and extraction stages.
+
+    Every timed span is added to per-name totals (count, total, max) for the end-of-run summary
+    and, once a trace file is configured, written to it as one JSON line with its wall-clock and
+    CPU time and any extra fields. Worker processes append to the same trace file and hand their
+    totals back to the parent with drain() / merge().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+        self._trace = None
+
+    def configure(self, trace_path: str | None = None):
+        """Starts (or stops, with None) appending trace events to trace_path."""
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+            if trace_path:
+                os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+                self._trace = open(trace_path, 'a', buffering=1)
+
+    def _emit(self, event: dict):
+        # Called with the lock held
+        if self._trace is not None:
+            event = {"ts": round(time.time(), 6), "pid": os.getpid(),
+                     "thread": threading.current_thread().name, **event}
+            self._trace.write(json.dumps(event, default=str) + "\n")
+
+    def record(self, name: str, seconds: float, cpu_seconds: float | None = None, **fields):
+        with self._lock:
+            count, total, longest = self._timers.get(name, (0, 0.0, 0.0))
+            self._timers[name] = (count + 1, total + seconds, max(longest, seconds))
+            self._emit({"span": name, "seconds": round(seconds, 6),
+                        **({} if cpu_seconds is None else {"cpu_seconds": round(cpu_seconds, 6)}), **fields})
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    @contextmanager
+    def span(self, name: str, **fields):
+        """
+        Times the block. The yielded dict can be filled in with fields known only at the end
+        (e.g. rows extracted); a block that raises is recorded with ok=False.
+        """
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        extra = {}
+        ok = True
+        try:
+            yield extra
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            fields = {**fields, **extra, **({} if ok else {"ok": False})}
+            self.record(name, time.perf_counter() - start, time.thread_time() - cpu_start, **fields)
+
+    def timed(self, name: str):
+        """Decorator form of span()."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "timers": {name: {"count": count, "total_s": total, "max_s": longest}
+                           for name, (count, total, longest) in self._timers.items()},
+                "counters": dict(self._counters),
+            }
+
+    def drain(self) -> dict:
+        """Returns the summary and resets the totals, e.g. for a worker process to send back after each task."""
+        summary = self.summary()
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+        return summary
+
+    def merge(self, summary: dict):
+        """Adds totals drained from another process."""
+        with self._lock:
+            for name, stats in summary["timers"].items():
+                count, total, longest = self._timers.get(name, (0, 0.0, 0.0))
+                self._timers[name] = (count + stats["count"], total + stats["total_s"], max(longest, stats["max_s"]))
+            for name, n in summary["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def log_summary(self):
+        """Logs the totals, slowest stage first, and appends them to the trace as a summary event."""
+        summary = self.summary()
+        for name, stats in sorted(summary["timers"].items(), key=lambda item: -item[1]["total_s"]):
+            logging.info(f"Timer [{name}]: {stats['count']} calls, {stats['total_s']:.2f}s total, "
+                         f"{stats['total_s'] / stats['count'] * 1000:.1f} ms mean, {stats['max_s']:.2f}s max")
+        for name, n in sorted(summary["counters"].items()):
+            logging.info(f"Counter [{name}]: {n}")
+        with self._lock:
+            self._emit({"event": "summary", **summary})
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def profiled(output_path: str | None):
+    """
+    Profiles the block when output_path is set: with pyinstrument (which must be installed)
+    for a .html path, otherwise with cProfile, saving stats that `python -m pstats` or
+    snakeviz can open and logging the top functions by cumulative time.
+    """
+    if not output_path:
+        yield
+        return
+
+    if output_path.endswith(".html"):
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(output_path, 'w') as f:
+                f.write(profiler.output_html())
+            logging.info(f"Saved pyinstrument profile to {output_path}")
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output_path)
+        logging.info(f"Saved cProfile stats to {output_path}; top functions by cumulative time:")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
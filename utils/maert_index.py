@@ -0,0 +1,234 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    filename TEXT PRIMARY KEY,
+    rn_number TEXT,
+    zipcode TEXT,
+    permit_number TEXT,
+    publish_date TEXT,
+    rows INTEGER NOT NULL,
+    latest INTEGER NOT NULL DEFAULT 1,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_permit ON documents (permit_number, publish_date);
+
+CREATE TABLE IF NOT EXISTS maerts (
+    filename TEXT NOT NULL,
+    rn_number TEXT,
+    zipcode TEXT,
+    permit_number TEXT,
+    publish_date TEXT,
+    emission_source TEXT,
+    source_name TEXT,
+    air_contaminant_name TEXT COLLATE NOCASE,
+    emission_rate_lbs_hr REAL,
+    emission_rate_lbs_hr_qualifier TEXT,
+    emission_rate_tons_year REAL,
+    emission_rate_tons_year_qualifier TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_maerts_filename ON maerts (filename);
+CREATE INDEX IF NOT EXISTS idx_maerts_contaminant ON maerts (air_contaminant_name, zipcode);
+CREATE INDEX IF NOT EXISTS idx_maerts_zipcode ON maerts (zipcode);
+CREATE INDEX IF NOT EXISTS idx_maerts_rn ON maerts (rn_number);
+CREATE INDEX IF NOT EXISTS idx_maerts_permit ON maerts (permit_number);
+CREATE INDEX IF NOT EXISTS idx_maerts_date ON maerts (publish_date);
+
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+# Normalized extracted column -> maerts column; the document's metadata columns are added on top
+ROW_COLUMNS = {
+    "Emission Source": "emission_source",
+    "Source Name": "source_name",
+    "Air Contaminant Name": "air_contaminant_name",
+    "emission_rate_lbs_hr": "emission_rate_lbs_hr",
+    "emission_rate_lbs_hr_qualifier": "emission_rate_lbs_hr_qualifier",
+    "emission_rate_tons_year": "emission_rate_tons_year",
+    "emission_rate_tons_year_qualifier": "emission_rate_tons_year_qualifier",
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _text(value) -> str | None:
+    return None if pd.isna(value) else str(value)
+
+
+class MaertIndex:
+    """
+    SQLite index of every extracted MAERT row, for filtered and aggregate queries across
+    documents without loading the CSVs.
+
+    Rows carry their document's RN, zipcode, permit number and publish date, and are indexed
+    on each of them and on the contaminant. Documents are written and dropped one at a time
+    as extraction proceeds, each in its own transaction, so the index is always queryable.
+    A permit's most recent MAERT is flagged as latest, since a newer one supersedes the older
+    ones. RNs come from the download ledger, and the RN search results in rns_by_zipcode.csv
+    are kept alongside as the rns table.
+    """
+
+    def __init__(self, path: str, ledger_path: str | None = None):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+        # RNs are looked up in the ledger (only ever read here) as each document is written
+        self.ledger_attached = bool(ledger_path) and os.path.exists(ledger_path)
+        if self.ledger_attached:
+            self.conn.execute("ATTACH DATABASE ? AS ledger", (ledger_path,))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- Documents ----------
+
+    def documents(self) -> set[str]:
+        return {row["filename"] for row in self.conn.execute("SELECT filename FROM documents")}
+
+    def _rn_for(self, filename: str) -> str | None:
+        if not self.ledger_attached:
+            return None
+        row = self.conn.execute(
+            "SELECT rn_number FROM ledger.documents WHERE file_name = ? AND status = 'downloaded' LIMIT 1",
+            (filename,),
+        ).fetchone()
+        return row["rn_number"] if row else None
+
+    def _mark_latest(self, permit_numbers):
+        """Flags the most recent document (then the first by name) of each permit as latest."""
+        for permit_number in set(permit_numbers):
+            self.conn.execute(
+                "UPDATE documents SET latest = (filename = ("
+                "SELECT filename FROM documents WHERE permit_number IS ? "
+                "ORDER BY publish_date IS NULL, publish_date DESC, filename LIMIT 1)) "
+                "WHERE permit_number IS ?",
+                (permit_number, permit_number),
+            )
+
+    def write(self, df: pd.DataFrame):
+        """
+        Indexes one document's rows, as normalized by utils.normalization.normalize_rows (with
+        the file-name metadata columns), replacing any rows indexed for it before.
+        """
+        if df.empty:
+            return
+        first = df.iloc[0]
+        filename = str(first["filename"])
+        publish_date = first.get("publish_date")
+        document = {
+            "filename": filename,
+            "rn_number": self._rn_for(filename),
+            "zipcode": _text(first.get("zipcode")),
+            "permit_number": _text(first.get("permit_number")),
+            "publish_date": None if pd.isna(publish_date) else pd.Timestamp(publish_date).strftime("%Y-%m-%d"),
+        }
+
+        rows = pd.DataFrame({target: df[source] if source in df.columns else None
+                             for source, target in ROW_COLUMNS.items()})
+        rows = rows.astype(object).where(rows.notna(), None)
+        metadata = [document[name] for name in ("rn_number", "zipcode", "permit_number", "publish_date")]
+        records = [(filename, *metadata, *values) for values in rows.itertuples(index=False, name=None)]
+
+        with self.conn:
+            previous = self.conn.execute("SELECT permit_number FROM documents WHERE filename = ?", (filename,)).fetchall()
+            self.conn.execute("DELETE FROM maerts WHERE filename = ?", (filename,))
+            self.conn.executemany(
+                f"INSERT INTO maerts (filename, rn_number, zipcode, permit_number, publish_date, "
+                f"{', '.join(ROW_COLUMNS.values())}) VALUES ({', '.join('?' * (5 + len(ROW_COLUMNS)))})",
+                records,
+            )
+            self.conn.execute(
+                "INSERT INTO documents (filename, rn_number, zipcode, permit_number, publish_date, rows, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (filename) DO UPDATE SET rn_number = excluded.rn_number, "
+                "zipcode = excluded.zipcode, permit_number = excluded.permit_number, "
+                "publish_date = excluded.publish_date, rows = excluded.rows, indexed_at = excluded.indexed_at",
+                (*document.values(), len(records), _now()),
+            )
+            self._mark_latest([document["permit_number"]] + [row["permit_number"] for row in previous])
+
+    def drop_documents(self, filenames: set[str]):
+        """Removes every indexed row of the given PDFs, e.g. before they are re-extracted."""
+        filenames = list(filenames)
+        with self.conn:
+            for start in range(0, len(filenames), 500):
+                batch = filenames[start:start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                permits = [row["permit_number"] for row in self.conn.execute(
+                    f"SELECT permit_number FROM documents WHERE filename IN ({placeholders})", batch)]
+                self.conn.execute(f"DELETE FROM maerts WHERE filename IN ({placeholders})", batch)
+                self.conn.execute(f"DELETE FROM documents WHERE filename IN ({placeholders})", batch)
+                self._mark_latest(permits)
+
+    def link_rns(self) -> int:
+        """
+        Fills in RNs for documents indexed before the ledger knew them (e.g. extracted by an
+        earlier run than their download was recorded in). Returns the number of documents updated.
+        """
+        if not self.ledger_attached:
+            return 0
+        missing = [row["filename"] for row in self.conn.execute("SELECT filename FROM documents WHERE rn_number IS NULL")]
+        linked = 0
+        with self.conn:
+            for filename in missing:
+                rn_number = self._rn_for(filename)
+                if rn_number is not None:
+                    self.conn.execute("UPDATE documents SET rn_number = ? WHERE filename = ?", (rn_number, filename))
+                    self.conn.execute("UPDATE maerts SET rn_number = ? WHERE filename = ?", (rn_number, filename))
+                    linked += 1
+        return linked
+
+    # ---------- RN search results ----------
+
+    def load_rns(self, csv_path: str) -> bool:
+        """
+        Loads rns_by_zipcode.csv into the rns table (all columns, as text), indexed on RN and
+        zipcode. Skipped when the file is unchanged since it was last loaded; returns whether it was loaded.
+        """
+        if not os.path.exists(csv_path):
+            return False
+        csv_path = os.path.abspath(csv_path)
+        stat = os.stat(csv_path)
+        row = self.conn.execute("SELECT mtime_ns, size FROM sources WHERE path = ?", (csv_path,)).fetchone()
+        if row and (row["mtime_ns"], row["size"]) == (stat.st_mtime_ns, stat.st_size):
+            return False
+
+        rns = pd.read_csv(csv_path, dtype=str)
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS rns")
+            rns.to_sql("rns", self.conn, index=False)
+            for column in ("rn_number", "zipcode"):
+                if column in rns.columns:
+                    self.conn.execute(f"CREATE INDEX idx_rns_{column} ON rns ({column})")
+            self.conn.execute(
+                "INSERT INTO sources (path, mtime_ns, size) VALUES (?, ?, ?) ON CONFLICT (path) DO UPDATE SET "
+                "mtime_ns = excluded.mtime_ns, size = excluded.size",
+                (csv_path, stat.st_mtime_ns, stat.st_size),
+            )
+        return True
+
+    def rn_columns(self) -> list[str]:
+        return [row["name"] for row in self.conn.execute("PRAGMA table_info(rns)")]
+
+    # ---------- Queries ----------
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self.conn, params=params)
@@ -0,0 +1,85 @@
+import re
+import logging
+from pathlib import Path
+
+import pypdfium2 as pdfium
+
+# Whitespace-free, lowercased markers; raw pdfium text spaces words inconsistently
+MAERT_START_MARKERS = ("aircontaminantname", "maximumallowableemissionrates")
+MAERT_END_MARKER = "pointidentification"
+
+WHITESPACE_PAT = re.compile(r"\s+")
+
+# Bump whenever a change to scan_maert_pages should invalidate the page ranges recorded in the
+# extraction manifest
+LOCATOR_VERSION = 1
+# Recorded instead of a range for PDFs whose pages all have to be parsed
+ALL_PAGES = "all"
+
+
+def normalize_text(text: str) -> str:
+    return WHITESPACE_PAT.sub("", text).lower()
+
+
+def scan_maert_pages(pdf_path: Path) -> tuple[int, int] | None:
+    """
+    Finds the candidate MAERT page range from pdfium's raw page text, without any layout analysis.
+    Returns 0-based (first, last) page indices, both inclusive, or None if the PDF has no text layer
+    to go on (in which case every page should be considered).
+
+    The range ends at the first page carrying the "(1) Emission point identification" footnote
+    (or the last page) and starts at the first page before it with a MAERT header.
+    """
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        first = None
+        found_text = False
+        for index in range(len(pdf)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            try:
+                text = normalize_text(textpage.get_text_bounded())
+            finally:
+                textpage.close()
+                page.close()
+
+            found_text = found_text or bool(text)
+            if first is None and any(marker in text for marker in MAERT_START_MARKERS):
+                first = index
+            if MAERT_END_MARKER in text:
+                return (first if first is not None else 0), index
+
+        if not found_text:
+            return None
+        return (first if first is not None else 0), len(pdf) - 1
+    finally:
+        pdf.close()
+
+
+def locate_maert_pages(pdf_path: Path) -> tuple[int, int] | None:
+    """
+    scan_maert_pages, with scan failures logged and treated like a PDF without a text layer.
+    Located ranges are kept across runs in the extraction manifest (see format_page_range),
+    so each PDF's content is only scanned once.
+    """
+    pdf_path = Path(pdf_path)
+    try:
+        return scan_maert_pages(pdf_path)
+    except Exception as e:
+        logging.warning(f"MAERT page scan failed for {pdf_path.name}, extracting all pages: {e}")
+        return None
+
+
+def format_page_range(page_range: tuple[int, int] | None) -> str:
+    """A located range as recorded in the manifest: 1-based pages "first-last", or ALL_PAGES."""
+    if page_range is None:
+        return ALL_PAGES
+    return f"{page_range[0] + 1}-{page_range[1] + 1}"
+
+
+def parse_page_range(text: str) -> tuple[int, int] | None:
+    """Inverse of format_page_range."""
+    if text == ALL_PAGES:
+        return None
+    first, last = text.split("-")
+    return int(first) - 1, int(last) - 1
@@ -0,0 +1,97 @@
+import re
+import pandas as pd
+
+from utils.instrumentation import metrics
+
+# Raw emission-rate column -> prefix of its typed columns
+RATE_COLUMNS = {
+    "Emission Rate lbs/hr": "emission_rate_lbs_hr",
+    "Emission Rate tons/year": "emission_rate_tons_year",
+}
+CONTAMINANT_COLUMN = "Air Contaminant Name"
+
+# A rate cell: an optional qualifier, the number (commas allowed as thousands separators)
+# and any footnote markers after it, e.g. "<0.01", "1,234.5", "0.02 (6)", "3.1*"
+RATE_PAT = re.compile(
+    r"^(?P<qualifier>less\s+than|<=?|>=?|≤|≥|~)?\s*"
+    r"(?P<number>(?:\d[\d,]*(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)\s*"
+    r"(?P<footnote>(?:(?:\(\s*\w{1,3}\s*\)|\*+)\s*)*)$",
+    re.IGNORECASE,
+)
+FOOTNOTE_MARK_PAT = re.compile(r"\w+|\*+")
+QUALIFIERS = {"<": "<", "<=": "<=", "≤": "<=", ">": ">", ">=": ">=", "≥": ">=", "~": "~", "less than": "<"}
+QUALIFIER_DTYPE = pd.CategoricalDtype(sorted(set(QUALIFIERS.values())))
+# Dates in file names (and so in the CSVs) are MM-DD-YYYY; CSVs from extractor version 4,
+# which wrote the normalized rows, hold ISO dates
+DATE_FORMATS = ("%m-%d-%Y", "%Y-%m-%d")
+
+
+def parse_rates(raw: pd.Series) -> pd.DataFrame:
+    """
+    Splits a column of raw emission-rate strings into a float64 rate, its qualifier (e.g.
+    "<" for "<0.01", as a categorical) and its footnote markers ("6" for "0.02 (6)", several
+    joined with commas). Blanks, the 'empty' sentinel and anything else that isn't a rate
+    come out as NaN.
+
+    Plain numbers, the bulk of every table, are converted in one pass; only the cells left
+    over are matched against RATE_PAT.
+    """
+    text = raw.astype("string").str.strip()
+    rate = pd.to_numeric(text, errors="coerce").astype("float64")
+    qualifier = pd.Series(pd.NA, index=raw.index, dtype="string")
+    footnote = pd.Series(pd.NA, index=raw.index, dtype="string")
+
+    rest = rate.isna() & text.notna() & (text != "")
+    if rest.any():
+        parts = text[rest].str.extract(RATE_PAT)
+        numbers = parts["number"].str.replace(",", "", regex=False)
+        rate[rest] = pd.to_numeric(numbers, errors="coerce").astype("float64")
+        qualifier[rest] = parts["qualifier"].str.lower().str.split().str.join(" ").map(QUALIFIERS)
+        marks = parts["footnote"].str.findall(FOOTNOTE_MARK_PAT).str.join(",")
+        footnote[rest] = marks.mask(marks == "")
+
+    return pd.DataFrame({
+        "rate": rate,
+        "qualifier": qualifier.astype(QUALIFIER_DTYPE),
+        "footnote": footnote,
+    })
+
+
+def parse_dates(raw: pd.Series) -> pd.Series:
+    """datetime64 dates from the file-name (MM-DD-YYYY) or ISO form; anything else is NaT."""
+    dates = pd.Series(pd.NaT, index=raw.index, dtype="datetime64[ns]")
+    for date_format in DATE_FORMATS:
+        missing = dates.isna()
+        if not missing.any():
+            break
+        dates[missing] = pd.to_datetime(raw[missing], format=date_format, errors="coerce")
+    return dates
+
+
+def normalize_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds typed columns to one document's extracted rows, so consumers can aggregate without
+    re-parsing strings: for each raw emission-rate column, a float64 rate plus its qualifier
+    and footnote columns (emission_rate_lbs_hr, emission_rate_lbs_hr_qualifier, ...).
+    Air Contaminant Name becomes categorical, with runs of whitespace collapsed, and
+    publish_date a datetime64. The raw rate strings are kept as they were.
+
+    Always derives the typed columns from the raw ones, so it can be re-run on rows read
+    back from a CSV.
+    """
+    with metrics.span("extract.normalize", rows=len(df)):
+        for column, prefix in RATE_COLUMNS.items():
+            if column not in df.columns:
+                continue
+            parsed = parse_rates(df[column])
+            df[prefix] = parsed["rate"]
+            df[f"{prefix}_qualifier"] = parsed["qualifier"]
+            df[f"{prefix}_footnote"] = parsed["footnote"]
+
+        if CONTAMINANT_COLUMN in df.columns:
+            names = df[CONTAMINANT_COLUMN].astype("string").str.split().str.join(" ")
+            df[CONTAMINANT_COLUMN] = names.mask(names == "").astype("category")
+
+        if "publish_date" in df.columns:
+            df["publish_date"] = parse_dates(df["publish_date"])
+    return df
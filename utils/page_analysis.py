@@ -0,0 +1,41 @@
+from functools import cached_property
+
+from pdfplumber.page import Page
+
+
+class PageAnalysis:
+    """
+    The views of a single pdfplumber page that MAERT extraction needs, each computed at most once.
+
+    pdfplumber runs pdfminer's layout analysis the first time a page's objects are touched
+    and caches the resulting chars/edges on the page, so every view below is derived from that
+    one layout pass. On top of that the views are lazy: an easy (ruled) page only ever needs
+    the table candidate and the simple text, so the words are never extracted for it.
+    """
+
+    def __init__(self, page: Page):
+        self.page = page
+
+    @property
+    def page_number(self) -> int:
+        return self.page.page_number
+
+    @cached_property
+    def table(self) -> list[list[str | None]] | None:
+        """Largest ruled table on the page, as returned by page.extract_table()."""
+        return self.page.extract_table()
+
+    @cached_property
+    def text_simple(self) -> str:
+        """Page text with runs of blanks collapsed, as returned by page.extract_text()."""
+        return self.page.extract_text()
+
+    @cached_property
+    def words(self) -> list[dict]:
+        """Words with their positions, as returned by page.extract_words(), for layout-based parsing."""
+        return self.page.extract_words()
+
+    @cached_property
+    def text(self) -> str:
+        """Page text with blank characters kept, used to split whitespace-aligned columns."""
+        return self.page.extract_text(keep_blank_chars=True)
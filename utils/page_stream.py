@@ -0,0 +1,76 @@
+import os
+import sys
+import ctypes
+import struct
+import resource
+from pathlib import Path
+
+import pdfplumber
+
+from utils.page_analysis import PageAnalysis
+
+
+class OversizedDocument(Exception):
+    """A document over the page cap, or one whose extraction went over the memory ceiling."""
+
+
+# proc_pidinfo flavor and result size for macOS's struct proc_taskinfo, which starts with the
+# virtual and resident sizes as 64-bit integers
+PROC_PIDTASKINFO = 4
+PROC_TASKINFO_SIZE = 96
+
+
+def _darwin_rss_bytes() -> int:
+    libproc = ctypes.CDLL("/usr/lib/libproc.dylib", use_errno=True)
+    info = ctypes.create_string_buffer(PROC_TASKINFO_SIZE)
+    if libproc.proc_pidinfo(os.getpid(), PROC_PIDTASKINFO, ctypes.c_uint64(0), info, PROC_TASKINFO_SIZE) <= 0:
+        raise OSError(ctypes.get_errno(), "proc_pidinfo failed")
+    return struct.unpack_from("=QQ", info.raw)[1]
+
+
+def current_rss_mb() -> float:
+    """
+    Resident set size of this process right now, from /proc/self/statm on Linux and
+    proc_pidinfo on macOS (falling back to the peak RSS where neither is available).
+    """
+    try:
+        if sys.platform == "darwin":
+            return _darwin_rss_bytes() / (1024 * 1024)
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def stream_pages(pdf_path: Path, page_range: tuple[int, int] | None = None,
+                 max_pages: int | None = None, max_memory_mb: float | None = None):
+    """
+    Yields a PageAnalysis for each page of pdf_path (or each page in the 0-based inclusive
+    page_range) and flushes the page's cached layout objects as soon as the caller moves on,
+    so memory stays flat however many pages are parsed.
+
+    Raises OversizedDocument before any page is parsed if more than max_pages would be, and
+    after a page if the process's RSS has grown by more than max_memory_mb since the call
+    (memory already held by the caller, e.g. earlier documents in the same worker, doesn't
+    count). Either limit can be None (or 0) to disable it.
+    """
+    baseline_mb = current_rss_mb() if max_memory_mb else None
+    pages_to_parse = None if page_range is None else list(range(page_range[0] + 1, page_range[1] + 2))
+
+    with pdfplumber.open(pdf_path, pages=pages_to_parse) as pdf:
+        pages = pdf.pages
+        if max_pages and len(pages) > max_pages:
+            raise OversizedDocument(f"{len(pages)} pages to parse, over the cap of {max_pages}")
+
+        for page in pages:
+            try:
+                yield PageAnalysis(page)
+            finally:
+                page.close()
+
+            if max_memory_mb:
+                grown = current_rss_mb() - baseline_mb
+                if grown > max_memory_mb:
+                    raise OversizedDocument(f"grew by {grown:.0f} MB by page {page.page_number}, "
+                                            f"over the ceiling of {max_memory_mb} MB")
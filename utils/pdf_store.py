@@ -0,0 +1,69 @@
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+
+
+def file_sha256(path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PdfStore:
+    """
+    Content-addressed PDF storage: each distinct PDF is kept once, at <root>/<sha[:2]>/<sha>.pdf.
+
+    Human-readable names (e.g. the {zipcode}_{permit}_{date}_{id}.pdf files in data/raw_pdfs)
+    are hard links to the stored blob, so the same document downloaded again, or listed under
+    several zip codes, takes no extra disk space.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / f"{sha256}.pdf"
+
+    def add(self, path) -> tuple[str, Path, bool]:
+        """
+        Moves a file into the store, or deletes it if identical content is already stored.
+        Returns its SHA-256, the blob path and whether the blob is new.
+        Safe to call from several threads at once, including for the same content.
+        """
+        sha256 = file_sha256(path)
+        blob = self.blob_path(sha256)
+        if blob.exists():
+            os.remove(path)
+            return sha256, blob, False
+
+        os.makedirs(blob.parent, exist_ok=True)
+        # A temporary name of its own, so concurrent adds of the same content never share one
+        fd, tmp_blob = tempfile.mkstemp(prefix=f"{blob.name}.", suffix=".tmp", dir=blob.parent)
+        os.close(fd)
+        try:
+            shutil.move(path, tmp_blob)
+            if blob.exists():
+                # Another worker stored the same content in the meantime
+                os.remove(tmp_blob)
+                return sha256, blob, False
+            os.replace(tmp_blob, blob)
+        except BaseException:
+            if os.path.exists(tmp_blob):
+                os.remove(tmp_blob)
+            raise
+        return sha256, blob, True
+
+    def link(self, sha256: str, dest_path):
+        """Exposes a stored blob under dest_path, as a hard link where the filesystem allows it."""
+        blob = self.blob_path(sha256)
+        try:
+            os.link(blob, dest_path)
+        except OSError as e:
+            logging.debug(f"Hard link to {blob} failed ({e}); copying instead.")
+            shutil.copy2(blob, dest_path)
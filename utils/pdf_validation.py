@@ -0,0 +1,109 @@
+import re
+import mmap
+import logging
+from typing import NamedTuple
+
+from PyPDF2 import PdfReader
+
+from utils.instrumentation import metrics
+
+# The header may be preceded by junk, and the trailer followed by whitespace or a few bytes of padding
+HEADER_WINDOW = 1024
+TRAILER_WINDOW = 1024
+# How far around a /Type /Pages marker to look for its /Count
+PAGES_WINDOW = 4096
+# How far into a cross-reference stream's dictionary to look for its /Type
+XREF_DICT_WINDOW = 1024
+
+STARTXREF_PAT = re.compile(rb"startxref\s+(\d+)\s+%%EOF")
+# A classic xref table, or the "N G obj <<" header of an object that may be a cross-reference stream
+XREF_TABLE_PAT = re.compile(rb"\s*xref")
+XREF_STREAM_PAT = re.compile(rb"\s*\d+\s+\d+\s+obj\s*<<")
+XREF_TYPE_PAT = re.compile(rb"/Type\s*/XRef(?![A-Za-z])")
+PAGES_PAT = re.compile(rb"/Type\s*/Pages(?![A-Za-z])")
+COUNT_PAT = re.compile(rb"/Count\s+(\d+)")
+
+
+class PdfCheck(NamedTuple):
+    valid: bool
+    page_count: int | None
+    method: str  # "quick" or "full"
+    reason: str | None = None
+
+
+def points_at_xref(data, offset: int) -> bool:
+    """
+    Whether offset is the start of a classic xref table, or of an object whose dictionary
+    (before its stream data) has /Type /XRef. Any other object there means a wrong offset.
+    """
+    if offset >= len(data):
+        return False
+    if XREF_TABLE_PAT.match(data, offset):
+        return True
+    match = XREF_STREAM_PAT.match(data, offset)
+    if not match:
+        return False
+    end = data.find(b"stream", match.end(), match.end() + XREF_DICT_WINDOW)
+    return end >= 0 and XREF_TYPE_PAT.search(data, match.end(), end) is not None
+
+
+def quick_check(path) -> PdfCheck:
+    """
+    Structural check over a memory-mapped read: a %PDF- header, a %%EOF trailer whose
+    startxref offset lands on a cross-reference table or stream (see points_at_xref), and
+    (when the page tree isn't hidden in a compressed object stream) the root /Pages /Count.
+    No objects are parsed.
+    """
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return PdfCheck(False, None, "quick", "empty file")
+
+    with data:
+        if data.find(b"%PDF-", 0, HEADER_WINDOW) < 0:
+            return PdfCheck(False, None, "quick", "no %PDF- header")
+
+        trailer = data[max(0, len(data) - TRAILER_WINDOW):]
+        matches = list(STARTXREF_PAT.finditer(trailer))
+        if not matches:
+            return PdfCheck(False, None, "quick", "no startxref / %%EOF trailer")
+
+        offset = int(matches[-1].group(1))
+        if not points_at_xref(data, offset):
+            return PdfCheck(False, None, "quick", f"startxref offset {offset} does not point at an xref")
+
+        # The root of the page tree has the largest /Count of any /Pages node
+        counts = []
+        for match in PAGES_PAT.finditer(data):
+            start = data.rfind(b"obj", max(0, match.start() - PAGES_WINDOW), match.start())
+            end = data.find(b"endobj", match.end(), match.end() + PAGES_WINDOW)
+            if start < 0 or end < 0:
+                continue
+            counts.extend(int(count) for count in COUNT_PAT.findall(data, start, end))
+
+    return PdfCheck(True, max(counts) if counts else None, "quick")
+
+
+def full_check(path) -> PdfCheck:
+    try:
+        with open(path, 'rb') as f:
+            return PdfCheck(True, len(PdfReader(f).pages), "full")
+    except Exception as e:
+        return PdfCheck(False, None, "full", str(e) or type(e).__name__)
+
+
+def validate_pdf(path) -> PdfCheck:
+    """
+    Validates a PDF with quick_check, falling back to a full PyPDF2 parse only when the
+    quick check fails (e.g. a file with a damaged but recoverable trailer).
+    """
+    with metrics.span("validate_pdf") as span:
+        check = quick_check(path)
+        if not check.valid:
+            logging.debug(f"Quick PDF check failed for {path} ({check.reason}); trying a full parse.")
+            check = full_check(path)
+            if not check.valid:
+                logging.warning(f"Invalid PDF detected: {path}. Error: {check.reason}")
+        span.update(method=check.method, valid=check.valid, page_count=check.page_count)
+    return check
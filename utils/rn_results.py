@@ -0,0 +1,93 @@
+import re
+
+import lxml.html
+import numpy as np
+import pandas as pd
+
+# Same whitespace cleanup pd.read_html applies to cell text
+WHITESPACE_PAT = re.compile(r"[\r\n]+|\s{2,}")
+LBL_XPATH = ".//*[contains(concat(' ', normalize-space(@class), ' '), ' lbl ')]"
+
+
+def _clean(text: str) -> str:
+    return WHITESPACE_PAT.sub(" ", text).strip()
+
+
+def _stripped_text(el) -> str:
+    """Equivalent of BeautifulSoup's get_text(strip=True): stripped text nodes joined with no separator."""
+    return "".join(s.strip() for s in el.itertext())
+
+
+def _rows(table) -> list:
+    return table.xpath("./thead/tr | ./tbody/tr | ./tr | ./tfoot/tr")
+
+
+def parse_results_table(html: str) -> pd.DataFrame:
+    """
+    Parses the multi-record RN search results table (the first table on the page) with lxml.
+    Header cells come from <thead> or the leading all-<th> rows; body rows are written straight
+    into a preallocated record list and padded/truncated to the header width. Cell text is
+    kept as strings, cleaned up the way pd.read_html does it; empty cells become NaN.
+    """
+    doc = lxml.html.fromstring(html)
+    tables = doc.xpath("//table")
+    if not tables:
+        raise ValueError("No tables found")
+    rows = _rows(tables[0])
+
+    header_rows = tables[0].xpath("./thead/tr")
+    if not header_rows:
+        for row in rows:
+            cells = row.xpath("./td | ./th")
+            if not cells or any(cell.tag != "th" for cell in cells):
+                break
+            header_rows.append(row)
+    if not header_rows:
+        raise ValueError("Results table has no header row")
+    columns = [_clean(cell.text_content()) for cell in header_rows[-1].xpath("./td | ./th")]
+    width = len(columns)
+
+    body_rows = [row for row in rows if row not in header_rows]
+    records = [None] * len(body_rows)
+    n = 0
+    for row in body_rows:
+        values = [_clean(cell.text_content()) for cell in row.xpath("./td | ./th")]
+        if not any(values):
+            continue
+        if len(values) < width:
+            values.extend([""] * (width - len(values)))
+        records[n] = [value or np.nan for value in values[:width]]
+        n += 1
+
+    return pd.DataFrame(records[:n], columns=columns)
+
+
+def parse_single_record(html: str) -> dict[str, str]:
+    """
+    Parses the label/value pairs of a single-record RN page (regulated entity info,
+    street address and geographic location sections).
+    """
+    doc = lxml.html.fromstring(html)
+    data = {}
+
+    for reinfo in doc.xpath("//div[@id='reinfo'][1]"):
+        for row in reinfo.xpath(".//div | .//p"):
+            labels = row.xpath(LBL_XPATH)
+            if labels:
+                label = _stripped_text(labels[0])
+                data[label.replace(":", "")] = _stripped_text(row).replace(label, "").strip()
+
+    for street in doc.xpath("//div[@id='street_addr'][1]"):
+        spans = street.xpath(".//span[contains(concat(' ', normalize-space(@class), ' '), ' lbl ')]")
+        if spans:
+            label = _stripped_text(spans[0])
+            data[label.replace(":", "")] = _stripped_text(street).replace(label, "").strip()
+
+    for geo in doc.xpath("//div[@id='geo_loc'][1]"):
+        for p in geo.xpath(".//p"):
+            labels = p.xpath(".//label")
+            if labels:
+                label = _stripped_text(labels[0])
+                data[label.replace(":", "")] = _stripped_text(p).replace(label, "").strip()
+
+    return data
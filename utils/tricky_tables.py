@@ -3,9 +3,27 @@ import re
 import pandas as pd
 import numpy as np
 
-def parse_row(split_line: list[str], COLUMNS: list[str]) -> pd.DataFrame:
+from utils.instrumentation import metrics
+from utils.normalization import RATE_PAT
+
+SPLIT_PAT = re.compile(r'\s{3,}')
+
+# Layout-based parsing (extract_table_layout). Column gaps must be wider than this many
+# characters in every line of the page; a single space inside a cell never splits it.
+COLUMN_GAP_CHARS = 2
+# Runs of lines separated by more than this many line pitches are separate blocks; blocks
+# without any emission rates (page footers, notes) are not part of the table. A footer's
+# "Page 1 of 2" can fall under the rate columns, so only cells that read as a rate count
+BLOCK_GAP_PITCHES = 2.5
+# The table header ends with the emission rate units, possibly followed by a rule
+HEADER_PAT = re.compile(r'\bTPY\b|\btons\s*/\s*y(ea)?r\b', re.IGNORECASE)
+RULE_PAT = re.compile(r'^[-_=\s]+$')
+FOOTNOTE_KEY = "pointidentification"
+
+
+def parse_row_values(split_line: list[str]) -> tuple:
     """
-    Parse a split line into structured columns based on its length patterns.
+    Parse a split line into a tuple of the five table columns based on its length patterns.
     Highly customized to specific PDF formats.
     """
     remove_white = [x for x in split_line if x != '']
@@ -49,23 +67,228 @@ def parse_row(split_line: list[str], COLUMNS: list[str]) -> pd.DataFrame:
         # All five columns present
         emsource, sourcename, air_cont, lbs_hr, tons_year = remove_white[:5]
 
-    return pd.DataFrame([[emsource, sourcename, air_cont, lbs_hr, tons_year]], columns=COLUMNS)
+    return emsource, sourcename, air_cont, lbs_hr, tons_year
+
+
+def parse_row(split_line: list[str], COLUMNS: list[str]) -> pd.DataFrame:
+    """
+    Single-row DataFrame version of parse_row_values.
+    """
+    return pd.DataFrame([parse_row_values(split_line)], columns=COLUMNS)
 
 
 def extract_table_custom(lines: list[str], COLUMNS: list[str]) -> pd.DataFrame:
     """
-    Applies parse_row across lines to extract structured data
+    Applies parse_row_values across lines to extract structured data
     when PDFs cannot be table-extracted cleanly.
+    Rows are collected as plain tuples and turned into a single DataFrame at the end.
     """
-    total_df = []
+    with metrics.span("tricky.extract_table_custom", lines=len(lines)):
+        return _extract_table_custom(lines, COLUMNS)
+
+
+def _extract_table_custom(lines: list[str], COLUMNS: list[str]) -> pd.DataFrame:
+    records = []
     for l in lines:
-        split_line = re.split(r'\s{3,}', l)
+        split_line = SPLIT_PAT.split(l)
         try:
-            df = parse_row(split_line, COLUMNS)
-            total_df.append(df)
+            records.append(parse_row_values(split_line))
         except Exception as e:
             print(f"Parse error on line: {l}\nError: {e}")
-    return pd.concat(total_df, ignore_index=True)
+    if not records:
+        # Same failure the previous pd.concat of per-line frames raised
+        raise ValueError("No objects to concatenate")
+    return pd.DataFrame.from_records(records, columns=COLUMNS)
+
+
+def _column_starts(x0: np.ndarray, x1: np.ndarray, min_gap: float, n_columns: int) -> np.ndarray:
+    """
+    Left edges of the page's columns: the x-extents of all words are merged into segments
+    wherever they overlap or sit less than min_gap apart, and if that leaves more than
+    n_columns segments, only the n_columns - 1 widest gaps are kept as column boundaries.
+    """
+    order = np.argsort(x0, kind="stable")
+    lefts = x0[order]
+    # Right edge of the segment so far at each word, in left-to-right order
+    reach = np.maximum.accumulate(x1[order])
+    gaps = lefts[1:] - reach[:-1]
+    breaks = np.flatnonzero(gaps > min_gap) + 1
+    if len(breaks) >= n_columns:
+        breaks = np.sort(breaks[np.argsort(gaps[breaks - 1], kind="stable")[-(n_columns - 1):]])
+    return lefts[np.r_[0, breaks]]
+
+
+def _line_cells(x0, x1, texts, line_of, n_lines, min_gap, n_columns) -> np.ndarray | None:
+    """
+    (n_lines, n_columns) array of cell texts, NaN where a line has nothing in a column, or
+    None if the words don't fall into at least three columns. Words are assigned to columns
+    in one pass by position; with fewer segments than columns, the segments are taken to be
+    the rightmost columns, since the rates and contaminant are the ones every line has.
+    """
+    starts = _column_starts(x0, x1, min_gap, n_columns)
+    if len(starts) < 3:
+        return None
+    column_of = np.searchsorted(starts, x0, side="right") - 1 + (n_columns - len(starts))
+
+    # Words are sorted by line and then x, so each cell's words are one contiguous run
+    cell_of = line_of * n_columns + column_of
+    bounds = np.flatnonzero(np.diff(cell_of)) + 1
+    cells = np.full(n_lines * n_columns, np.nan, dtype=object)
+    cells[cell_of[np.r_[0, bounds]]] = [" ".join(run) for run in np.split(texts, bounds)]
+    return cells.reshape(n_lines, n_columns)
+
+
+def extract_table_layout(words: list[dict], COLUMNS: list[str]) -> tuple[pd.DataFrame | None, bool]:
+    """
+    Extracts a whitespace-aligned table from the positions of a page's words (as returned by
+    page.extract_words()), instead of from its text: words are grouped into lines by their
+    top, and into columns by the gaps in x that run through every line of the table body.
+
+    Returns one row per table line, NaN where the line has nothing in a column (wrapped lines
+    are joined to their rows by merge_wrapped_lines), and whether the page ends the table with
+    the "(1) Emission point identification" footnote. The lines are None if no column layout
+    could be found, e.g. on a page without a text layer.
+    """
+    with metrics.span("tricky.extract_table_layout", words=len(words)) as span:
+        lines, end_of_table = _extract_table_layout(words, COLUMNS)
+        span["lines"] = 0 if lines is None else len(lines)
+    return lines, end_of_table
+
+
+def _extract_table_layout(words: list[dict], COLUMNS: list[str]) -> tuple[pd.DataFrame | None, bool]:
+    if not words:
+        return None, False
+    x0 = np.array([w["x0"] for w in words])
+    x1 = np.array([w["x1"] for w in words])
+    top = np.array([w["top"] for w in words])
+    height = np.array([w["bottom"] for w in words]) - top
+    texts = np.array([w["text"] for w in words], dtype=object)
+
+    # Lines: a word more than half a text height below the previous one (by top) starts a new line
+    order = np.argsort(top, kind="stable")
+    line_of = np.empty(len(words), dtype=int)
+    line_of[order] = np.cumsum(np.diff(top[order], prepend=-np.inf) > np.median(height) / 2) - 1
+    order = np.lexsort((x0, line_of))
+    x0, x1, top, texts, line_of = x0[order], x1[order], top[order], texts[order], line_of[order]
+    line_starts = np.flatnonzero(np.diff(line_of, prepend=-1))
+    line_top = top[line_starts]
+    line_text = [" ".join(run) for run in np.split(texts, line_starts[1:])]
+
+    # Body: between the header (or the top of the page, if it has none) and the footnote
+    last = next((i for i, text in enumerate(line_text) if FOOTNOTE_KEY in text.replace(" ", "")), None)
+    end_of_table = last is not None
+    last = len(line_text) if last is None else last
+    first = next((i + 1 for i, text in enumerate(line_text[:last]) if HEADER_PAT.search(text)), 0)
+    while first < last and (RULE_PAT.match(line_text[first]) or HEADER_PAT.search(line_text[first])):
+        first += 1
+    if first >= last:
+        # Nothing between the header and the footnote
+        return pd.DataFrame(columns=COLUMNS), end_of_table
+
+    in_body = (line_of >= first) & (line_of < last)
+    char_width = np.median((x1 - x0)[in_body] / np.fromiter(map(len, texts[in_body]), dtype=float))
+    min_gap = COLUMN_GAP_CHARS * char_width
+
+    def body_cells(keep_line: np.ndarray):
+        kept_words = keep_line[line_of]
+        # Renumber the kept lines 0..n-1
+        line_index = np.cumsum(keep_line) - 1
+        return _line_cells(x0[kept_words], x1[kept_words], texts[kept_words], line_index[line_of[kept_words]],
+                           int(keep_line.sum()), min_gap, len(COLUMNS))
+
+    keep_line = np.zeros(len(line_text), dtype=bool)
+    keep_line[first:last] = True
+    cells = body_cells(keep_line)
+    if cells is None:
+        return None, end_of_table
+
+    # Drop blocks of lines, set apart by a wide vertical gap, that have no emission rates;
+    # the columns are then found again without them, so e.g. a page footer can't bridge two
+    # columns
+    body_top = line_top[keep_line]
+    pitches = np.diff(body_top)
+    if len(pitches):
+        block_of = np.r_[0, np.cumsum(pitches > BLOCK_GAP_PITCHES * np.median(pitches))]
+        rate_text = pd.Series(cells[:, -2:].ravel(), dtype="string").str.strip()
+        has_rates = rate_text.str.match(RATE_PAT).fillna(False).to_numpy(dtype=bool).reshape(-1, 2).any(axis=1)
+        rated_blocks = np.unique(block_of[has_rates])
+        in_rated_block = np.isin(block_of, rated_blocks)
+        if not in_rated_block.all():
+            keep_line[np.flatnonzero(keep_line)[~in_rated_block]] = False
+            if not keep_line.any():
+                return pd.DataFrame(columns=COLUMNS), end_of_table
+            cells = body_cells(keep_line)
+            if cells is None:
+                return None, end_of_table
+
+    return pd.DataFrame(cells, columns=COLUMNS), end_of_table
+
+
+def merge_wrapped_lines(df_lines: pd.DataFrame) -> pd.DataFrame:
+    """
+    Joins the lines from extract_table_layout (across all pages) into table rows, and fills
+    each source's Emission Source and Source Name down to its contaminant rows.
+
+    A line with an emission rate or an Emission Source starts a row; the lines below it
+    without either are its cells' wrapped text, appended with a space. A source line without
+    rates takes the rates of the next line, as when a source's name is on a line of its own.
+    Rows left without rates, and rows before the first Emission Source, are dropped.
+    Source Name fragments on a source's later rows are a wrapped name, joined onto its first.
+    """
+    with metrics.span("tricky.merge_wrapped_lines", rows_in=len(df_lines)) as span:
+        df_final = _merge_wrapped_lines(df_lines)
+        span["rows_out"] = len(df_final)
+    return df_final
+
+
+def _merge_wrapped_lines(df_lines: pd.DataFrame) -> pd.DataFrame:
+    columns = list(df_lines.columns)
+    es_col = columns.index('Emission Source')
+    sn_col = columns.index('Source Name')
+    rate_cols = [columns.index('Emission Rate lbs/hr'), columns.index('Emission Rate tons/year')]
+
+    cells = df_lines.to_numpy(dtype=object)
+    has_source = pd.notna(cells[:, es_col])
+    has_rates = pd.notna(cells[:, rate_cols]).any(axis=1)
+
+    candidates = np.flatnonzero(has_source | has_rates)
+    # A rates-only line right after a source line without rates completes that row
+    completes = np.zeros(len(candidates), dtype=bool)
+    completes[1:] = (has_source[candidates[:-1]] & ~has_rates[candidates[:-1]]
+                     & has_rates[candidates[1:]] & ~has_source[candidates[1:]])
+    starts = np.zeros(len(cells), dtype=bool)
+    starts[candidates[~completes]] = True
+    row_of = np.cumsum(starts) - 1
+
+    rows = cells[starts].copy()
+    for i in np.flatnonzero(~starts & (row_of >= 0)):
+        row = rows[row_of[i]]
+        for col in np.flatnonzero(pd.notna(cells[i])):
+            row[col] = cells[i, col] if pd.isna(row[col]) else f"{row[col]} {cells[i, col]}"
+
+    # A source's name can wrap onto its contaminant rows, so it is the join of every Source
+    # Name fragment from its Emission Source down to the next one
+    source_of = np.cumsum(pd.notna(rows[:, es_col])) - 1
+    names = {}
+    for source, fragment in zip(source_of, rows[:, sn_col]):
+        if pd.notna(fragment):
+            names[source] = f"{names[source]} {fragment}" if source in names else fragment
+
+    df_final = pd.DataFrame(rows, columns=columns)
+    df_final['Emission Source'] = df_final['Emission Source'].ffill()
+    df_final['Source Name'] = pd.Series(source_of).map(names)
+    rated = pd.notna(rows[:, rate_cols]).any(axis=1)
+    df_final = df_final[rated & (source_of >= 0)].reset_index(drop=True)
+    if df_final.empty:
+        raise ValueError("No rows left after merging wrapped lines")
+    return df_final
+
+
+def _is_blank(value) -> bool:
+    """
+    True for cells the cleanup treats as 'empty': missing values or the literal 'empty' sentinel.
+    """
+    return pd.isna(value) or value == 'empty'
 
 
 def clean_up_tricky_table(df_pages: pd.DataFrame) -> pd.DataFrame:
@@ -73,54 +296,90 @@ def clean_up_tricky_table(df_pages: pd.DataFrame) -> pd.DataFrame:
     Cleans extracted tricky tables:
     - Merges lines where Air Contaminant Names are broken across rows.
     - Merges lines where Source Names are broken across rows.
+
+    Rows are visited once, grouped by Emission Source (in sorted key order, rows before the
+    first Emission Source are dropped), and both merges are applied as the rows stream past.
+    Missing rates come out as the 'empty' sentinel.
     """
+    with metrics.span("tricky.clean_up_tricky_table", rows_in=len(df_pages)) as span:
+        df_final = _clean_up_tricky_table(df_pages)
+        span["rows_out"] = len(df_final)
+    return df_final
+
+
+def _clean_up_tricky_table(df_pages: pd.DataFrame) -> pd.DataFrame:
+    columns = list(df_pages.columns)
+    es_col = columns.index('Emission Source')
+    sn_col = columns.index('Source Name')
+    acn_col = columns.index('Air Contaminant Name')
+    lbs_col = columns.index('Emission Rate lbs/hr')
+    tons_col = columns.index('Emission Rate tons/year')
+
     # Forward fill Emission Source to handle missing cells
-    df_pages['Emission Source'] = df_pages['Emission Source'].ffill()
+    records = list(zip(*(df_pages[col].tolist() for col in columns)))
+    emission_sources = df_pages['Emission Source'].ffill().tolist()
+    order = sorted((i for i, key in enumerate(emission_sources) if not pd.isna(key)),
+                   key=emission_sources.__getitem__)
 
-    cleaned_groups = []
-    for group_name, group in df_pages.groupby("Emission Source"):
-        # Fill missing with 'empty' for easy checks
-        group = group.fillna({'Emission Rate lbs/hr': 'empty', 
-                              'Emission Rate tons/year': 'empty', 
-                              'Source Name': 'empty'})
-
-        merged_rows = []
-        for _, row in group.iterrows():
-            # Merge rows where Air Contaminant Name is split
-            if row['Emission Rate lbs/hr'] == 'empty' and row['Emission Rate tons/year'] == 'empty' and row['Source Name'] == 'empty':
-                if merged_rows:
-                    prev = merged_rows.pop()
-                    prev['Air Contaminant Name'] = f"{prev['Air Contaminant Name']}_{row['Air Contaminant Name']}"
-                    merged_rows.append(prev)
-                else:
-                    merged_rows.append(row)
-            else:
-                merged_rows.append(row)
-
-        cleaned_groups.append(pd.DataFrame(merged_rows))
-
-    df_cleaned = pd.concat(cleaned_groups, ignore_index=True)
-    df_cleaned['Source Name'] = df_cleaned['Source Name'].replace("empty", np.nan)
-    print(f"Tricky cleanup: {len(df_pages)} → {len(df_cleaned)} rows after Air Contaminant merging.")
-
-    # Handle Source Name wrap merging
+    labels = []
     final_rows = []
     temp_block = []
-    for idx, row in df_cleaned.iterrows():
-        if row['Emission Rate lbs/hr'] == 'empty' and row['Emission Rate tons/year'] == 'empty':
-            temp_block.append(row)
+    n_cleaned = 0
+
+    def emit_source_name_merge(row):
+        # Handle Source Name wrap merging on rows as they leave the Air Contaminant merge
+        nonlocal n_cleaned, temp_block
+        label = n_cleaned
+        n_cleaned += 1
+        if row[lbs_col] == 'empty' and row[tons_col] == 'empty':
+            temp_block.append((label, row))
         elif temp_block:
             # Merge Source Names across wrapped rows
-            merged_row = temp_block[0].copy()
-            merged_row['Source Name'] = " ".join(str(r['Source Name']) for r in temp_block)
-            final_rows.append(merged_row)
-            final_rows.append(row)
+            block_label, merged_row = temp_block[0]
+            merged_row = list(merged_row)
+            merged_row[sn_col] = " ".join(str(r[sn_col]) for _, r in temp_block)
+            labels.extend([block_label, label])
+            final_rows.extend([merged_row, row])
             temp_block = []
         else:
+            labels.append(label)
             final_rows.append(row)
 
-    df_final = pd.DataFrame(final_rows)
+    prev = None
+    prev_group = None
+    for i in order:
+        row = list(records[i])
+        row[es_col] = emission_sources[i]
+        # Fill missing with 'empty' for easy checks
+        lbs_blank, tons_blank, sn_blank = (_is_blank(row[c]) for c in (lbs_col, tons_col, sn_col))
+        if lbs_blank:
+            row[lbs_col] = 'empty'
+        if tons_blank:
+            row[tons_col] = 'empty'
+        if sn_blank:
+            row[sn_col] = np.nan
+
+        if prev is not None and emission_sources[i] != prev_group:
+            emit_source_name_merge(prev)
+            prev = None
+        prev_group = emission_sources[i]
+
+        # Merge rows where Air Contaminant Name is split
+        if prev is not None and lbs_blank and tons_blank and sn_blank:
+            prev[acn_col] = f"{prev[acn_col]}_{row[acn_col]}"
+        else:
+            if prev is not None:
+                emit_source_name_merge(prev)
+            prev = row
+    if prev is not None:
+        emit_source_name_merge(prev)
+
+    print(f"Tricky cleanup: {len(df_pages)} → {n_cleaned} rows after Air Contaminant merging.")
+    if not final_rows:
+        raise ValueError("No rows left after tricky table cleanup")
+
+    df_final = pd.DataFrame(final_rows, columns=columns, index=labels)
     df_final['Source Name'] = df_final['Source Name'].ffill()
-    print(f"Tricky cleanup: {len(df_cleaned)} → {len(df_final)} rows after Source Name merging.")
+    print(f"Tricky cleanup: {n_cleaned} → {len(df_final)} rows after Source Name merging.")
 
-    return df_final
\ No newline at end of file
+    return df_final
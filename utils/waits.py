@@ -0,0 +1,135 @@
+import os
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from selenium.webdriver.support.wait import WebDriverWait
+
+from utils.instrumentation import metrics
+
+POLL_INTERVAL = 0.1
+
+# Partial-download suffixes written by Chrome (and other browsers) while a file is still arriving
+PARTIAL_SUFFIXES = (".crdownload", ".part", ".tmp")
+
+
+class WaitMetrics:
+    """
+    Thread-safe tally of how long each kind of wait took, next to what the fixed sleep or
+    coarse polling loop it replaced would have taken, so the time saved can be reported.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, label: str, waited: float, previous: float):
+        metrics.record(f"wait.{label}", waited)
+        with self._lock:
+            count, total_waited, total_previous = self._stats.get(label, (0, 0.0, 0.0))
+            self._stats[label] = (count + 1, total_waited + waited, total_previous + previous)
+
+    def summary(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                label: {"count": count, "waited_s": waited, "previous_s": previous, "saved_s": previous - waited}
+                for label, (count, waited, previous) in self._stats.items()
+            }
+
+    def log_summary(self):
+        summary = self.summary()
+        for label, stats in sorted(summary.items()):
+            logging.info(f"Wait [{label}]: {stats['count']} waits, {stats['waited_s']:.1f}s spent, "
+                         f"~{stats['saved_s']:.1f}s saved vs. previous fixed sleeps/polling")
+        if summary:
+            logging.info(f"Total wait time saved: ~{sum(s['saved_s'] for s in summary.values()):.1f}s")
+
+
+wait_metrics = WaitMetrics()
+
+
+def polled_estimate(waited: float, interval: float) -> float:
+    """What a loop polling every `interval` seconds would have spent on the same wait."""
+    return max(interval, math.ceil(waited / interval) * interval)
+
+
+@contextmanager
+def no_implicit_wait(driver, restore: float):
+    """
+    Disables the driver's implicit wait for the duration of an explicit wait, so a condition
+    checking for a missing element fails fast instead of blocking for the implicit timeout.
+    """
+    driver.implicitly_wait(0)
+    try:
+        yield
+    finally:
+        driver.implicitly_wait(restore)
+
+
+def wait_until(driver, condition, timeout: float, label: str, previous, implicit_wait: float = 0):
+    """
+    WebDriverWait on `condition`, polled every POLL_INTERVAL seconds; raises TimeoutException like WebDriverWait.
+    `previous` is the fixed sleep this wait replaces, or a callable mapping the time actually
+    waited to what the old polling loop would have spent.
+    """
+    start = time.monotonic()
+    try:
+        with no_implicit_wait(driver, implicit_wait):
+            return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(condition)
+    finally:
+        waited = time.monotonic() - start
+        wait_metrics.record(label, waited, previous(waited) if callable(previous) else previous)
+
+
+def completed_downloads(directory: str) -> list[str]:
+    paths = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and not entry.name.endswith(PARTIAL_SUFFIXES):
+            paths.append(entry.path)
+    return paths
+
+
+def clear_downloads(directory: str) -> list[str]:
+    """
+    Deletes every file in `directory`, complete or partial, and returns their names. Run after
+    each document, so a download that was rejected (or that finished after its wait gave up)
+    can't be returned by the next wait_for_download in its place.
+    """
+    names = []
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            try:
+                os.remove(entry.path)
+                names.append(entry.name)
+            except FileNotFoundError:
+                pass
+    return names
+
+
+def wait_for_download(directory: str, timeout: float = 30, previous_interval: float = 1) -> str | None:
+    """
+    Waits for a download in `directory` to complete and returns its path (the newest file if several).
+    A file only counts once no partial-download file (e.g. Chrome's .crdownload) is left and
+    its size has stopped changing between two checks. Returns None on timeout. Any completed
+    file counts, so the directory must be emptied between downloads (see clear_downloads).
+    """
+    start = time.monotonic()
+    last_sizes = None
+    result = None
+    while time.monotonic() - start < timeout:
+        in_progress = any(name.endswith(PARTIAL_SUFFIXES) for name in os.listdir(directory))
+        files = completed_downloads(directory)
+        if files and not in_progress:
+            sizes = {path: os.path.getsize(path) for path in files}
+            if sizes == last_sizes:
+                result = max(files, key=os.path.getctime)
+                break
+            last_sizes = sizes
+        time.sleep(POLL_INTERVAL)
+
+    waited = time.monotonic() - start
+    wait_metrics.record("download", waited, polled_estimate(waited, previous_interval) if result else timeout)
+    return result
+
@@ -0,0 +1,178 @@
+import time
+import signal
+import logging
+import multiprocessing
+from contextlib import contextmanager
+from multiprocessing.connection import wait
+
+# Yielded by a WatchdogPool.imap item source that has nothing ready yet, so the pool can collect
+# finished results and check on its workers instead of blocking until the next item arrives
+PENDING = object()
+
+
+class DocumentTimeout(BaseException):
+    """
+    Raised inside a document's extraction when it overruns its time limits. Derived from
+    BaseException, like KeyboardInterrupt, so the broad `except Exception` fallbacks in the
+    parsing code can't swallow it.
+    """
+
+
+@contextmanager
+def time_limits(wall_seconds: float | None = None, cpu_seconds: float | None = None):
+    """
+    Raises DocumentTimeout in the block once it has run for wall_seconds, or used cpu_seconds
+    of process CPU time. Uses interval timers and signals, so it only works in the main thread
+    and can't interrupt a single long-running C call; WatchdogPool covers that case.
+    """
+    def on_timeout(signum, frame):
+        kind = "wall-clock" if signum == signal.SIGALRM else "CPU"
+        limit = wall_seconds if signum == signal.SIGALRM else cpu_seconds
+        raise DocumentTimeout(f"exceeded {kind} timeout of {limit:g}s")
+
+    timers = [(signal.ITIMER_REAL, signal.SIGALRM, wall_seconds), (signal.ITIMER_PROF, signal.SIGPROF, cpu_seconds)]
+    timers = [(timer, signum, seconds) for timer, signum, seconds in timers if seconds]
+    previous = [signal.signal(signum, on_timeout) for _, signum, _ in timers]
+    for timer, _, seconds in timers:
+        signal.setitimer(timer, seconds)
+    try:
+        yield
+    finally:
+        for (timer, signum, _), handler in zip(timers, previous):
+            signal.setitimer(timer, 0)
+            signal.signal(signum, handler)
+
+
+def _worker_main(conn, func, initializer, initargs):
+    if initializer is not None:
+        initializer(*initargs)
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        index, item = task
+        conn.send((index, func(item)))
+
+
+class _Worker:
+    def __init__(self, context, func, initializer, initargs):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, func, initializer, initargs), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.started = None
+
+    def submit(self, index, item):
+        self.task = (index, item)
+        self.started = time.monotonic()
+        self.conn.send(self.task)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WatchdogPool:
+    """
+    Process pool that can't be stalled by one task: each worker runs one task at a time, and a
+    worker still on a task after hard_timeout seconds (or one that dies mid-task) is killed and
+    replaced, with on_lost(item, reason, timed_out) standing in for the task's result.
+    Results are yielded in input order, while the other workers keep taking new tasks.
+    """
+
+    def __init__(self, workers: int, hard_timeout: float | None = None, initializer=None, initargs=()):
+        self.workers = workers
+        self.hard_timeout = hard_timeout
+        self.initializer = initializer
+        self.initargs = initargs
+        self.context = multiprocessing.get_context()
+
+    def imap(self, func, items, on_lost):
+        """
+        Yields func(item) for each item, in input order. items may be a lazy iterator (e.g. one
+        fed by a queue): it is only advanced when a worker is free to take the next item, so a
+        slow consumer holds back a fast producer instead of piling up work. An iterator that
+        waits on its source should yield PENDING every so often while nothing has arrived;
+        results are then passed on and stuck workers killed in the meantime.
+        """
+        items = iter(items)
+        exhausted = False
+        pending = False
+        results = {}
+        submitted = next_index = 0
+        workers = []
+
+        def start_worker():
+            return _Worker(self.context, func, self.initializer, self.initargs)
+
+        try:
+            while True:
+                # Workers are started as items arrive, up to self.workers
+                pending = False
+                while not exhausted:
+                    worker = next((w for w in workers if w.task is None), None)
+                    if worker is None and len(workers) >= self.workers:
+                        break
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if item is PENDING:
+                        pending = True
+                        break
+                    if worker is None:
+                        worker = start_worker()
+                        workers.append(worker)
+                    worker.submit(submitted, item)
+                    submitted += 1
+
+                if exhausted and next_index == submitted:
+                    return
+
+                # The item source has just waited on its own, so only poll the workers before asking it again
+                busy = [worker for worker in workers if worker.task is not None]
+                ready = set(wait([w.conn for w in busy] + [w.process.sentinel for w in busy], timeout=0 if pending else 1))
+
+                for i, worker in enumerate(workers):
+                    if worker.task is None:
+                        continue
+                    index, item = worker.task
+                    reason = None
+                    timed_out = False
+                    if worker.conn in ready:
+                        try:
+                            done_index, result = worker.conn.recv()
+                            results[done_index] = result
+                            worker.task = None
+                            continue
+                        except EOFError:
+                            reason = f"worker exited with code {worker.process.exitcode}"
+                    elif worker.process.sentinel in ready:
+                        worker.process.join()
+                        reason = f"worker exited with code {worker.process.exitcode}"
+                    elif self.hard_timeout and time.monotonic() - worker.started > self.hard_timeout:
+                        reason = f"killed after {self.hard_timeout:g}s without finishing"
+                        timed_out = True
+
+                    if reason:
+                        logging.warning(f"Lost task {index}: {reason}; restarting worker.")
+                        worker.kill()
+                        results[index] = on_lost(item, reason, timed_out)
+                        workers[i] = start_worker()
+
+                while next_index in results:
+                    yield results.pop(next_index)
+                    next_index += 1
+        finally:
+            for worker in workers:
+                if worker.task is None and worker.process.is_alive():
+                    try:
+                        worker.conn.send(None)
+                    except OSError:
+                        pass
+                    worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.kill()